@@ -0,0 +1,220 @@
+from __future__ import annotations
+
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+
+ANSWER_CACHE_THRESHOLD = float(os.getenv('ANSWER_CACHE_THRESHOLD', '0.95'))
+ANSWER_CACHE_TTL = float(os.getenv('ANSWER_CACHE_TTL', '900'))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv('ANSWER_CACHE_MAX_ENTRIES', '256'))
+
+# Answers built only from these tools depend on the docs, not live data
+DOC_ONLY_TOOLS = {'wazuh_rag_search', 'route_query'}
+
+# Identifiers that must match exactly: "agent 001" and "agent 002" embed
+# almost identically but are different questions.
+_IDENTIFIER = re.compile(r"\bcve-\d{4}-\d+\b|\b\d+\b")
+
+
+def normalize(question: str) -> str:
+    text = re.sub(r"[^\w\s-]", ' ', question.lower())
+    return ' '.join(text.split())
+
+
+def identifiers(normalized: str) -> frozenset[str]:
+    return frozenset(_IDENTIFIER.findall(normalized))
+
+
+def result_keys(outputs) -> tuple[tuple[str, str], ...]:
+    """
+    Result cache rows (tool, tag) behind a turn's [(tool, args, output)].
+    run_top5_workflow reads the rows of its six calls.
+    """
+    from prefetch import build_tool_calls
+    from prefetch import cache_tag
+
+    keys = set()
+    for tool, args, _ in outputs:
+        args = args if isinstance(args, dict) else {}
+        if tool == 'run_top5_workflow':
+            calls = build_tool_calls(str(args.get('agent_id') or '001'))
+            keys.update(
+                (name, cache_tag(call)) for name, call in calls.items()
+            )
+        elif isinstance(args.get('params'), dict):
+            keys.add((tool, cache_tag(args)))
+    return tuple(sorted(keys))
+
+
+def data_fingerprint(tools_used: set[str], keys=()) -> str:
+    """
+    Fingerprint of the cached data an answer used. Answers from tools
+    with no result cache rows only expire with the TTL.
+    """
+    if tools_used <= DOC_ONLY_TOOLS:
+        return 'docs'
+    from result_cache import result_cache
+
+    return result_cache.fingerprint(list(keys))
+
+
+def answer_ttl(tools_used: set[str], ttl: float) -> float:
+    """
+    An answer lives no longer than the freshest data it used: alerts
+    answered by a direct tool call write no result cache row, so the
+    fingerprint alone would keep them for the full answer TTL.
+    """
+    live = tools_used - DOC_ONLY_TOOLS
+    if not live:
+        return ttl
+    from result_cache import result_cache
+
+    return min(ttl, *(result_cache.ttl_for(tool) for tool in live))
+
+
+@dataclass
+class CachedAnswer:
+    question: str
+    answer: str
+    vector: np.ndarray
+    idents: frozenset[str]
+    tools: frozenset[str]
+    keys: tuple[tuple[str, str], ...]
+    fingerprint: str
+    created_at: float
+    ttl: float
+
+
+class SemanticAnswerCache:
+    """
+    Near-duplicate question cache in front of the agent.
+    - cosine similarity of normalized-question embeddings
+    - identifiers (agent ids, rule ids, CVEs) must match exactly
+    - answers expire after a TTL, capped by the TTLs of the tools they
+      used, or when the tool data they used changed
+    - embedding or storage errors count as misses, never fail a question
+    """
+
+    def __init__(
+        self,
+        embeddings=None,
+        threshold: float = ANSWER_CACHE_THRESHOLD,
+        ttl: float = ANSWER_CACHE_TTL,
+        max_entries: int = ANSWER_CACHE_MAX_ENTRIES,
+    ):
+        self._embeddings = embeddings
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidated = 0
+        self.evictions = 0
+
+        self._entries: OrderedDict[str, CachedAnswer] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _embed(self, text: str) -> np.ndarray:
+        if self._embeddings is None:
+            from rag_store import get_embeddings
+
+            self._embeddings = get_embeddings()
+        vector = np.asarray(self._embeddings.embed_query(text), dtype=float)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, question: str) -> str | None:
+        try:
+            return self._lookup(question)
+        except Exception as e:
+            print(f"Answer cache lookup failed: {e}")
+            self.misses += 1
+            return None
+
+    def _lookup(self, question: str) -> str | None:
+        normalized = normalize(question)
+        idents = identifiers(normalized)
+        vector = self._embed(normalized)
+        now = time.time()
+
+        with self._lock:
+            best, best_score = None, self.threshold
+            for key, entry in list(self._entries.items()):
+                if now - entry.created_at > entry.ttl:
+                    del self._entries[key]
+                    continue
+                if entry.idents != idents:
+                    continue
+                score = float(np.dot(vector, entry.vector))
+                if score >= best_score:
+                    best, best_score = entry, score
+
+            if best is None:
+                self.misses += 1
+                return None
+
+            fingerprint = data_fingerprint(set(best.tools), best.keys)
+            if fingerprint != best.fingerprint:
+                del self._entries[best.question]
+                self.invalidated += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(best.question)
+            self.hits += 1
+            return best.answer
+
+    def store(
+        self,
+        question: str,
+        answer: str,
+        tools_used: set[str],
+        keys: tuple[tuple[str, str], ...] = (),
+    ):
+        """`keys`: result cache rows the answer used (result_keys)."""
+        normalized = normalize(question)
+        try:
+            entry = CachedAnswer(
+                question=normalized,
+                answer=answer,
+                vector=self._embed(normalized),
+                idents=identifiers(normalized),
+                tools=frozenset(tools_used),
+                keys=tuple(keys),
+                fingerprint=data_fingerprint(tools_used, keys),
+                created_at=time.time(),
+                ttl=answer_ttl(tools_used, self.ttl),
+            )
+        except Exception as e:
+            print(f"Answer cache store failed: {e}")
+            return
+        with self._lock:
+            self._entries[normalized] = entry
+            self._entries.move_to_end(normalized)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'invalidated': self.invalidated,
+            'evictions': self.evictions,
+            'entries': len(self._entries),
+            'hit_ratio': round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+answer_cache = SemanticAnswerCache()
@@ -0,0 +1,798 @@
+"""
+Local stand-in for the Wazuh API and the Wazuh indexer, for benchmarks.
+
+    python benchmarks/fake_wazuh.py --agents 5000 --latency-ms 20 --port 55900
+
+Serves a synthetic fleet from memory on one plain-HTTP port. Point both
+WAZUH_API and WAZUH_INDEXER_API at it:
+
+    WAZUH_API=http://127.0.0.1:55900 WAZUH_INDEXER_API=http://127.0.0.1:55900
+
+Wazuh API: /security/user/authenticate, /agents, /groups/{g}/agents,
+/syscollector/{id}/*, /manager/logs, /experimental/hotfixes/{id},
+/experimental/syscollector/hotfixes, /rules, /cluster/*, /manager/stats/*.
+Indexer: {index}/_search, _msearch, point-in-time open/close. Queries
+support bool/term/terms/wildcard/prefix/range/exists, sort with
+search_after, _source projection and terms / top_hits / max / min /
+cardinality / value_count / filter / date_histogram aggregations.
+The data is deterministic for a given --seed.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import base64
+import fnmatch
+import functools
+import json
+import random
+import re
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime
+from datetime import timezone
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+ALERTS = 'wazuh-alerts-4.x-fake'
+FIM = 'wazuh-syscheck-fake'
+VULNS = 'wazuh-states-vulnerabilities-fake'
+
+RULES = [
+    (5710, 5, 'sshd: Attempt to login using a non-existent user',
+     ['syslog', 'sshd', 'authentication_failed']),
+    (5712, 10, 'sshd: brute force trying to get access to the system',
+     ['syslog', 'sshd', 'authentication_failures']),
+    (5503, 5, 'PAM: User login failed.', ['pam', 'authentication_failed']),
+    (550, 7, 'Integrity checksum changed.', ['ossec', 'syscheck']),
+    (554, 5, 'File added to the system.', ['ossec', 'syscheck']),
+    (60122, 5, 'Logon Failure - Unknown user or bad password',
+     ['windows', 'authentication_failed']),
+    (92052, 12, 'Suspicious PowerShell command line', ['windows', 'attack']),
+    (31101, 5, 'Web server 400 error code.', ['web', 'accesslog']),
+    (40111, 10, 'Multiple authentication failures.', ['syslog', 'attack']),
+    (87105, 13, 'Vulnerability detected in installed package',
+     ['vulnerability-detector']),
+]
+PACKAGES = [
+    ('openssl', '3.0.2'), ('openssh-server', '8.9p1'), ('curl', '7.81.0'),
+    ('sudo', '1.9.9'), ('bash', '5.1'), ('xz-utils', '5.6.0'),
+    ('nginx', '1.18.0'), ('python3', '3.10.12'), ('glibc', '2.35'),
+    ('systemd', '249.11'),
+]
+SEVERITIES = [
+    ('Critical', 9.0, 10.0), ('High', 7.0, 8.9), ('Medium', 4.0, 6.9),
+    ('Low', 0.1, 3.9),
+]
+PROCESSES = [
+    'sshd', 'nginx', 'python3', 'cron', 'systemd', 'bash', 'wazuh-agentd',
+    'dockerd', 'containerd', 'rsyslogd', 'nc', 'xmrig',
+]
+PORTS = [22, 80, 443, 3306, 5432, 6379, 8080, 1514, 4444, 9200]
+FIM_PATHS = [
+    '/etc/passwd', '/etc/shadow', '/etc/sudoers', '/usr/bin/ssh',
+    '/var/www/html/index.php', '/etc/crontab', '/root/.ssh/authorized_keys',
+]
+LOG_TAGS = [
+    ('wazuh-analysisd', 'info', 'Total rules enabled: 6500'),
+    ('wazuh-db', 'warning', 'Database is locked, retrying'),
+    ('wazuh-modulesd:vulnerability-scanner', 'error', 'Feed update failed'),
+    ('wazuh-authd', 'info', 'New connection from agent'),
+    ('wazuh-remoted', 'warning', 'Agent event queue is full'),
+]
+
+
+def _iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).strftime(
+        '%Y-%m-%dT%H:%M:%S.%f',
+    )[:-3] + 'Z'
+
+
+# ============================================================
+#  Synthetic fleet
+# ============================================================
+class Doc:
+    __slots__ = ('id', 'ts', 'source')
+
+    def __init__(self, doc_id: str, ts: float, source: dict):
+        self.id = doc_id
+        self.ts = ts  # epoch millis
+        self.source = source
+
+
+class Fleet:
+
+    def __init__(
+        self,
+        agents: int,
+        alerts: int = 10,
+        vulns: int = 5,
+        fim: int = 3,
+        logs: int = 2000,
+        seed: int = 7,
+        span_hours: float = 48,
+    ):
+        rng = self._rng = random.Random(seed)
+        now = time.time()
+        start = now - span_hours * 3600
+
+        def stamp():
+            return rng.uniform(start, now)
+
+        self.agents = []
+        self.groups: dict[str, list[str]] = defaultdict(list)
+        self.inventory: dict[str, dict[str, list[dict]]] = {}
+        self.indices: dict[str, list[Doc]] = {ALERTS: [], FIM: [], VULNS: []}
+        self.by_agent: dict[str, dict[str, list[Doc]]] = {
+            name: defaultdict(list) for name in self.indices
+        }
+
+        for n in range(1, agents + 1):
+            aid = str(n).zfill(3)
+            windows = n % 3 == 0
+            group = 'windows' if windows else 'linux'
+            self.agents.append({
+                'id': aid,
+                'name': f"host-{aid}",
+                'ip': f"10.{n // 65536 % 256}.{n // 256 % 256}.{n % 256}",
+                'status': 'active' if n % 17 else 'disconnected',
+                'group': ['default', group],
+                'os': {'platform': 'windows' if windows else 'ubuntu'},
+                'version': 'Wazuh v4.9.0',
+            })
+            self.groups['default'].append(aid)
+            self.groups[group].append(aid)
+            self.inventory[aid] = self._inventory(rng, aid, windows)
+
+            for _ in range(alerts):
+                rule_id, level, desc, groups = rng.choice(RULES)
+                self._add(ALERTS, aid, stamp(), {
+                    'agent': {'id': aid, 'name': f"host-{aid}"},
+                    'rule': {
+                        'id': str(rule_id), 'level': level,
+                        'description': desc, 'groups': groups,
+                    },
+                    'data': {
+                        'srcip': f"203.0.113.{rng.randrange(1, 255)}",
+                        'dstuser': rng.choice(['root', 'admin', 'ubuntu']),
+                    },
+                    'full_log': f"{desc} from {aid}",
+                })
+            for _ in range(fim):
+                path = rng.choice(FIM_PATHS)
+                self._add(FIM, aid, stamp(), {
+                    'agent': {'id': aid},
+                    'syscheck': {
+                        'path': path,
+                        'event': rng.choice(['modified', 'added', 'deleted']),
+                        'uname_after': 'root',
+                    },
+                    'rule': {'level': rng.choice([5, 7, 7, 10])},
+                })
+            for _ in range(vulns):
+                name, version = rng.choice(PACKAGES)
+                severity, low, high = rng.choice(SEVERITIES)
+                year = rng.randrange(2019, 2025)
+                cve = f"CVE-{year}-{rng.randrange(1000, 9999)}"
+                self._add(VULNS, aid, stamp(), {
+                    'agent': {'id': aid},
+                    'package': {'name': name, 'version': version},
+                    'vulnerability': {
+                        'id': cve,
+                        'severity': severity,
+                        'score': {'base': round(rng.uniform(low, high), 1)},
+                        'description': f"{cve} in {name} {version}",
+                    },
+                })
+
+        self.logs = sorted(
+            (
+                {
+                    'timestamp': datetime.fromtimestamp(
+                        stamp(), timezone.utc,
+                    ).strftime('%Y-%m-%dT%H:%M:%SZ'),
+                    'tag': tag, 'level': level, 'description': desc,
+                }
+                for tag, level, desc in (
+                    rng.choice(LOG_TAGS) for _ in range(logs)
+                )
+            ),
+            key=lambda item: item['timestamp'],
+            reverse=True,
+        )
+
+    def _add(self, index, aid, ts, source):
+        source['@timestamp'] = _iso(ts)
+        doc = Doc(f"{self._rng.getrandbits(64):016x}", int(ts * 1000), source)
+        self.indices[index].append(doc)
+        self.by_agent[index][aid].append(doc)
+
+    @staticmethod
+    def _inventory(rng, aid, windows) -> dict[str, list[dict]]:
+        processes = [
+            {
+                'agent_id': aid, 'pid': str(100 + i), 'ppid': '1',
+                'name': rng.choice(PROCESSES), 'euser': 'root',
+                'state': 'S', 'cmd': '/usr/sbin/daemon --foreground',
+            }
+            for i in range(rng.randrange(20, 60))
+        ]
+        ports = [
+            {
+                'agent_id': aid, 'protocol': 'tcp', 'state': 'listening',
+                'local': {'ip': '0.0.0.0', 'port': port},
+                'remote': {'ip': '0.0.0.0', 'port': 0},
+                'process': rng.choice(PROCESSES),
+                'pid': rng.randrange(100, 999),
+            }
+            for port in rng.sample(PORTS, rng.randrange(2, 8))
+        ]
+        packages = [
+            {
+                'agent_id': aid, 'name': name, 'version': version,
+                'architecture': 'amd64', 'vendor': 'Ubuntu',
+            }
+            for name, version in PACKAGES
+        ]
+        hotfixes = [
+            {'agent_id': aid, 'hotfix': f"KB50{rng.randrange(10000, 99999)}"}
+            for _ in range(rng.randrange(5, 15) if windows else 0)
+        ]
+        return {
+            'processes': processes, 'ports': ports,
+            'packages': packages, 'hotfixes': hotfixes,
+        }
+
+
+# ============================================================
+#  Indexer query engine
+# ============================================================
+def _get(source: dict, path: str):
+    current = source
+    for part in path.split('.'):
+        if not isinstance(current, dict) or part not in current:
+            return None
+        current = current[part]
+    return current
+
+
+def _value(doc: Doc, field: str):
+    if field == '@timestamp':
+        return doc.ts
+    if field == '_id':
+        return doc.id
+    return _get(doc.source, field)
+
+
+_DATE_MATH = re.compile(r'^now(?:-(\d+)([smhdw]))?$')
+_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+
+
+def _bound(field, value, fmt):
+    """Normalize a range bound; dates become epoch millis."""
+    if field != '@timestamp':
+        return value
+    if fmt == 'epoch_millis' or isinstance(value, (int, float)):
+        return float(value)
+    match = _DATE_MATH.match(str(value))
+    if match:
+        offset = int(match.group(1) or 0) * _UNITS.get(match.group(2), 0)
+        return (time.time() - offset) * 1000
+    stamp = str(value).replace('Z', '+00:00')
+    return datetime.fromisoformat(stamp).timestamp() * 1000
+
+
+def _matches(doc: Doc, clause: dict) -> bool:
+    (kind, spec), = clause.items()
+    if kind == 'bool':
+        return (
+            all(_matches(doc, c) for c in _as_list(spec.get('filter')))
+            and all(_matches(doc, c) for c in _as_list(spec.get('must')))
+            and not any(
+                _matches(doc, c) for c in _as_list(spec.get('must_not'))
+            )
+            and (
+                not spec.get('should')
+                or any(_matches(doc, c) for c in _as_list(spec['should']))
+            )
+        )
+    if kind == 'match_all':
+        return True
+    (field, arg), = spec.items()
+    value = _value(doc, field)
+    if kind == 'term':
+        arg = arg.get('value') if isinstance(arg, dict) else arg
+        return value is not None and str(value) == str(arg)
+    if kind == 'terms':
+        return value is not None and str(value) in {str(a) for a in arg}
+    if kind == 'wildcard':
+        arg = arg.get('value') if isinstance(arg, dict) else arg
+        return value is not None and fnmatch.fnmatchcase(str(value), arg)
+    if kind == 'prefix':
+        arg = arg.get('value') if isinstance(arg, dict) else arg
+        return value is not None and str(value).startswith(arg)
+    if kind == 'exists':
+        return _value(doc, arg) is not None
+    if kind == 'range':
+        if value is None:
+            return False
+        fmt = arg.get('format')
+        for op, bound in arg.items():
+            if op == 'format':
+                continue
+            bound = _bound(field, bound, fmt)
+            if op == 'gte' and not value >= bound:
+                return False
+            if op == 'gt' and not value > bound:
+                return False
+            if op == 'lte' and not value <= bound:
+                return False
+            if op == 'lt' and not value < bound:
+                return False
+        return True
+    raise ValueError(f"unsupported query clause: {kind}")
+
+
+def _as_list(value) -> list:
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _agent_terms(query: dict) -> set[str] | None:
+    """agent.id values a bool/filter query pins, to skip a full scan."""
+    (kind, spec), = query.items() if query else (('match_all', {}),)
+    if kind == 'term' and 'agent.id' in spec:
+        value = spec['agent.id']
+        return {str(value.get('value') if isinstance(value, dict) else value)}
+    if kind == 'terms' and 'agent.id' in spec:
+        return {str(v) for v in spec['agent.id']}
+    if kind == 'bool':
+        clauses = _as_list(spec.get('filter')) + _as_list(spec.get('must'))
+        for clause in clauses:
+            found = _agent_terms(clause)
+            if found is not None:
+                return found
+    return None
+
+
+def _sort_spec(sort) -> list[tuple[str, bool]]:
+    """[(field, descending)] from the OpenSearch sort syntax."""
+    spec = []
+    for entry in _as_list(sort):
+        if isinstance(entry, str):
+            spec.append((entry, False))
+            continue
+        (field, order), = entry.items()
+        if isinstance(order, dict):
+            order = order.get('order', 'asc')
+        spec.append((field, order == 'desc'))
+    return spec
+
+
+def _compare(a: list, b: list, spec) -> int:
+    for x, y, (_, desc) in zip(a, b, spec):
+        if x == y:
+            continue
+        # Missing values sort last in either direction
+        if x is None:
+            return 1
+        if y is None:
+            return -1
+        result = -1 if x < y else 1
+        return -result if desc else result
+    return 0
+
+
+def _project(source: dict, fields) -> dict:
+    if fields is True or fields is None:
+        return source
+    if fields is False:
+        return {}
+    if isinstance(fields, dict):
+        fields = fields.get('includes', [])
+    out: dict = {}
+    for path in _as_list(fields):
+        value = _get(source, path)
+        if value is None:
+            continue
+        target = out
+        parts = path.split('.')
+        for part in parts[:-1]:
+            target = target.setdefault(part, {})
+        target[parts[-1]] = value
+    return out
+
+
+def _hits(index, docs, sort, size, source, search_after=None) -> list[dict]:
+    spec = _sort_spec(sort)
+    keyed = [([_value(d, field) for field, _ in spec], d) for d in docs]
+    if spec:
+        if search_after is not None:
+            keyed = [
+                (key, d) for key, d in keyed
+                if _compare(key, search_after, spec) > 0
+            ]
+        keyed.sort(
+            key=functools.cmp_to_key(lambda a, b: _compare(a[0], b[0], spec)),
+        )
+    hits = []
+    for key, doc in keyed[:size]:
+        hit = {
+            '_index': index, '_id': doc.id,
+            '_source': _project(doc.source, source),
+        }
+        if spec:
+            hit['sort'] = key
+        hits.append(hit)
+    return hits
+
+
+def _interval_ms(interval: str) -> float:
+    match = re.match(r'^(\d+)([smhdw])$', interval)
+    if not match:
+        return 3600 * 1000
+    return int(match.group(1)) * _UNITS[match.group(2)] * 1000
+
+
+def _aggregate(index: str, docs: list[Doc], aggs: dict) -> dict:
+    out = {}
+    for name, spec in (aggs or {}).items():
+        sub = spec.get('aggs') or spec.get('aggregations')
+        kind = next(k for k in spec if k not in ('aggs', 'aggregations'))
+        arg = spec[kind]
+
+        if kind in ('max', 'min'):
+            values = [
+                v for v in (_value(d, arg['field']) for d in docs)
+                if isinstance(v, (int, float))
+            ]
+            value = (max if kind == 'max' else min)(values) if values else None
+            out[name] = {'value': value}
+            if arg['field'] == '@timestamp' and value is not None:
+                out[name]['value_as_string'] = _iso(value / 1000)
+        elif kind == 'cardinality':
+            out[name] = {
+                'value': len({_value(d, arg['field']) for d in docs} - {None}),
+            }
+        elif kind == 'value_count':
+            out[name] = {
+                'value': sum(
+                    _value(d, arg['field']) is not None for d in docs
+                ),
+            }
+        elif kind == 'filter':
+            kept = [d for d in docs if _matches(d, arg)]
+            out[name] = {
+                'doc_count': len(kept), **_aggregate(index, kept, sub),
+            }
+        elif kind == 'top_hits':
+            out[name] = {'hits': {
+                'total': {'value': len(docs), 'relation': 'eq'},
+                'hits': _hits(
+                    index, docs, arg.get('sort'), arg.get('size', 3),
+                    arg.get('_source', True),
+                ),
+            }}
+        elif kind == 'terms':
+            groups: dict = defaultdict(list)
+            for doc in docs:
+                value = _value(doc, arg['field'])
+                for key in value if isinstance(value, list) else [value]:
+                    if key is not None:
+                        groups[key].append(doc)
+            buckets = [
+                {'key': key, 'doc_count': len(group),
+                 **_aggregate(index, group, sub)}
+                for key, group in groups.items()
+            ]
+            order = arg.get('order', [{'_count': 'desc'}])
+            for entry in reversed(_as_list(order)):
+                (field, direction), = entry.items()
+
+                def key(bucket, field=field):
+                    if field == '_count':
+                        return bucket['doc_count']
+                    if field == '_key':
+                        return bucket['key']
+                    return bucket[field].get('value') or 0
+
+                buckets.sort(key=key, reverse=direction == 'desc')
+            out[name] = {
+                'doc_count_error_upper_bound': 0,
+                'sum_other_doc_count': sum(
+                    b['doc_count'] for b in buckets[arg.get('size', 10):]
+                ),
+                'buckets': buckets[:arg.get('size', 10)],
+            }
+        elif kind == 'date_histogram':
+            step = _interval_ms(
+                arg.get('fixed_interval')
+                or arg.get('calendar_interval')
+                or '1h',
+            )
+            groups = defaultdict(list)
+            for doc in docs:
+                groups[int(doc.ts // step * step)].append(doc)
+            out[name] = {'buckets': [
+                {'key': key, 'key_as_string': _iso(key / 1000),
+                 'doc_count': len(group), **_aggregate(index, group, sub)}
+                for key, group in sorted(groups.items())
+                if len(group) >= arg.get('min_doc_count', 0)
+            ]}
+        else:
+            raise ValueError(f"unsupported aggregation: {kind}")
+    return out
+
+
+def _indices(fleet: Fleet, pattern: str) -> list[str]:
+    names = [p.strip().strip('/') for p in pattern.split(',')]
+    return [
+        index for index in fleet.indices
+        if any(fnmatch.fnmatchcase(index, n) for n in names)
+    ]
+
+
+def search(fleet: Fleet, pattern: str, body: dict) -> dict:
+    started = time.perf_counter()
+    query = body.get('query') or {'match_all': {}}
+    pinned = _agent_terms(query)
+
+    docs: list[Doc] = []
+    for index in _indices(fleet, pattern):
+        if pinned is not None:
+            for aid in pinned:
+                docs.extend(fleet.by_agent[index].get(aid, []))
+        else:
+            docs.extend(fleet.indices[index])
+    docs = [d for d in docs if _matches(d, query)]
+
+    index_name = ','.join(_indices(fleet, pattern))
+    result = {
+        'took': 0,
+        'timed_out': False,
+        'hits': {
+            'total': {'value': len(docs), 'relation': 'eq'},
+            'hits': _hits(
+                index_name, docs, body.get('sort'), body.get('size', 10),
+                body.get('_source', True), body.get('search_after'),
+            ),
+        },
+    }
+    aggs = body.get('aggs') or body.get('aggregations')
+    if aggs:
+        result['aggregations'] = _aggregate(index_name, docs, aggs)
+    result['took'] = int((time.perf_counter() - started) * 1000)
+    return result
+
+
+# ============================================================
+#  HTTP app
+# ============================================================
+def _token(ttl: int = 900) -> str:
+    def part(obj):
+        raw = json.dumps(obj).encode()
+        return base64.urlsafe_b64encode(raw).rstrip(b'=').decode()
+
+    claims = {'iss': 'fake-wazuh', 'exp': int(time.time()) + ttl}
+    return f"{part({'alg': 'none'})}.{part(claims)}.fake"
+
+
+def _envelope(items: list, total: int | None = None) -> dict:
+    return {
+        'data': {
+            'affected_items': items,
+            'total_affected_items': len(items) if total is None else total,
+            'total_failed_items': 0,
+            'failed_items': [],
+        },
+        'error': 0,
+    }
+
+
+def _page(request: Request, items: list, default: int = 500) -> dict:
+    limit = int(request.query_params.get('limit', default))
+    offset = int(request.query_params.get('offset', 0))
+    return _envelope(items[offset:offset + limit], len(items))
+
+
+def _wql(q: str, items: list[dict]) -> list[dict]:
+    """Enough of WQL for the copilot: `a>b`, `a=b`, `a~b`, `,` = OR."""
+    if not q:
+        return items
+    q = q.strip('()')
+    clauses = []
+    for part in q.split(','):
+        match = re.match(r'^([\w.]+)(>|<|=|~|!=)(.*)$', part.strip())
+        if match:
+            clauses.append(match.groups())
+    if not clauses:
+        # Free-text query (search_wazuh_manager_logs)
+        return [i for i in items if q.lower() in json.dumps(i).lower()]
+
+    def keep(item):
+        for field, op, value in clauses:
+            actual = str(_get(item, field) or '')
+            if (
+                (op == '>' and actual > value)
+                or (op == '<' and actual < value)
+                or (op == '=' and actual == value)
+                or (op == '!=' and actual != value)
+                or (op == '~' and value.lower() in actual.lower())
+            ):
+                return True
+        return False
+
+    return [item for item in items if keep(item)]
+
+
+def build_app(fleet: Fleet, latency_ms: float = 0, jitter_ms: float = 0):
+    pits: dict[str, str] = {}
+    stats = defaultdict(int)
+
+    async def delay():
+        if latency_ms or jitter_ms:
+            await asyncio.sleep(
+                max(0.0, latency_ms + random.uniform(-jitter_ms, jitter_ms))
+                / 1000,
+            )
+
+    async def handle(request: Request):
+        await delay()
+        path = '/' + request.path_params['path']
+        method = request.method
+        stats[f"{method} {path.split('?')[0]}"] += 1
+
+        # ---------------- indexer ----------------
+        if path.endswith('/_search/point_in_time') and method == 'POST':
+            pit = uuid.uuid4().hex
+            pits[pit] = path[:-len('/_search/point_in_time')]
+            return JSONResponse({'pit_id': pit})
+        if path == '/_search/point_in_time' and method == 'DELETE':
+            body = await request.json()
+            for pit in _as_list(body.get('pit_id')):
+                pits.pop(pit, None)
+            return JSONResponse({'pits': []})
+        if path.endswith('/_msearch'):
+            lines = [
+                json.loads(line)
+                for line in (await request.body()).decode().splitlines()
+                if line.strip()
+            ]
+            default = path[:-len('/_msearch')]
+            responses = [
+                search(fleet, header.get('index') or default, body)
+                for header, body in zip(lines[::2], lines[1::2])
+            ]
+            return JSONResponse({'took': 0, 'responses': responses})
+        if path.endswith('/_search'):
+            body = await request.json() if await request.body() else {}
+            pattern = path[:-len('/_search')]
+            pit = (body.pop('pit', None) or {}).get('id')
+            if pit:
+                if pit not in pits:
+                    return JSONResponse(
+                        {'error': 'pit not found'}, status_code=404,
+                    )
+                pattern = pits[pit]
+            result = search(fleet, pattern or '*', body)
+            if pit:
+                result['pit_id'] = pit
+            return JSONResponse(result)
+
+        # ---------------- Wazuh API ----------------
+        if path == '/security/user/authenticate':
+            token = _token()
+            if request.query_params.get('raw') == 'true':
+                return PlainTextResponse(token)
+            return JSONResponse({'data': {'token': token}, 'error': 0})
+        if not request.headers.get('authorization', '').startswith('Bearer'):
+            return JSONResponse({'title': 'Unauthorized'}, status_code=401)
+
+        parts = path.strip('/').split('/')
+        if parts == ['agents']:
+            agents = fleet.agents
+            ids = request.query_params.get('agents_list')
+            if ids:
+                wanted = set(ids.split(','))
+                agents = [a for a in agents if a['id'] in wanted]
+            return JSONResponse(_page(request, agents))
+        if parts[0] == 'groups' and len(parts) == 3 and parts[2] == 'agents':
+            ids = fleet.groups.get(parts[1], [])
+            return JSONResponse(_page(request, [{'id': aid} for aid in ids]))
+        if parts[0] == 'syscollector' and len(parts) == 3:
+            inventory = fleet.inventory.get(parts[1])
+            if inventory is None or parts[2] not in inventory:
+                return JSONResponse({'title': 'Not found'}, status_code=404)
+            return JSONResponse(_page(request, inventory[parts[2]]))
+        if parts[:2] == ['experimental', 'syscollector'] and len(parts) == 3:
+            ids = request.query_params.get('agents_list', '')
+            wanted = ids.split(',') if ids else list(fleet.inventory)
+            items = [
+                item for aid in wanted
+                for item in fleet.inventory.get(aid, {}).get(parts[2], [])
+            ]
+            return JSONResponse(_page(request, items))
+        if parts[:2] == ['experimental', 'hotfixes'] and len(parts) == 3:
+            items = fleet.inventory.get(parts[2], {}).get('hotfixes', [])
+            return JSONResponse(_page(request, items))
+        if parts == ['manager', 'logs']:
+            logs = _wql(request.query_params.get('q', ''), fleet.logs)
+            if request.query_params.get('sort', '').startswith('+'):
+                logs = list(reversed(logs))
+            return JSONResponse(_page(request, logs, default=500))
+        if parts == ['rules']:
+            return JSONResponse(_envelope([], total=6500))
+        if parts == ['cluster', 'healthcheck']:
+            return JSONResponse(_envelope([{'info': {'name': 'master'}}]))
+        if parts == ['cluster', 'nodes']:
+            return JSONResponse(_envelope([{
+                'name': 'master', 'type': 'master', 'version': '4.9.0',
+                'ip': '127.0.0.1',
+            }]))
+        if parts[:2] == ['manager', 'stats']:
+            return JSONResponse(_envelope([{'hour': h, 'events': 1000}
+                                           for h in range(24)]))
+        if parts[0] == 'osquery':
+            return JSONResponse(_envelope([]))
+        return JSONResponse(
+            {'title': 'Not found', 'path': path}, status_code=404,
+        )
+
+    async def fake_stats(request: Request):
+        return JSONResponse({
+            'agents': len(fleet.agents),
+            'documents': {k: len(v) for k, v in fleet.indices.items()},
+            'requests': dict(stats),
+        })
+
+    methods = ['GET', 'POST', 'DELETE']
+    return Starlette(routes=[
+        Route('/_fake/stats', fake_stats),
+        Route('/{path:path}', handle, methods=methods),
+    ])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--agents', type=int, default=100)
+    parser.add_argument('--alerts-per-agent', type=int, default=10)
+    parser.add_argument('--vulns-per-agent', type=int, default=5)
+    parser.add_argument('--fim-per-agent', type=int, default=3)
+    parser.add_argument('--logs', type=int, default=2000)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--jitter-ms', type=float, default=0)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=55900)
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    fleet = Fleet(
+        args.agents,
+        alerts=args.alerts_per_agent,
+        vulns=args.vulns_per_agent,
+        fim=args.fim_per_agent,
+        logs=args.logs,
+        seed=args.seed,
+    )
+    print(
+        f"fake wazuh: {args.agents} agents, "
+        f"{sum(len(v) for v in fleet.indices.values())} indexer docs "
+        f"in {time.perf_counter() - started:.1f}s",
+        flush=True,
+    )
+    uvicorn.run(
+        build_app(fleet, args.latency_ms, args.jitter_ms),
+        host=args.host, port=args.port, log_level='warning',
+    )
+
+
+if __name__ == '__main__':
+    main()
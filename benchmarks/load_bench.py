@@ -0,0 +1,271 @@
+"""
+Load and latency benchmark for the MCP tools and the top-5 workflow.
+
+    python benchmarks/load_bench.py
+    python benchmarks/load_bench.py --agents 100 --requests 50 --latency-ms 20
+
+For each fleet size (default 1, 100 and 5000 agents) this starts
+benchmarks/fake_wazuh.py, then runs a worker process with fresh module
+state pointed at it. The worker calls every benchmarked tool --requests
+times with --concurrency calls in flight. It reports p50/p95/p99
+latency, throughput and peak traced memory per tool, plus the worker's
+max RSS.
+
+Latency includes the fake server's own query time and the injected
+--latency-ms. Tools with watermarks reach their incremental steady state
+after the first call per agent. run_top5_workflow is measured cold
+(force_refresh) and warm (result cache).
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+FLEET_SIZES = [1, 100, 5000]
+
+# (name, kind, arguments, share of --requests)
+CASES = [
+    ('get_wazuh_vulnerabilities', 'agent', {}, 1.0),
+    ('custom_alert_filters', 'agent', {}, 1.0),
+    ('custom_fim_queries', 'agent', {}, 1.0),
+    ('get_wazuh_processes', 'agent', {}, 1.0),
+    ('get_wazuh_agent_ports', 'agent', {}, 1.0),
+    ('get_wazuh_manager_logs', 'tool', {'limit': '50'}, 1.0),
+    ('fleet_vulnerabilities', 'tool', {'agents': '*'}, 0.2),
+    ('top_issues_summary', 'tool', {'agents': '*'}, 0.2),
+    ('alert_timeline', 'tool', {'agents': '*'}, 0.2),
+    ('hotfix_collection', 'hotfixes', {}, 0.1),
+    # First call syncs the whole fleet, later ones are incremental no-ops
+    ('sync_inventory', 'tool', {'full': 'false'}, 0.1),
+    ('inventory_ports', 'tool', {'port': '4444', 'state': 'listening'}, 1.0),
+    ('inventory_processes', 'tool', {'name': 'xmrig'}, 1.0),
+    ('run_top5_workflow (cold)', 'top5', {'force_refresh': True}, 0.5),
+    ('run_top5_workflow (warm)', 'top5', {'force_refresh': False}, 1.0),
+]
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    """Nearest-rank percentile."""
+    ordered = sorted(samples)
+    rank = max(1, round(pct / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+# ============================================================
+#  Worker: runs inside a process configured for the fake server
+# ============================================================
+async def _call(kind, name, arguments, agent_id):
+    if kind == 'hotfixes':
+        from mcp_client_call import acollect_hotfixes
+
+        async for _ in acollect_hotfixes():
+            pass
+        return
+    if kind == 'top5':
+        from chroma_run import run_top5_workflow
+
+        await run_top5_workflow.ainvoke({
+            'user_query': 'benchmark', 'agent_id': agent_id, **arguments,
+        })
+        return
+
+    from mcp_server import call_tool_native
+
+    params = dict(arguments)
+    if kind == 'agent':
+        params['agent_id'] = agent_id
+    await call_tool_native(name, {'params': params})
+
+
+async def run_case(case, agents, requests, concurrency) -> dict:
+    name, kind, arguments, share = case
+    count = max(1, round(requests * share))
+    semaphore = asyncio.Semaphore(concurrency)
+    rng = random.Random(name)
+    latencies: list[float] = []
+    errors: list[str] = []
+
+    async def one():
+        agent_id = str(rng.randint(1, agents)).zfill(3)
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await _call(kind, name, arguments, agent_id)
+            except Exception as e:
+                errors.append(str(e) or type(e).__name__)
+                return
+            latencies.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(count)))
+    wall = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    row = {
+        'tool': name,
+        'calls': count,
+        'errors': len(errors),
+        'throughput': round(len(latencies) / wall, 1) if wall else 0.0,
+        'peak_mb': round(peak / 2 ** 20, 1),
+    }
+    if latencies:
+        for pct in (50, 95, 99):
+            row[f"p{pct}_ms"] = round(percentile(latencies, pct) * 1000, 1)
+    if errors:
+        row['first_error'] = errors[0][:200]
+    return row
+
+
+async def worker(agents, requests, concurrency, only):
+    from mcp_client_call import aclose_async_clients
+
+    rows = []
+    for case in CASES:
+        if only and not any(o in case[0] for o in only):
+            continue
+        rows.append(await run_case(case, agents, requests, concurrency))
+    await aclose_async_clients()
+    # ru_maxrss is KiB on Linux
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({'rows': rows, 'max_rss_mb': round(rss, 1)}))
+
+
+# ============================================================
+#  Driver: one fake server + one worker per fleet size
+# ============================================================
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _wait_ready(url: str, process, timeout: float = 300):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('fake_wazuh.py exited during startup')
+        try:
+            with urllib.request.urlopen(f"{url}/_fake/stats", timeout=2):
+                return
+        except OSError:
+            time.sleep(0.5)
+    raise RuntimeError(f"fake_wazuh.py not ready after {timeout}s")
+
+
+def bench_fleet(agents: int, args) -> dict:
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}"
+    server = subprocess.Popen([
+        sys.executable, os.path.join(ROOT, 'benchmarks', 'fake_wazuh.py'),
+        '--agents', str(agents), '--port', str(port),
+        '--latency-ms', str(args.latency_ms),
+        '--jitter-ms', str(args.jitter_ms),
+    ])
+    try:
+        _wait_ready(url, server)
+        with tempfile.TemporaryDirectory() as tmp:
+            env = {
+                **os.environ,
+                'WAZUH_API': url,
+                'WAZUH_INDEXER_API': url,
+                'WAZUH_USER': 'bench',
+                'WAZUH_PASSWORD': 'bench',
+                'WAZUH_INDEXER_USER': 'bench',
+                'WAZUH_INDEXER_PASSWORD': 'bench',
+                'RESULT_CACHE_PATH': os.path.join(tmp, 'results.sqlite3'),
+                'WATERMARK_DB_PATH': os.path.join(tmp, 'watermarks.sqlite3'),
+                'INVENTORY_DB_PATH': os.path.join(tmp, 'inventory.sqlite3'),
+            }
+            command = [
+                sys.executable, __file__, '--worker',
+                '--agents', str(agents),
+                '--requests', str(args.requests),
+                '--concurrency', str(args.concurrency),
+            ]
+            for name in args.only:
+                command += ['--only', name]
+            out = subprocess.run(
+                command, cwd=ROOT, env=env, capture_output=True, text=True,
+            )
+            if out.returncode != 0:
+                raise RuntimeError(f"worker failed:\n{out.stderr}")
+            return json.loads(out.stdout.strip().splitlines()[-1])
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def print_table(agents: int, result: dict):
+    print(f"\n== {agents} agents (worker max RSS {result['max_rss_mb']} MB)")
+    header = (
+        f"{'tool':<28}{'calls':>6}{'err':>5}{'p50 ms':>9}{'p95 ms':>9}"
+        f"{'p99 ms':>9}{'req/s':>8}{'peak MB':>9}"
+    )
+    print(header)
+    print('-' * len(header))
+    for row in result['rows']:
+        print(
+            f"{row['tool']:<28}{row['calls']:>6}{row['errors']:>5}"
+            f"{row.get('p50_ms', '-'):>9}{row.get('p95_ms', '-'):>9}"
+            f"{row.get('p99_ms', '-'):>9}{row['throughput']:>8}"
+            f"{row['peak_mb']:>9}",
+        )
+        if 'first_error' in row:
+            print(f"    error: {row['first_error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        '--agents', type=int, action='append',
+        help=f"fleet size, repeatable (default {FLEET_SIZES})",
+    )
+    parser.add_argument('--requests', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--latency-ms', type=float, default=5)
+    parser.add_argument('--jitter-ms', type=float, default=2)
+    parser.add_argument(
+        '--only', action='append', default=[],
+        help='run only tools whose name contains this, repeatable',
+    )
+    parser.add_argument('--json', metavar='PATH', help='also write results')
+    parser.add_argument(
+        '--worker', action='store_true', help=argparse.SUPPRESS,
+    )
+    args = parser.parse_args()
+
+    if args.worker:
+        asyncio.run(worker(
+            args.agents[0], args.requests, args.concurrency, args.only,
+        ))
+        return
+
+    results = {}
+    for agents in args.agents or FLEET_SIZES:
+        results[agents] = bench_fleet(agents, args)
+        print_table(agents, results[agents])
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
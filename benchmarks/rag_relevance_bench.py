@@ -0,0 +1,112 @@
+"""
+Offline relevance benchmark for wazuh_rag_search retrieval modes.
+
+    python benchmarks/rag_relevance_bench.py --k 4
+    python benchmarks/rag_relevance_bench.py --queries my_queries.jsonl
+
+Each line of the queries file is {"query": ..., "expect": [...]}; a result
+counts as relevant when it contains any expected string (case-insensitive).
+Reports recall@k, MRR and latency per mode against the configured store.
+Use EMBEDDING_BACKEND=local to run without network access.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+MODES = [
+    ('vector', 'none'),
+    ('bm25', 'none'),
+    ('hybrid', 'none'),
+    ('hybrid', 'mmr'),
+    ('hybrid', 'cross-encoder'),
+]
+
+
+def load_queries(path: str) -> list[dict]:
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def first_relevant_rank(docs, expect: list[str]) -> int | None:
+    needles = [e.lower() for e in expect]
+    for rank, doc in enumerate(docs, 1):
+        text = doc.page_content.lower()
+        if any(n in text for n in needles):
+            return rank
+    return None
+
+
+def run_mode(db, queries, k, mode, rerank):
+    from rag_hybrid import hybrid_search
+
+    hits, reciprocal, latencies = 0, 0.0, []
+    for q in queries:
+        started = time.perf_counter()
+        docs = hybrid_search(db, q['query'], k=k, mode=mode, rerank=rerank)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+        rank = first_relevant_rank(docs, q['expect'])
+        if rank is not None:
+            hits += 1
+            reciprocal += 1 / rank
+
+    latencies.sort()
+    p95 = min(len(latencies) - 1, int(len(latencies) * .95))
+    return {
+        'recall': hits / len(queries),
+        'mrr': reciprocal / len(queries),
+        'p50_ms': statistics.median(latencies),
+        'p95_ms': latencies[p95],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        '--queries',
+        default=os.path.join(os.path.dirname(__file__), 'rag_queries.jsonl'),
+    )
+    parser.add_argument('--k', type=int, default=4)
+    parser.add_argument(
+        '--skip-cross-encoder', action='store_true',
+        help='do not download/run the cross-encoder model',
+    )
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+
+    from rag_store import load_rag_vectorstore
+
+    load_dotenv()
+    db = load_rag_vectorstore()
+    queries = load_queries(args.queries)
+
+    # Warm up: build the BM25 index and load models outside the timings
+    from rag_hybrid import hybrid_search
+    hybrid_search(db, 'warm up', k=1, mode='hybrid')
+
+    print(
+        f"{'mode':<24}{'recall@' + str(args.k):>10}{'MRR':>8}"
+        f"{'p50 ms':>10}{'p95 ms':>10}",
+    )
+    for mode, rerank in MODES:
+        if rerank == 'cross-encoder' and args.skip_cross_encoder:
+            continue
+        r = run_mode(db, queries, args.k, mode, rerank)
+        label = mode if rerank == 'none' else f"{mode}+{rerank}"
+        print(
+            f"{label:<24}{r['recall']:>10.2f}{r['mrr']:>8.2f}"
+            f"{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}",
+        )
+
+
+if __name__ == '__main__':
+    main()
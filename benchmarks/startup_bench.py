@@ -0,0 +1,95 @@
+"""
+Startup-time benchmark for the client-side modules.
+
+Each module is imported in a fresh interpreter several times and the
+median wall time is reported. With --compare REF the same modules are
+imported from a `git archive` of REF, e.g. the commit before lazy
+initialization:
+
+    python benchmarks/startup_bench.py --compare HEAD~1
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = ['mcp_client_call', 'rag_tool', 'chroma_run']
+
+# Dummy values: the old tree refuses to import without credentials
+BENCH_ENV = {
+    'WAZUH_USER': 'bench',
+    'WAZUH_PASSWORD': 'bench',
+    'WAZUH_INDEXER_USER': 'bench',
+    'WAZUH_INDEXER_PASSWORD': 'bench',
+    'api_key': 'sk-bench',
+}
+
+SNIPPET = (
+    'import time; t = time.perf_counter(); import {module}; '
+    'print(time.perf_counter() - t)'
+)
+
+
+def time_import(tree: str, module: str, repeats: int) -> list[float]:
+    env = {**os.environ, **BENCH_ENV, 'PYTHONDONTWRITEBYTECODE': '1'}
+    samples = []
+    for _ in range(repeats):
+        out = subprocess.run(
+            [sys.executable, '-c', SNIPPET.format(module=module)],
+            cwd=tree, env=env, capture_output=True, text=True,
+        )
+        if out.returncode != 0:
+            raise RuntimeError(
+                f"import {module} failed in {tree}:\n{out.stderr}",
+            )
+        samples.append(float(out.stdout.strip().splitlines()[-1]))
+    return samples
+
+
+def export_tree(ref: str, into: str):
+    archive = subprocess.run(
+        ['git', 'archive', ref], cwd=ROOT, capture_output=True, check=True,
+    )
+    subprocess.run(
+        ['tar', '-x', '-C', into], input=archive.stdout, check=True,
+    )
+
+
+def bench(tree: str, repeats: int) -> dict[str, float]:
+    return {
+        module: statistics.median(time_import(tree, module, repeats))
+        for module in MODULES
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--compare', metavar='REF')
+    args = parser.parse_args()
+
+    current = bench(ROOT, args.repeats)
+    baseline = None
+    if args.compare:
+        with tempfile.TemporaryDirectory() as tmp:
+            export_tree(args.compare, tmp)
+            baseline = bench(tmp, args.repeats)
+
+    print(f"{'module':<20}{'current (ms)':>14}", end='')
+    print(f"{args.compare + ' (ms)':>18}{'speedup':>10}" if baseline else '')
+    for module, seconds in current.items():
+        line = f"{module:<20}{seconds * 1000:>14.1f}"
+        if baseline:
+            before = baseline[module]
+            line += f"{before * 1000:>18.1f}{before / seconds:>9.1f}x"
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
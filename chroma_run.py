@@ -1,106 +1,162 @@
-import ast
-import json
-from typing import Any, Optional, Dict
+import asyncio
+import os
+import time
+from typing import Any, Dict
 from langchain.tools import tool
-from rag_store import load_rag_vectorstore
-from mcp_server import mcp
-
-tool_calls = {
-    "get_wazuh_vulnerabilities": {"params":{"agent_id": "001"}},
-    "custom_alert_filters": {"params":{"agent_id": "001"}},
-    "get_wazuh_processes": {"params":{"agent_id": "001"}},
-    "get_wazuh_agent_ports": {"params":{"agent_id": "001"}},
-    "custom_fim_queries": {"params":{"agent_id": "001"}},
-    "get_wazuh_manager_logs": {"params":{"limit": "50"}},
-}
-
-collection = load_rag_vectorstore()
-
-
-def save_mcp_result_to_chroma(tool_name, result, query, tag: str):
-
-
-    collection.add_texts(
-        texts=[json.dumps(result)],
-        metadatas=[
-            {
-                "type": "mcp",
-                "tool": tool_name,
-                "tag": tag,
-                "query": query
-            }
-        ],
-        ids=[f"{tool_name}-{tag}"]
-    )
-
-
-def load_mcp_result_from_chroma(tool_name: str, tag: str) -> Optional[str]:
-    docs = collection.get(
-            where={
-                "$and": [
-                    {"tool": tool_name},
-                    {"tag": tag}
-                ]
-            },
-            include=["documents"]
-        )
-    if not docs:
-        return None
-    document = docs["documents"][0] if docs["documents"] else None
-    if not document:
-        return None
+from jsonutil import dumps
+from prefetch import build_tool_calls, cache_tag
+from result_cache import result_cache
+from telemetry import record_cache
+
+tool_calls = build_tool_calls("001")
+
+# Fan-out limits for run_top5_workflow
+TOP5_CONCURRENCY = int(os.getenv("TOP5_CONCURRENCY", "6"))
+TOP5_TOOL_TIMEOUT = float(os.getenv("TOP5_TOOL_TIMEOUT", "45"))
+
+# Background refreshes for stale cache entries, keyed by cache key
+_revalidating: Dict[str, asyncio.Task] = {}
 
-    return json.loads(document) 
 
+async def get_mcp_result(tool_name: str, args: Dict[str, Any]) -> Any:
+    """Call an MCP tool in-process and return its native result."""
+    # Deferred: building the FastMCP app is only needed on a cache miss
+    from mcp_server import call_tool_native
 
-async def get_mcp_result(tool_name: str, args: Dict[str, Any]) -> str:
-    content = await mcp.call_tool(tool_name, args)
+    result = await call_tool_native(tool_name, args)
 
-    if not content:
+    if result is None or result == "":
         raise RuntimeError("There is no result from the mcp")
 
-    
-    if isinstance(content, list):
-        text = "".join([c.text if c else "" for c in content])
-    else:
-        text = str(content)
+    return result
+
+
+async def _refresh(tool_name, params, tag):
+    try:
+        result = await asyncio.wait_for(
+            get_mcp_result(tool_name, params), TOP5_TOOL_TIMEOUT
+        )
+        await asyncio.to_thread(result_cache.set, tool_name, tag, result)
+    except Exception as e:
+        print(f"Background refresh of {tool_name} failed: {e}")
+    finally:
+        _revalidating.pop(result_cache.key(tool_name, tag), None)
+
+
+def _schedule_refresh(tool_name, params, tag):
+    key = result_cache.key(tool_name, tag)
+    if key not in _revalidating:
+        _revalidating[key] = asyncio.create_task(
+            _refresh(tool_name, params, tag)
+        )
+
+
+async def _collect_tool(tool_name, params, semaphore, force_refresh=False):
+    """Cache lookup, then MCP call on miss. Returns (source, result)."""
+    tag = cache_tag(params)
+
+    async with semaphore:
+        entry = None
+        if not force_refresh:
+            # SQLite is synchronous — keep it off the event loop
+            entry = await asyncio.to_thread(result_cache.get, tool_name, tag)
+
+        if entry is not None:
+            if entry.fresh:
+                print(f"Loaded tool: {tool_name} from cache.")
+                record_cache("result", "hit")
+                return "cache", entry.value
+
+            # Stale-while-revalidate: answer now, refresh in background
+            print(f"Loaded tool: {tool_name} from stale cache, refreshing.")
+            _schedule_refresh(tool_name, params, tag)
+            record_cache("result", "stale")
+            return "stale", entry.value
 
-    # Try converting Python-like list → actual list
+        print(f"Loading: {tool_name} from mcp")
+        record_cache("result", "miss")
+        result = await asyncio.wait_for(
+            get_mcp_result(tool_name, params), TOP5_TOOL_TIMEOUT
+        )
+
+    await asyncio.to_thread(result_cache.set, tool_name, tag, result)
+    return "mcp", result
+
+
+def _report(event: Dict[str, Any]):
+    """Emit a progress event on the agent's "custom" stream, if any."""
     try:
-        parsed = ast.literal_eval(text)
-        return parsed
-    except Exception:
-        pass
+        from langgraph.config import get_stream_writer
+
+        get_stream_writer()(event)
+    except (ImportError, RuntimeError):
+        pass  # called outside a streaming agent run
+
 
-    # Fallback: return raw text if not parseable
-    return text
+async def _timed(tool_name, coro):
+    start = time.perf_counter()
+    try:
+        source, result = await coro
+        outcome = (tool_name, source, result, None)
+    except asyncio.TimeoutError:
+        outcome = (tool_name, "error", None,
+                   f"timed out after {TOP5_TOOL_TIMEOUT}s")
+    except Exception as e:
+        outcome = (tool_name, "error", None, str(e) or type(e).__name__)
+
+    elapsed = time.perf_counter() - start
+    _report({
+        "tool": tool_name,
+        "source": outcome[1],
+        "ms": round(elapsed * 1000, 1),
+    })
+    return (*outcome, elapsed)
 
 
 @tool("run_top5_workflow")
-async def run_top5_workflow(user_query: str):
+async def run_top5_workflow(
+    user_query: str, agent_id: str = "001", force_refresh: bool = False
+):
     """
-    Runs the top 5 Wazuh security issues workflow.
-    Collects data from MCP tools, uses cache if available,
-    stores results in Chroma, and returns combined results.
+    Runs the top 5 Wazuh security issues workflow for one agent.
+    Collects data from MCP tools concurrently, uses the result cache if
+    available (set force_refresh to bypass it), and returns combined results.
+    Tools that fail or time out are reported under "errors".
     """
-    
+
+    semaphore = asyncio.Semaphore(max(1, TOP5_CONCURRENCY))
+    started = time.perf_counter()
+
+    outcomes = await asyncio.gather(*(
+        _timed(
+            tool_name,
+            _collect_tool(tool_name, params, semaphore, force_refresh),
+        )
+        for tool_name, params in build_tool_calls(agent_id).items()
+    ))
+
     results: Dict[str, Any] = {}
-    
-    for tool_name,  params in tool_calls.items():
-        tag = "".join(f"{k}={v}" for k, v in tool_calls[tool_name]["params"].items())
-        cache = load_mcp_result_from_chroma(tool_name, tag)
-        if cache:
-            print(f"Loaded tool: {tool_name} from cache.")
-            results[tool_name] = cache
-            continue
-        
-        print(f"Loading: {tool_name} from mcp")
-        try:
-            result = await get_mcp_result(tool_name, params)            
+    errors: Dict[str, str] = {}
+    timings: Dict[str, Any] = {}
+
+    for tool_name, source, result, error, elapsed in outcomes:
+        timings[tool_name] = {
+            "source": source,
+            "ms": round(elapsed * 1000, 1),
+        }
+        if error is not None:
+            print(f"There was a problem with {tool_name}: {error}")
+            errors[tool_name] = error
+        else:
             results[tool_name] = result
-            save_mcp_result_to_chroma(tool_name, result, user_query, tag)
 
-        except Exception as e:
-            print(f"There was a problem: {e}")
-        
-    return json.dumps(results, ensure_ascii=False)
\ No newline at end of file
+    timings["total_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    cache_stats = result_cache.stats()
+    cache_stats.pop("ages")
+
+    return dumps({
+        "results": results,
+        "errors": errors,
+        "timings": timings,
+        "cache": cache_stats,
+    })
@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass
+from dataclasses import field
+
+from langchain.tools import tool
+
+from result_cache import REF_TOOL
+from result_cache import result_cache
+from summarizer import count_tokens
+
+# Tokens of earlier conversation sent with each question
+CONVERSATION_TOKEN_BUDGET = int(os.getenv('CONVERSATION_TOKEN_BUDGET', '3000'))
+# Most recent turns always kept verbatim, whatever the budget
+CONVERSATION_KEEP_TURNS = int(os.getenv('CONVERSATION_KEEP_TURNS', '1'))
+CONVERSATION_SUMMARY_TOKENS = int(
+    os.getenv('CONVERSATION_SUMMARY_TOKENS', '400'),
+)
+# Refs from summarized turns still listed to the model
+CONVERSATION_MAX_REFS = int(os.getenv('CONVERSATION_MAX_REFS', '20'))
+
+# Tools whose output is not worth a reference
+_NO_REF_TOOLS = {'recall_result', 'route_query'}
+
+_SUMMARY_PROMPT = """
+Summarize this conversation between a user and a Wazuh security assistant
+so the assistant can answer follow-up questions.
+Keep: agent ids, CVE ids, rule ids, hosts, processes, ports, file paths,
+counts, severities and what the user asked for. Drop pleasantries.
+Never add facts that are not in the text. At most {tokens} tokens.
+"""
+
+
+@dataclass
+class ToolRef:
+    """A tool output stored in the result cache instead of the prompt."""
+    tool: str
+    args: dict
+    ref: str
+    tokens: int
+    fetched_at: float = field(default_factory=time.time)
+
+    def describe(self) -> str:
+        args = json.dumps(self.args, sort_keys=True, default=str)
+        fetched = time.strftime('%H:%M', time.localtime(self.fetched_at))
+        return (
+            f"{self.tool} {args} → ref {self.ref} "
+            f"(~{self.tokens} tokens, fetched {fetched})"
+        )
+
+
+def remember_tool_result(tool_name: str, args: dict, content) -> ToolRef:
+    """
+    Store one tool output under a stable ref: the same tool and args
+    always map to the same ref, holding the newest data.
+    """
+    if not isinstance(content, str):
+        content = json.dumps(content, default=str)
+    key = json.dumps([tool_name, args], sort_keys=True, default=str)
+    ref = hashlib.sha1(key.encode('utf-8')).hexdigest()[:12]
+    result_cache.set(REF_TOOL, ref, content)
+    return ToolRef(tool_name, args, ref, count_tokens(content))
+
+
+def remember_outputs(outputs) -> list[ToolRef]:
+    """Refs for a turn's [(tool, args, output), ...]."""
+    return [
+        remember_tool_result(*output)
+        for output in outputs
+        if output[0] not in _NO_REF_TOOLS
+    ]
+
+
+@tool
+def recall_result(ref: str) -> str:
+    """
+    Re-read a Wazuh tool result from earlier in this conversation by its
+    ref, without calling Wazuh again. Use it for follow-up questions about
+    data that was already fetched; call the tool again for fresh data.
+    """
+    entry = result_cache.get(REF_TOOL, ref)
+    if entry is None:
+        return f"No stored result for ref {ref}; call the tool again."
+    return f"(fetched {entry.age:.0f}s ago)\n{entry.value}"
+
+
+@dataclass
+class Turn:
+    user: str
+    assistant: str
+    refs: list[ToolRef] = field(default_factory=list)
+
+    def render(self) -> list[dict]:
+        answer = self.assistant
+        if self.refs:
+            answer += '\n\n[Data used — recall_result(ref) re-reads it:\n'
+            answer += '\n'.join(f"- {r.describe()}" for r in self.refs)
+            answer += ']'
+        return [
+            {'role': 'user', 'content': self.user},
+            {'role': 'assistant', 'content': answer},
+        ]
+
+    @property
+    def tokens(self) -> int:
+        return sum(count_tokens(m['content']) for m in self.render())
+
+
+class ConversationMemory:
+    """
+    Token-budgeted conversation history.
+    - recent turns are sent verbatim; tool outputs only as refs
+    - once the budget is exceeded, the oldest turns are folded into a
+      running summary by one model call
+    - refs of summarized turns stay recallable
+    """
+
+    def __init__(
+        self,
+        token_budget: int = CONVERSATION_TOKEN_BUDGET,
+        keep_turns: int = CONVERSATION_KEEP_TURNS,
+    ):
+        self.token_budget = token_budget
+        self.keep_turns = max(1, keep_turns)
+        self.summary = ''
+        self.turns: list[Turn] = []
+        self.archived_refs: dict[str, ToolRef] = {}
+
+    def __bool__(self) -> bool:
+        return bool(self.turns or self.summary)
+
+    def add(self, user: str, assistant: str, refs: list[ToolRef]):
+        self.turns.append(Turn(user, assistant, refs))
+
+    def _context(self) -> list[dict]:
+        if not self.summary and not self.archived_refs:
+            return []
+        text = f"Summary of the earlier conversation:\n{self.summary}"
+        if self.archived_refs:
+            text += '\n\nEarlier data (recall_result(ref) re-reads it):\n'
+            text += '\n'.join(
+                f"- {r.describe()}" for r in self.archived_refs.values()
+            )
+        return [{'role': 'system', 'content': text}]
+
+    def messages(self, user_input: str) -> list[dict]:
+        """Agent input: summary, recent turns, then the new question."""
+        messages = self._context()
+        for turn in self.turns:
+            messages += turn.render()
+        messages.append({'role': 'user', 'content': user_input})
+        return messages
+
+    def tokens(self) -> int:
+        context = sum(count_tokens(m['content']) for m in self._context())
+        return context + sum(turn.tokens for turn in self.turns)
+
+    def _overflow(self) -> list[Turn]:
+        """Oldest turns that push the history over its budget."""
+        total = self.tokens()
+        old = []
+        while total > self.token_budget and len(self.turns) > self.keep_turns:
+            turn = self.turns.pop(0)
+            total -= turn.tokens
+            old.append(turn)
+        return old
+
+    async def compact(self, model):
+        old = self._overflow()
+        if not old:
+            return
+
+        for turn in old:
+            for ref in turn.refs:
+                self.archived_refs.pop(ref.ref, None)
+                self.archived_refs[ref.ref] = ref
+        while len(self.archived_refs) > CONVERSATION_MAX_REFS:
+            self.archived_refs.pop(next(iter(self.archived_refs)))
+
+        transcript = '\n\n'.join(
+            f"User: {turn.user}\nAssistant: {turn.assistant}" for turn in old
+        )
+        if self.summary:
+            transcript = f"Earlier summary:\n{self.summary}\n\n{transcript}"
+
+        try:
+            reply = await model.ainvoke([
+                ('system', _SUMMARY_PROMPT.format(
+                    tokens=CONVERSATION_SUMMARY_TOKENS,
+                )),
+                ('human', transcript),
+            ])
+            self.summary = reply.content
+        except Exception as e:
+            # Keep at least the questions rather than lose the context
+            print(f"Conversation summary failed: {e}")
+            questions = '\n'.join(f"- asked: {turn.user}" for turn in old)
+            self.summary = '\n'.join(filter(None, [self.summary, questions]))
@@ -0,0 +1,274 @@
+"""
+Multi-session web front end for the Wazuh copilot.
+
+    python copilot_web.py            # http://127.0.0.1:8090
+
+Binding to any other address requires COPILOT_WEB_TOKEN; every request
+must then carry it as "Authorization: Bearer <token>" or ?token=<token>.
+
+One Copilot (agent, MCP client, vector store) is shared by every session;
+each session id keeps its own conversation history.
+
+    GET  /            minimal chat page
+    WS   /ws          send {"session", "message"}, receive streamed events
+    POST /chat        {"session", "message"} -> {"session", "answer"}
+    GET  /sessions    active session count
+    GET  /metrics     Prometheus metrics (LLM, embeddings, caches)
+"""
+from __future__ import annotations
+
+import asyncio
+import hmac
+import ipaddress
+import os
+import time
+import uuid
+from contextlib import asynccontextmanager
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.requests import HTTPConnection
+from starlette.requests import Request
+from starlette.responses import HTMLResponse
+from starlette.responses import JSONResponse
+from starlette.responses import Response
+from starlette.routing import Route
+from starlette.routing import WebSocketRoute
+from starlette.websockets import WebSocket
+from starlette.websockets import WebSocketDisconnect
+
+from telemetry import metrics_payload
+from wazuh_client import ChatSession
+from wazuh_client import Copilot
+
+COPILOT_WEB_HOST = os.getenv('COPILOT_WEB_HOST', '127.0.0.1')
+# Shared secret; required when COPILOT_WEB_HOST is not a loopback address
+COPILOT_WEB_TOKEN = os.getenv('COPILOT_WEB_TOKEN', '')
+COPILOT_WEB_PORT = int(os.getenv('COPILOT_WEB_PORT', '8090'))
+# Idle seconds before a session's history is dropped
+COPILOT_SESSION_TTL = float(os.getenv('COPILOT_SESSION_TTL', '3600'))
+COPILOT_MAX_SESSIONS = int(os.getenv('COPILOT_MAX_SESSIONS', '200'))
+# Questions answered at once across all sessions (LLM + Wazuh load)
+COPILOT_MAX_CONCURRENT = int(os.getenv('COPILOT_MAX_CONCURRENT', '8'))
+
+
+class SessionStore:
+    """Session id -> ChatSession, expiring idle and oldest sessions."""
+
+    def __init__(self, copilot, ttl=COPILOT_SESSION_TTL,
+                 max_sessions=COPILOT_MAX_SESSIONS):
+        self.copilot = copilot
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.sessions: dict[str, ChatSession] = {}
+
+    def get(self, session_id: str | None) -> tuple[str, ChatSession]:
+        self.expire()
+        session_id = session_id or uuid.uuid4().hex
+        session = self.sessions.get(session_id)
+        if session is None:
+            if len(self.sessions) >= self.max_sessions:
+                oldest = min(
+                    self.sessions,
+                    key=lambda sid: self.sessions[sid].last_active,
+                )
+                del self.sessions[oldest]
+            session = self.sessions[session_id] = ChatSession(self.copilot)
+        return session_id, session
+
+    def expire(self):
+        cutoff = time.monotonic() - self.ttl
+        for sid in [
+            sid for sid, s in self.sessions.items()
+            if s.last_active < cutoff and not s.lock.locked()
+        ]:
+            del self.sessions[sid]
+
+
+store: SessionStore | None = None
+_slots = asyncio.Semaphore(max(1, COPILOT_MAX_CONCURRENT))
+
+
+async def ask(session, message, emit):
+    async with _slots:
+        return await session.ask(message, emit)
+
+
+# ============================================================
+#  Access token
+# ============================================================
+def is_loopback(host: str) -> bool:
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def authorized(conn: HTTPConnection, token: str) -> bool:
+    if not token:
+        return True
+    scheme, _, given = conn.headers.get('authorization', '').partition(' ')
+    if scheme.lower() != 'bearer':
+        given = conn.query_params.get('token', '')
+    return hmac.compare_digest(given.encode(), token.encode())
+
+
+class TokenAuth:
+    """Reject HTTP and WebSocket requests without COPILOT_WEB_TOKEN."""
+
+    def __init__(self, app, token: str = COPILOT_WEB_TOKEN):
+        self.app = app
+        self.token = token
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] in ('http', 'websocket') and not authorized(
+            HTTPConnection(scope), self.token,
+        ):
+            if scope['type'] == 'websocket':
+                # Closing before accept rejects the handshake (HTTP 403)
+                return await send({'type': 'websocket.close', 'code': 1008})
+            response = JSONResponse({'error': 'unauthorized'}, status_code=401)
+            return await response(scope, receive, send)
+        await self.app(scope, receive, send)
+
+
+# ============================================================
+#  Routes
+# ============================================================
+async def chat(request: Request):
+    body = await request.json()
+    message = str(body.get('message', '')).strip()
+    if not message:
+        return JSONResponse({'error': 'message is required'}, status_code=400)
+
+    session_id, session = store.get(body.get('session'))
+
+    async def ignore(kind, payload):
+        pass
+
+    answer = await ask(session, message, ignore)
+    return JSONResponse({'session': session_id, 'answer': answer})
+
+
+async def websocket_chat(websocket: WebSocket):
+    await websocket.accept()
+    session_id = websocket.query_params.get('session')
+
+    async def emit(kind, payload):
+        await websocket.send_json({'type': kind, 'data': payload})
+
+    try:
+        while True:
+            body = await websocket.receive_json()
+            message = str(body.get('message', '')).strip()
+            session_id, session = store.get(body.get('session') or session_id)
+            if not message:
+                await emit('error', 'message is required')
+                continue
+            try:
+                answer = await ask(session, message, emit)
+            except Exception as e:
+                await emit('error', str(e) or type(e).__name__)
+                continue
+            await websocket.send_json({
+                'type': 'answer', 'session': session_id, 'data': answer,
+            })
+    except WebSocketDisconnect:
+        pass
+
+
+async def sessions(request: Request):
+    store.expire()
+    return JSONResponse({'sessions': len(store.sessions)})
+
+
+async def metrics(request: Request):
+    body, content_type, status = metrics_payload()
+    return Response(body, status_code=status, media_type=content_type)
+
+
+async def index(request: Request):
+    return HTMLResponse(PAGE)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    global store
+    store = SessionStore(await Copilot.create())
+    yield
+
+
+app = Starlette(
+    routes=[
+        Route('/', index),
+        Route('/chat', chat, methods=['POST']),
+        Route('/sessions', sessions),
+        Route('/metrics', metrics),
+        WebSocketRoute('/ws', websocket_chat),
+    ],
+    middleware=[Middleware(TokenAuth)],
+    lifespan=lifespan,
+)
+
+
+PAGE = """<!doctype html>
+<html><head><meta charset="utf-8"><title>Wazuh Copilot</title>
+<style>
+body{font-family:sans-serif;max-width:900px;margin:2em auto}
+#log{white-space:pre-wrap;border:1px solid #ccc;padding:1em;height:70vh;
+overflow-y:auto}.tool{color:#888}input{width:85%}
+</style></head><body>
+<h2>Wazuh Copilot</h2><div id="log"></div>
+<form id="f"><input id="q" autocomplete="off" autofocus><button>Ask</button>
+</form>
+<script>
+const log = document.getElementById('log');
+let session = sessionStorage.getItem('copilot-session') || '';
+const token = new URLSearchParams(location.search).get('token') || '';
+const ws = new WebSocket(
+  (location.protocol === 'https:' ? 'wss://' : 'ws://') + location.host +
+  '/ws?session=' + session + '&token=' + encodeURIComponent(token));
+function add(text, cls) {
+  const span = document.createElement('span');
+  if (cls) span.className = cls;
+  span.textContent = text; log.appendChild(span);
+  log.scrollTop = log.scrollHeight;
+}
+ws.onmessage = (e) => {
+  const m = JSON.parse(e.data);
+  if (m.type === 'start') add('\\nAssistant: ');
+  else if (m.type === 'token') add(m.data);
+  else if (m.type === 'cached') add('\\nAssistant (cached): ' + m.data);
+  else if (m.type === 'route') add('\\n⚡ ' + m.data.tool, 'tool');
+  else if (m.type === 'tool_call') add('\\n🔧 ' + m.data + ' ...', 'tool');
+  else if (m.type === 'tool_result') add('\\n✅ ' + m.data + '\\n', 'tool');
+  else if (m.type === 'progress')
+    add('\\n   · ' + m.data.tool + ' (' + m.data.ms + ' ms)', 'tool');
+  else if (m.type === 'error') add('\\nError: ' + m.data + '\\n', 'tool');
+  else if (m.type === 'answer') {
+    session = m.session; sessionStorage.setItem('copilot-session', session);
+    add('\\n\\n');
+  }
+};
+document.getElementById('f').onsubmit = (e) => {
+  e.preventDefault();
+  const q = document.getElementById('q');
+  if (!q.value.trim()) return;
+  add('You: ' + q.value + '\\n');
+  ws.send(JSON.stringify({session: session, message: q.value}));
+  q.value = '';
+};
+</script></body></html>
+"""
+
+
+if __name__ == '__main__':
+    if not COPILOT_WEB_TOKEN and not is_loopback(COPILOT_WEB_HOST):
+        raise SystemExit(
+            f"COPILOT_WEB_HOST={COPILOT_WEB_HOST} exposes fleet data beyond "
+            'this machine; set COPILOT_WEB_TOKEN as well.',
+        )
+    uvicorn.run(app, host=COPILOT_WEB_HOST, port=COPILOT_WEB_PORT)
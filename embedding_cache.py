@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+from langchain_core.embeddings import Embeddings
+
+from telemetry import record_cache
+from telemetry import timed_embedding
+
+EMBEDDING_BACKEND = os.getenv('EMBEDDING_BACKEND', 'openai')
+EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL', '')
+EMBEDDING_BATCH_SIZE = int(os.getenv('EMBEDDING_BATCH_SIZE', '128'))
+EMBEDDING_CACHE_PATH = os.getenv(
+    'EMBEDDING_CACHE_PATH', './rag_chroma/embedding_cache.sqlite3',
+)
+EMBEDDING_CACHE_MAX_ENTRIES = int(
+    os.getenv('EMBEDDING_CACHE_MAX_ENTRIES', '10000'),
+)
+
+DEFAULT_LOCAL_MODEL = 'sentence-transformers/all-MiniLM-L6-v2'
+
+
+class LocalEmbeddings(Embeddings):
+    """
+    CPU sentence-transformers model, no network needed once downloaded.
+    EMBEDDING_LOCAL_RUNTIME=onnx uses the ONNX runtime when available.
+    """
+
+    def __init__(self, model_name: str = DEFAULT_LOCAL_MODEL):
+        from sentence_transformers import SentenceTransformer
+
+        runtime = os.getenv('EMBEDDING_LOCAL_RUNTIME', 'torch')
+        kwargs = {'backend': runtime} if runtime != 'torch' else {}
+        self.model_name = model_name
+        self.model = SentenceTransformer(model_name, device='cpu', **kwargs)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        vectors = self.model.encode(
+            texts, batch_size=EMBEDDING_BATCH_SIZE, normalize_embeddings=True,
+        )
+        return [v.tolist() for v in vectors]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+
+def build_backend(
+    backend: str = EMBEDDING_BACKEND, model: str = EMBEDDING_MODEL,
+) -> tuple[Embeddings, str]:
+    """Return (embeddings, model id). The id namespaces the cache."""
+    if backend == 'local':
+        name = model or DEFAULT_LOCAL_MODEL
+        return LocalEmbeddings(name), f"local:{name}"
+
+    from langchain_openai import OpenAIEmbeddings
+
+    name = model or 'text-embedding-ada-002'
+    return (
+        OpenAIEmbeddings(
+            model=name,
+            openai_api_key=os.getenv('api_key'),
+            chunk_size=EMBEDDING_BATCH_SIZE,
+        ),
+        f"openai:{name}",
+    )
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Content-hash keyed embedding cache.
+    - in-memory LRU in front of a SQLite file
+    - cache misses are embedded in batches of EMBEDDING_BATCH_SIZE
+    - stats() reports hit rates and backend latency
+    """
+
+    def __init__(
+        self,
+        backend: Embeddings,
+        model_id: str,
+        path: str = EMBEDDING_CACHE_PATH,
+        max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES,
+        batch_size: int = EMBEDDING_BATCH_SIZE,
+    ):
+        self.backend = backend
+        self.model_id = model_id
+        self.path = path
+        self.max_entries = max_entries
+        self.batch_size = batch_size
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.backend_calls = 0
+        self.backend_seconds = 0.0
+
+        self._memory: OrderedDict[str, list[float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: sqlite3.Connection | None = None
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS embeddings ('
+                ' key TEXT PRIMARY KEY, vector BLOB NOT NULL)',
+            )
+            self._db.commit()
+        return self._db
+
+    def _key(self, kind: str, text: str) -> str:
+        digest = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        return f"{self.model_id}:{kind}:{digest}"
+
+    def _remember(self, key: str, vector: list[float]):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _lookup(self, keys: list[str]) -> dict[str, list[float]]:
+        found: dict[str, list[float]] = {}
+        with self._lock:
+            for key in keys:
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    found[key] = self._memory[key]
+            self.memory_hits += len(found)
+
+            missing = [k for k in set(keys) if k not in found]
+            for start in range(0, len(missing), 500):
+                chunk = missing[start:start + 500]
+                rows = self._conn().execute(
+                    'SELECT key, vector FROM embeddings WHERE key IN '
+                    f"({','.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall()
+                for key, blob in rows:
+                    vector = array('f', blob).tolist()
+                    found[key] = vector
+                    self._remember(key, vector)
+                    self.disk_hits += 1
+        return found
+
+    def _store(self, items: dict[str, list[float]]):
+        with self._lock:
+            self._conn().executemany(
+                'INSERT OR REPLACE INTO embeddings VALUES (?, ?)',
+                [(k, array('f', v).tobytes()) for k, v in items.items()],
+            )
+            self._conn().commit()
+            for key, vector in items.items():
+                self._remember(key, vector)
+
+    def _embed(self, kind: str, texts: list[str]) -> list[list[float]]:
+        keys = [self._key(kind, t) for t in texts]
+        found = self._lookup(keys)
+        record_cache('embedding', 'hit', len(found))
+
+        # Unique texts that still need the backend, in first-seen order
+        todo: dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in todo:
+                todo[key] = text
+        self.misses += len(todo)
+        record_cache('embedding', 'miss', len(todo))
+
+        pending = list(todo.items())
+        for start in range(0, len(pending), self.batch_size):
+            batch = pending[start:start + self.batch_size]
+            began = time.perf_counter()
+            with timed_embedding(self.model_id, len(batch)):
+                if kind == 'query':
+                    vectors = [self.backend.embed_query(t) for _, t in batch]
+                else:
+                    vectors = self.backend.embed_documents(
+                        [t for _, t in batch],
+                    )
+            self.backend_seconds += time.perf_counter() - began
+            self.backend_calls += 1
+
+            fresh = {key: vec for (key, _), vec in zip(batch, vectors)}
+            self._store(fresh)
+            found.update(fresh)
+
+        return [found[key] for key in keys]
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self._embed('doc', texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._embed('query', [text])[0]
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            'model': self.model_id,
+            'memory_hits': self.memory_hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_ratio': (
+                round((self.memory_hits + self.disk_hits) / lookups, 3)
+                if lookups else 0.0
+            ),
+            'backend_calls': self.backend_calls,
+            'backend_avg_ms': (
+                round(self.backend_seconds * 1000 / self.backend_calls, 1)
+                if self.backend_calls else 0.0
+            ),
+        }
+
+
+def load_cached_embeddings() -> CachedEmbeddings:
+    backend, model_id = build_backend()
+    return CachedEmbeddings(backend, model_id)
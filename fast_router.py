@@ -0,0 +1,238 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from dataclasses import field
+
+DEFAULT_AGENT_ID = '001'
+
+# "agent 2", "agent id 002", "agent #017"
+_NAMED_AGENT = r"\bagent\s*(?:id\s*)?#?\s*(\d{1,5})\b"
+_NAMED_AGENT_ID = re.compile(_NAMED_AGENT)
+# ... or "on 001"
+_AGENT_ID = re.compile(rf"{_NAMED_AGENT}|\b(?:on|for)\s+(\d{{3,5}})\b")
+
+# Questions asking for an explanation go to the LLM (it needs the RAG)
+_EXPLAIN = re.compile(
+    r"^\s*(why|how (do|does|can|to)|what (does|is|are)|explain|describe)\b",
+)
+
+# Questions about many agents; single-agent tools must not answer them
+_FLEET = re.compile(
+    r"\b(which|what|how many)\s+(agents?|hosts?|machines?|servers?"
+    r"|endpoints?)\b|\bacross\b|\bfleet\b|\beverywhere\b"
+    r"|\b(all|every|any)\s+(agents?|hosts?|machines?|servers?|endpoints?)\b"
+    r"|\bwhere\s+is\b.*\brunning\b",
+)
+
+# Parameters of the inventory tools
+_PORT = re.compile(
+    r"\bport\s*#?\s*(\d{1,5})\b|\b(\d{1,5})\s*/\s*(?:tcp|udp)\b"
+    r"|\blisten\w*\s+on\s+(\d{1,5})\b",
+)
+_NAME = r"([a-z0-9_][\w.+\-]*)"
+_PROCESS = re.compile(
+    rf"\bwhere\s+is\s+(?:the\s+)?(?:process\s+)?{_NAME}\s+running\b"
+    rf"|\bprocess(?:es)?\s+(?:named\s+|called\s+)?{_NAME}"
+    rf"|\b(?:run|runs|running)\s+(?:the\s+)?(?:process\s+)?{_NAME}",
+)
+_PACKAGE = re.compile(
+    rf"\b(?:package|software)\s+(?:named\s+|called\s+)?{_NAME}"
+    rf"|\b(?:have|has)\s+{_NAME}\s+installed\b"
+    rf"|\binstalled\s+(?:the\s+)?{_NAME}\b",
+)
+_HOTFIX = re.compile(r"\b(kb\d{6,8})\b")
+_MISSING = re.compile(
+    r"\b(missing|lack\w*|without|not\s+installed|do(es)?\s*n[o']t\s+have)\b",
+)
+# Words the name patterns can catch that are never a process / package
+_NOT_A_NAME = {
+    'on', 'in', 'across', 'the', 'a', 'an', 'any', 'all', 'is', 'are',
+    'agents', 'agent', 'hosts', 'host', 'fleet', 'running', 'installed',
+    'process', 'processes', 'package', 'packages', 'where', 'which',
+}
+
+
+@dataclass(frozen=True)
+class Intent:
+    name: str
+    pattern: re.Pattern
+    tool: str
+    # Which params the tool takes: "agent" → {"agent_id": ...}
+    args: str = 'agent'
+    extra: dict = field(default_factory=dict)
+    # "agent": single-agent questions only, "fleet": fleet wording
+    # required, "any": both
+    scope: str = 'agent'
+
+
+# Order matters: the first matching intent wins.
+INTENTS = [
+    Intent(
+        'inventory_hotfixes', _HOTFIX, 'inventory_hotfixes',
+        args='hotfix', scope='any',
+    ),
+    Intent(
+        'inventory_ports',
+        re.compile(r"\bports?\b|\blisten\w*\b"),
+        'inventory_ports', args='port', scope='fleet',
+    ),
+    Intent(
+        'inventory_packages',
+        re.compile(r"\bpackages?\b|\bsoftware\b|\binstalled\b"),
+        'inventory_packages', args='package', scope='fleet',
+    ),
+    Intent(
+        'inventory_processes',
+        re.compile(r"\bprocess(es)?\b|\brun(s|ning)?\b"),
+        'inventory_processes', args='process', scope='fleet',
+    ),
+    Intent(
+        'fleet_top_issues',
+        re.compile(r"\b(top|issues|threats)\b"),
+        'top_issues_summary', args='fleet', scope='fleet',
+    ),
+    Intent(
+        'top5',
+        re.compile(
+            r"\btop\s*(5|five)\b|\b(security\s+)?issues\b|\bfind threats\b"
+            r"|\bscan\s+(my|the|agent|through)\b|\bcheck my (pc|computer)\b",
+        ),
+        'run_top5_workflow', args='workflow',
+    ),
+    Intent(
+        'vulnerabilities',
+        re.compile(r"\bvulnerab\w*|\bcves?\b"),
+        'get_wazuh_vulnerabilities',
+    ),
+    Intent(
+        'fim',
+        re.compile(r"\bfile integrity\b|\bfim\b|\bsyscheck\b"),
+        'custom_fim_queries',
+    ),
+    Intent(
+        'alerts',
+        re.compile(r"\balerts?\b"),
+        'custom_alert_filters',
+    ),
+    Intent(
+        'processes',
+        re.compile(r"\bprocess(es)?\b"),
+        'get_wazuh_processes',
+    ),
+    Intent(
+        'ports',
+        re.compile(r"\bports?\b"),
+        'get_wazuh_agent_ports',
+    ),
+    Intent(
+        'cluster_health',
+        re.compile(r"\bcluster\b.*\b(health|status)\b"),
+        'get_wazuh_cluster_health', args='none',
+    ),
+    Intent(
+        'rules_summary',
+        re.compile(r"\bhow many rules\b|\brules?\s+(summary|installed)\b"),
+        'get_wazuh_rules_summary', args='none',
+    ),
+    Intent(
+        'manager_logs',
+        re.compile(r"\bmanager logs?\b|\blogs?\b"),
+        'get_wazuh_manager_logs', args='limit', extra={'limit': '50'},
+    ),
+]
+
+
+@dataclass
+class Route:
+    intent: str
+    tool: str
+    arguments: dict
+
+
+def extract_agent_id(text: str, named_only: bool = False) -> str | None:
+    """
+    named_only: only "agent 001" wording counts, for questions where a
+    bare number after "on" is a port ("listen on 3389")
+    """
+    pattern = _NAMED_AGENT_ID if named_only else _AGENT_ID
+    match = pattern.search(text.lower())
+    if not match:
+        return None
+    return next(g for g in match.groups() if g).zfill(3)
+
+
+def _name(pattern: re.Pattern, q: str) -> str | None:
+    for match in pattern.finditer(q):
+        name = next((g for g in match.groups() if g), None)
+        if name and name not in _NOT_A_NAME:
+            return name
+    return None
+
+
+def _inventory_params(intent: Intent, q: str) -> dict | None:
+    """Tool params for an inventory intent, None if a value is missing."""
+    if intent.args == 'hotfix':
+        params = {'hotfix': _HOTFIX.search(q).group(1).upper()}
+        if _MISSING.search(q):
+            params['missing'] = 'true'
+        return params
+    if intent.args == 'port':
+        match = _PORT.search(q)
+        if match is None:
+            return None
+        params = {'port': next(g for g in match.groups() if g)}
+        if 'listen' in q:
+            params['state'] = 'listening'
+        return params
+    pattern = _PROCESS if intent.args == 'process' else _PACKAGE
+    name = _name(pattern, q)
+    return {'name': name} if name else None
+
+
+def classify(query: str) -> Intent | None:
+    """
+    First intent matching the question's wording and scope. Fleet-wide
+    questions only match intents that can answer for many agents.
+    """
+    q = query.lower()
+    fleet = _FLEET.search(q) is not None
+    for intent in INTENTS:
+        if intent.scope != 'any' and (intent.scope == 'fleet') != fleet:
+            continue
+        if intent.pattern.search(q):
+            return intent
+    return None
+
+
+def route(query: str) -> Route | None:
+    """
+    Map a question to a direct tool call, or None when the LLM should
+    handle it (explanations, or no intent matched).
+    """
+    q = query.lower()
+    intent = classify(q)
+    if intent is None:
+        return None
+    if _EXPLAIN.search(q) and intent.name != 'top5':
+        return None
+
+    if intent.args in ('hotfix', 'port', 'process', 'package'):
+        params = _inventory_params(intent, q)
+        if params is None:
+            return None
+        params['agents'] = extract_agent_id(q, named_only=True) or '*'
+        return Route(intent.name, intent.tool, {'params': params})
+
+    agent_id = extract_agent_id(q) or DEFAULT_AGENT_ID
+    if intent.args == 'workflow':
+        arguments = {'user_query': query, 'agent_id': agent_id}
+    elif intent.args == 'fleet':
+        arguments = {'params': {'agents': '*'}}
+    elif intent.args == 'agent':
+        arguments = {'params': {'agent_id': agent_id, **intent.extra}}
+    elif intent.args == 'limit':
+        arguments = {'params': dict(intent.extra)}
+    else:
+        arguments = {'params': {}}
+    return Route(intent.name, intent.tool, arguments)
@@ -0,0 +1,426 @@
+from __future__ import annotations
+
+import os
+
+VULNERABILITIES_INDEX = '/wazuh-states-vulnerabilities-*'
+ALERTS_INDEX = '/wazuh-alerts-*'
+FIM_INDEX = '/wazuh-syscheck-*'
+
+# Upper bound on agent buckets for wildcard / all-agent fleet queries
+FLEET_MAX_AGENTS = int(os.getenv('FLEET_MAX_AGENTS', '500'))
+# Smallest share of a fleet response budget worth giving one agent
+FLEET_AGENT_TOKENS = int(os.getenv('FLEET_AGENT_TOKENS', '150'))
+
+# How each index is ranked when only a few documents per agent are kept
+INDEX_SORT = {
+    VULNERABILITIES_INDEX: [
+        {
+            'vulnerability.score.base': {
+                'order': 'desc', 'unmapped_type': 'float',
+            },
+        },
+    ],
+    ALERTS_INDEX: [
+        {'rule.level': {'order': 'desc', 'unmapped_type': 'long'}},
+        {'@timestamp': {'order': 'desc'}},
+    ],
+    FIM_INDEX: [
+        {'@timestamp': {'order': 'desc'}},
+    ],
+}
+
+
+# _source projection and ranking field used when streaming large result sets
+STREAM_FIELDS = {
+    VULNERABILITIES_INDEX: {
+        'source': [
+            'agent.id', 'vulnerability.id', 'vulnerability.severity',
+            'vulnerability.score.base', 'package.name', 'package.version',
+        ],
+        'rank': 'vulnerability.score.base',
+        'group': 'vulnerability.severity',
+    },
+    ALERTS_INDEX: {
+        'source': [
+            '@timestamp', 'agent.id', 'rule.id', 'rule.level',
+            'rule.description',
+        ],
+        'rank': 'rule.level',
+        'group': 'rule.level',
+    },
+    FIM_INDEX: {
+        'source': [
+            '@timestamp', 'agent.id', 'syscheck.path', 'syscheck.event',
+            'rule.level',
+        ],
+        'rank': 'rule.level',
+        'group': 'syscheck.event',
+    },
+}
+
+
+def dotted_get(doc: dict, path: str, default=None):
+    """doc["a"]["b"] for path "a.b", tolerating flat dotted keys."""
+    if path in doc:
+        return doc[path]
+    current = doc
+    for part in path.split('.'):
+        if not isinstance(current, dict) or part not in current:
+            return default
+        current = current[part]
+    return current
+
+
+def parse_agent_selector(raw) -> tuple[str, list[str] | str | None]:
+    """
+    Normalize an agent selector into (kind, value).
+    - "*" / "" / None            → ("all", None)
+    - "group:linux"              → ("group", "linux")
+    - "00*" (wildcard)           → ("wildcard", "00*")
+    - "001,002" or ["001", ...]  → ("ids", ["001", "002"])
+    """
+    if raw is None:
+        return 'all', None
+    if isinstance(raw, (list, tuple)):
+        ids = [str(a).strip() for a in raw if str(a).strip()]
+        return ('ids', ids) if ids else ('all', None)
+
+    text = str(raw).strip()
+    if text in ('', '*'):
+        return 'all', None
+    if text.startswith('group:'):
+        return 'group', text[len('group:'):].strip()
+    if '*' in text or '?' in text:
+        return 'wildcard', text
+    return 'ids', [a.strip() for a in text.split(',') if a.strip()]
+
+
+def agent_filter(kind: str, value) -> list[dict]:
+    """Bool filter clauses for an already-resolved agent selector."""
+    if kind == 'ids':
+        return [{'terms': {'agent.id': value}}]
+    if kind == 'wildcard':
+        return [{'wildcard': {'agent.id': value}}]
+    return []
+
+
+def fleet_top_hits_body(
+    index: str,
+    filters: list[dict],
+    per_agent: int,
+    agent_buckets: int = FLEET_MAX_AGENTS,
+) -> dict:
+    """
+    One query for many agents: terms on agent.id with the top documents
+    of each agent as a top_hits sub-aggregation, plus a count of all
+    matching agents so a cut at agent_buckets is visible.
+    """
+    return {
+        'size': 0,
+        'query': {'bool': {'filter': filters}},
+        'aggs': {
+            # 40000 is the highest threshold; counts are exact below it
+            'agent_count': {
+                'cardinality': {
+                    'field': 'agent.id', 'precision_threshold': 40000,
+                },
+            },
+            'per_agent': {
+                'terms': {'field': 'agent.id', 'size': agent_buckets},
+                'aggs': {
+                    'top': {
+                        'top_hits': {
+                            'size': per_agent,
+                            'sort': INDEX_SORT.get(index, []),
+                        },
+                    },
+                },
+            },
+        },
+    }
+
+
+def group_top_hits(result: dict) -> dict[str, dict]:
+    """Turn the per_agent aggregation into {agent_id: {total, items}}."""
+    buckets = (
+        result.get('aggregations', {})
+        .get('per_agent', {})
+        .get('buckets', [])
+    )
+    grouped = {}
+    for bucket in buckets:
+        hits = bucket.get('top', {}).get('hits', {}).get('hits', [])
+        grouped[bucket['key']] = {
+            'total': bucket.get('doc_count', 0),
+            'items': [hit.get('_source', {}) for hit in hits],
+        }
+    return grouped
+
+
+def fleet_agent_count(result: dict) -> tuple[int, bool]:
+    """(agents matching a fleet query, whether agent buckets were cut)."""
+    aggs = result.get('aggregations', {})
+    per_agent = aggs.get('per_agent', {})
+    shown = len(per_agent.get('buckets', []))
+    cut = per_agent.get('sum_other_doc_count', 0) > 0
+    count = aggs.get('agent_count', {}).get('value', shown)
+    return max(count, shown + 1 if cut else shown), cut
+
+
+def fit_fleet_budget(
+    grouped: dict[str, dict],
+    token_budget: int,
+    agent_tokens: int = FLEET_AGENT_TOKENS,
+) -> tuple[dict[str, dict], int, int]:
+    """
+    Split one response budget across agents. The agents with the most
+    documents are kept; the rest are left out rather than each given a
+    share too small to hold an item. Returns (kept, share, omitted).
+    """
+    room = max(1, token_budget // max(1, agent_tokens))
+    ranked = sorted(
+        grouped.items(), key=lambda kv: kv[1]['total'], reverse=True,
+    )
+    kept = dict(ranked[:room])
+    share = token_budget // max(1, len(kept))
+    return kept, share, len(grouped) - len(kept)
+
+# ------------------------------------------------------------
+#  server-side ranking (aggregations only, no raw hits shipped)
+# ------------------------------------------------------------
+def time_filter(since: str | None) -> list[dict]:
+    """`since` is an OpenSearch date-math offset such as 24h or 7d."""
+    if not since:
+        return []
+    return [{'range': {'@timestamp': {'gte': f"now-{since}"}}}]
+
+
+def top_alert_rules_body(filters: list[dict], size: int) -> dict:
+    """Rules ranked by highest level seen, then by how often they fired."""
+    return {
+        'size': 0,
+        'query': {'bool': {'filter': filters}},
+        'aggs': {
+            'by_level': {'terms': {'field': 'rule.level', 'size': 16}},
+            'rules': {
+                'terms': {
+                    'field': 'rule.id',
+                    'size': size,
+                    'order': [{'max_level': 'desc'}, {'_count': 'desc'}],
+                },
+                'aggs': {
+                    'max_level': {'max': {'field': 'rule.level'}},
+                    'agents': {'terms': {'field': 'agent.id', 'size': 5}},
+                    'last_seen': {'max': {'field': '@timestamp'}},
+                    'sample': {
+                        'top_hits': {
+                            'size': 1,
+                            '_source': [
+                                'rule.description', 'rule.groups',
+                                'rule.mitre.id',
+                            ],
+                        },
+                    },
+                },
+            },
+        },
+    }
+
+
+def active_agents_body(filters: list[dict], size: int) -> dict:
+    """Agents ranked by alert volume."""
+    return {
+        'size': 0,
+        'query': {'bool': {'filter': filters}},
+        'aggs': {'agents': {'terms': {'field': 'agent.id', 'size': size}}},
+    }
+
+
+def top_vulnerabilities_body(filters: list[dict], size: int) -> dict:
+    """CVEs ranked by CVSS base score, then by number of affected agents."""
+    return {
+        'size': 0,
+        'query': {'bool': {'filter': filters}},
+        'aggs': {
+            'by_severity': {
+                'terms': {'field': 'vulnerability.severity', 'size': 8},
+            },
+            'cves': {
+                'terms': {
+                    'field': 'vulnerability.id',
+                    'size': size,
+                    'order': [{'max_score': 'desc'}, {'agent_count': 'desc'}],
+                },
+                'aggs': {
+                    'max_score': {
+                        'max': {'field': 'vulnerability.score.base'},
+                    },
+                    'agent_count': {'cardinality': {'field': 'agent.id'}},
+                    'agents': {'terms': {'field': 'agent.id', 'size': 5}},
+                    'sample': {
+                        'top_hits': {
+                            'size': 1,
+                            '_source': [
+                                'vulnerability.severity',
+                                'vulnerability.description',
+                                'package.name', 'package.version',
+                            ],
+                        },
+                    },
+                },
+            },
+        },
+    }
+
+
+def alert_histogram_body(filters: list[dict], interval: str) -> dict:
+    """Alert counts and worst level per time bucket."""
+    return {
+        'size': 0,
+        'query': {'bool': {'filter': filters}},
+        'aggs': {
+            'timeline': {
+                'date_histogram': {
+                    'field': '@timestamp',
+                    'fixed_interval': interval,
+                    'min_doc_count': 1,
+                },
+                'aggs': {
+                    'max_level': {'max': {'field': 'rule.level'}},
+                    'high': {'filter': {'range': {'rule.level': {'gte': 10}}}},
+                },
+            },
+        },
+    }
+
+
+def _sample_source(bucket: dict) -> dict:
+    hits = bucket.get('sample', {}).get('hits', {}).get('hits', [])
+    return hits[0].get('_source', {}) if hits else {}
+
+
+def _bucket_keys(bucket: dict, name: str) -> list:
+    return [b['key'] for b in bucket.get(name, {}).get('buckets', [])]
+
+
+def summarize_top_alert_rules(result: dict) -> dict:
+    aggs = result.get('aggregations', {})
+    rules = []
+    for bucket in aggs.get('rules', {}).get('buckets', []):
+        rule = _sample_source(bucket).get('rule', {})
+        rules.append({
+            'rule_id': bucket['key'],
+            'level': bucket.get('max_level', {}).get('value'),
+            'count': bucket.get('doc_count', 0),
+            'description': rule.get('description'),
+            'groups': rule.get('groups'),
+            'agents': _bucket_keys(bucket, 'agents'),
+            'last_seen': bucket.get('last_seen', {}).get('value_as_string'),
+        })
+    return {
+        'by_level': {
+            str(b['key']): b['doc_count']
+            for b in aggs.get('by_level', {}).get('buckets', [])
+        },
+        'rules': rules,
+    }
+
+
+def summarize_top_vulnerabilities(result: dict) -> dict:
+    aggs = result.get('aggregations', {})
+    cves = []
+    for bucket in aggs.get('cves', {}).get('buckets', []):
+        source = _sample_source(bucket)
+        vuln = source.get('vulnerability', {})
+        package = source.get('package', {})
+        cves.append({
+            'cve': bucket['key'],
+            'score': bucket.get('max_score', {}).get('value'),
+            'severity': vuln.get('severity'),
+            'package': package.get('name'),
+            'version': package.get('version'),
+            'agent_count': bucket.get('agent_count', {}).get('value'),
+            'agents': _bucket_keys(bucket, 'agents'),
+            'description': (vuln.get('description') or '')[:200],
+        })
+    return {
+        'by_severity': {
+            b['key']: b['doc_count']
+            for b in aggs.get('by_severity', {}).get('buckets', [])
+        },
+        'cves': cves,
+    }
+
+
+def summarize_alert_histogram(result: dict) -> list[dict]:
+    buckets = (
+        result.get('aggregations', {}).get('timeline', {}).get('buckets', [])
+    )
+    return [
+        {
+            'time': b.get('key_as_string', b['key']),
+            'count': b['doc_count'],
+            'max_level': b.get('max_level', {}).get('value'),
+            'high': b.get('high', {}).get('doc_count', 0),
+        }
+        for b in buckets
+    ]
+
+
+def rank_top_issues(alerts: dict, vulns: dict, limit: int = 5) -> list[dict]:
+    """
+    Merge ranked rules and CVEs onto one 0-10 scale:
+    CVSS base score as is, rule level (0-15) scaled by 2/3.
+    """
+    issues = [
+        {
+            'kind': 'vulnerability',
+            'id': cve['cve'],
+            'score': cve['score'] or 0,
+            'summary': f"{cve['severity']} in {cve['package']}",
+            'agents': cve['agents'],
+            'count': cve['agent_count'],
+        }
+        for cve in vulns.get('cves', [])
+    ] + [
+        {
+            'kind': 'alert',
+            'id': rule['rule_id'],
+            'score': round((rule['level'] or 0) * 2 / 3, 1),
+            'summary': rule['description'],
+            'agents': rule['agents'],
+            'count': rule['count'],
+        }
+        for rule in alerts.get('rules', [])
+    ]
+    issues.sort(key=lambda i: (i['score'], i['count'] or 0), reverse=True)
+    return issues[:limit]
+
+
+# ============================================================
+#  Incremental collection (watermarks.py)
+# ============================================================
+def latest_body(filters: list[dict], size: int) -> dict:
+    """Newest `size` documents; their sort values seed a watermark."""
+    return {
+        'size': size,
+        'query': {'bool': {'filter': filters}},
+        'sort': [{'@timestamp': 'desc'}, {'_id': 'desc'}],
+    }
+
+
+def delta_body(filters: list[dict], after: list, size: int) -> dict:
+    """
+    Documents strictly after the watermark `after` = [@timestamp ms, _id],
+    oldest first. The range lets the indexer skip old segments; _id
+    breaks ties between documents sharing a timestamp.
+    """
+    since = {
+        'range': {'@timestamp': {'gte': after[0], 'format': 'epoch_millis'}},
+    }
+    return {
+        'size': size,
+        'query': {'bool': {'filter': filters + [since]}},
+        'sort': [{'@timestamp': 'asc'}, {'_id': 'asc'}],
+        'search_after': after,
+    }
@@ -0,0 +1,480 @@
+"""
+Fleet-wide syscollector inventory (processes, ports, packages, hotfixes)
+in an indexed SQLite file, so cross-agent questions such as "which
+agents listen on 3389" are one local query instead of one API call per
+agent.
+
+    python inventory_store.py sync [--full]
+    python inventory_store.py status
+
+Sync is incremental: only new agents, and active agents whose inventory
+is older than INVENTORY_REFRESH, are pulled again (in batches, through
+the bulk /experimental/syscollector endpoints). Agents removed from the
+manager are dropped.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from collections.abc import Callable
+
+import httpx
+
+from indexer_queries import dotted_get
+from jsonutil import dumps
+from mcp_client_call import AGENTS_PAGE_SIZE
+from mcp_client_call import aiter_agents
+from mcp_client_call import asyscollector_agent
+from mcp_client_call import asyscollector_bulk
+
+INVENTORY_DB_PATH = os.getenv(
+    'INVENTORY_DB_PATH', './rag_chroma/inventory.sqlite3',
+)
+# Seconds before an active agent's inventory is pulled again (syscollector
+# rescans hourly by default)
+INVENTORY_REFRESH = float(os.getenv('INVENTORY_REFRESH', '3600'))
+INVENTORY_BATCH_SIZE = int(os.getenv('INVENTORY_BATCH_SIZE', '100'))
+INVENTORY_CONCURRENCY = int(os.getenv('INVENTORY_CONCURRENCY', '4'))
+INVENTORY_PAGE_SIZE = int(os.getenv('INVENTORY_PAGE_SIZE', '5000'))
+# Seconds between background syncs in the MCP server (0 = off)
+INVENTORY_SYNC_INTERVAL = float(os.getenv('INVENTORY_SYNC_INTERVAL', '0'))
+
+# table → (column, syscollector field, SQL type); agent_id is implicit
+TABLES: dict[str, list[tuple[str, str, str]]] = {
+    'processes': [
+        ('pid', 'pid', 'INTEGER'),
+        ('ppid', 'ppid', 'INTEGER'),
+        ('name', 'name', 'TEXT COLLATE NOCASE'),
+        ('euser', 'euser', 'TEXT'),
+        ('state', 'state', 'TEXT'),
+        ('cmd', 'cmd', 'TEXT'),
+    ],
+    'ports': [
+        ('protocol', 'protocol', 'TEXT COLLATE NOCASE'),
+        ('local_ip', 'local.ip', 'TEXT'),
+        ('local_port', 'local.port', 'INTEGER'),
+        ('remote_ip', 'remote.ip', 'TEXT'),
+        ('remote_port', 'remote.port', 'INTEGER'),
+        ('state', 'state', 'TEXT COLLATE NOCASE'),
+        ('pid', 'pid', 'INTEGER'),
+        ('process', 'process', 'TEXT COLLATE NOCASE'),
+    ],
+    'packages': [
+        ('name', 'name', 'TEXT COLLATE NOCASE'),
+        ('version', 'version', 'TEXT'),
+        ('vendor', 'vendor', 'TEXT'),
+        ('architecture', 'architecture', 'TEXT'),
+        ('format', 'format', 'TEXT'),
+    ],
+    'hotfixes': [
+        ('hotfix', 'hotfix', 'TEXT COLLATE NOCASE'),
+    ],
+}
+
+# Lookup columns per table (agent_id is always indexed)
+INDEXES = {
+    'processes': ['name'],
+    'ports': ['local_port', 'process'],
+    'packages': ['name'],
+    'hotfixes': ['hotfix'],
+}
+
+
+def _select(table: str) -> str:
+    """API `select` for a table: top-level fields of its columns."""
+    fields = ['agent_id']
+    for _, field, _ in TABLES[table]:
+        top = field.split('.')[0]
+        if top not in fields:
+            fields.append(top)
+    return ','.join(fields)
+
+
+def _value(item: dict, field: str, sql_type: str):
+    value = dotted_get(item, field)
+    if value is None or not sql_type.startswith('INTEGER'):
+        if value is None or isinstance(value, str):
+            return value
+        return dumps(value)
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _like(pattern: str) -> str:
+    """Shell-style * and ? to a LIKE pattern (escape: backslash)."""
+    escaped = (
+        pattern.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    )
+    return escaped.replace('*', '%').replace('?', '_')
+
+
+class InventoryStore:
+    """
+    One SQLite table per syscollector category plus `agents`, which
+    records when each agent was last synced. An agent's rows are always
+    replaced together, so a sync never leaves it half old, half new.
+    """
+
+    def __init__(self, path: str = INVENTORY_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db: sqlite3.Connection | None = None
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.row_factory = sqlite3.Row
+            self._db.execute('PRAGMA journal_mode=WAL')
+            script = [
+                'CREATE TABLE IF NOT EXISTS agents ('
+                ' agent_id TEXT PRIMARY KEY, name TEXT, status TEXT,'
+                ' platform TEXT, synced_at REAL NOT NULL);',
+            ]
+            for table, columns in TABLES.items():
+                defs = ', '.join(f"{col} {kind}" for col, _, kind in columns)
+                script.append(
+                    f"CREATE TABLE IF NOT EXISTS {table} ("
+                    f" agent_id TEXT NOT NULL, {defs});",
+                )
+                for col in ['agent_id', *INDEXES[table]]:
+                    script.append(
+                        f"CREATE INDEX IF NOT EXISTS {table}_by_{col}"
+                        f" ON {table} ({col});",
+                    )
+            self._db.executescript(''.join(script))
+            self._db.commit()
+        return self._db
+
+    # ------------------------------------------------------------
+    #  sync
+    # ------------------------------------------------------------
+    def synced(self) -> dict[str, float]:
+        """agent id → time of its last sync."""
+        with self._lock:
+            rows = self._conn().execute(
+                'SELECT agent_id, synced_at FROM agents',
+            ).fetchall()
+        return {row[0]: row[1] for row in rows}
+
+    def replace(self, agents: list[dict], rows: dict[str, dict[str, list]]):
+        """Swap in fresh rows for `agents` (rows: table -> agent -> items)."""
+        ids = [a['id'] for a in agents]
+        marks = ','.join('?' * len(ids))
+        now = time.time()
+        with self._lock:
+            db = self._conn()
+            with db:
+                for table, columns in TABLES.items():
+                    db.execute(
+                        f"DELETE FROM {table} WHERE agent_id IN ({marks})",
+                        ids,
+                    )
+                    db.executemany(
+                        f"INSERT INTO {table} VALUES "
+                        f"(?, {', '.join('?' * len(columns))})",
+                        [
+                            (aid, *(_value(item, field, sql_type)
+                                    for _, field, sql_type in columns))
+                            for aid in ids
+                            for item in rows.get(table, {}).get(aid, [])
+                        ],
+                    )
+                db.executemany(
+                    'INSERT OR REPLACE INTO agents VALUES (?, ?, ?, ?, ?)',
+                    [
+                        (
+                            a['id'], a.get('name'), a.get('status'),
+                            dotted_get(a, 'os.platform'), now,
+                        )
+                        for a in agents
+                    ],
+                )
+
+    def forget(self, agent_ids: list[str]):
+        marks = ','.join('?' * len(agent_ids))
+        with self._lock:
+            db = self._conn()
+            with db:
+                for table in (*TABLES, 'agents'):
+                    db.execute(
+                        f"DELETE FROM {table} WHERE agent_id IN ({marks})",
+                        agent_ids,
+                    )
+
+    # ------------------------------------------------------------
+    #  queries
+    # ------------------------------------------------------------
+    @staticmethod
+    def _where(filters: dict, agents: tuple[str, object], alias: str = 't'):
+        """
+        filters: column → value; strings containing * or ? match as
+        patterns (case-insensitive), anything else exactly.
+        agents: (kind, value) from parse_agent_selector, groups resolved.
+        """
+        clauses, args = [], []
+        for col, value in filters.items():
+            if value is None or value == '':
+                continue
+            if isinstance(value, str) and ('*' in value or '?' in value):
+                clauses.append(f"{alias}.{col} LIKE ? ESCAPE '\\'")
+                args.append(_like(value))
+            else:
+                clauses.append(f"{alias}.{col} = ?")
+                args.append(value)
+
+        kind, value = agents
+        if kind == 'ids':
+            clauses.append(
+                f"{alias}.agent_id IN ({','.join('?' * len(value))})",
+            )
+            args.extend(value)
+        elif kind == 'wildcard':
+            clauses.append(f"{alias}.agent_id GLOB ?")
+            args.append(value)
+        return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', args
+
+    def search(
+        self,
+        table: str,
+        filters: dict,
+        agents: tuple[str, object] = ('all', None),
+        limit: int = 100,
+    ) -> dict:
+        """Matching rows (with agent name), match count and agent count."""
+        where, args = self._where(filters, agents)
+        columns = ', '.join(f"t.{col}" for col, _, _ in TABLES[table])
+        with self._lock:
+            db = self._conn()
+            total, agent_count = db.execute(
+                'SELECT COUNT(*), COUNT(DISTINCT t.agent_id)'
+                f" FROM {table} t{where}",
+                args,
+            ).fetchone()
+            rows = db.execute(
+                f"SELECT t.agent_id, a.name AS agent_name, {columns}"
+                f" FROM {table} t LEFT JOIN agents a USING (agent_id){where}"
+                ' ORDER BY t.agent_id LIMIT ?',
+                [*args, limit],
+            ).fetchall()
+        return {
+            'total': total,
+            'agents': agent_count,
+            'items': [dict(row) for row in rows],
+        }
+
+    def missing_hotfix(
+        self,
+        hotfix: str,
+        agents: tuple[str, object] = ('all', None),
+        limit: int = 100,
+    ) -> dict:
+        """Agents with a hotfix inventory (Windows) that lack `hotfix`."""
+        where, args = self._where({}, agents, alias='a')
+        query = (
+            ' FROM agents a'
+            f"{where or ' WHERE 1'}"
+            ' AND a.agent_id IN (SELECT agent_id FROM hotfixes)'
+            ' AND a.agent_id NOT IN'
+            ' (SELECT agent_id FROM hotfixes WHERE hotfix = ?)'
+        )
+        with self._lock:
+            db = self._conn()
+            total = db.execute(
+                f"SELECT COUNT(*){query}", [*args, hotfix],
+            ).fetchone()[0]
+            rows = db.execute(
+                f"SELECT a.agent_id, a.name AS agent_name, a.status{query}"
+                ' ORDER BY a.agent_id LIMIT ?',
+                [*args, hotfix, limit],
+            ).fetchall()
+        return {'total': total, 'items': [dict(row) for row in rows]}
+
+    def status(self) -> dict:
+        with self._lock:
+            db = self._conn()
+            agents, oldest, newest = db.execute(
+                'SELECT COUNT(*), MIN(synced_at), MAX(synced_at) FROM agents',
+            ).fetchone()
+            rows = {
+                table: db.execute(
+                    f"SELECT COUNT(*) FROM {table}",
+                ).fetchone()[0]
+                for table in TABLES
+            }
+        now = time.time()
+        return {
+            'agents': agents,
+            'rows': rows,
+            'oldest_sync_age_s': round(now - oldest) if oldest else None,
+            'newest_sync_age_s': round(now - newest) if newest else None,
+        }
+
+
+inventory = InventoryStore()
+_sync_lock: asyncio.Lock | None = None
+
+
+# ============================================================
+#  Sync from the Wazuh API
+# ============================================================
+async def _fetch_agent(aid: str) -> dict[str, list]:
+    """Per-agent fallback when the experimental endpoints are disabled."""
+    found = {}
+    for table in TABLES:
+        try:
+            found[table] = await asyscollector_agent(
+                table, aid, INVENTORY_PAGE_SIZE, _select(table),
+            )
+        except httpx.HTTPStatusError as e:
+            # e.g. hotfixes on a Linux agent
+            if e.response.status_code not in (400, 404):
+                raise
+            found[table] = []
+    return found
+
+
+async def sync_inventory(
+    full: bool = False,
+    on_progress: Callable[[int, int], object] | None = None,
+) -> dict:
+    """
+    Bring the store up to date. `full` re-pulls every agent. Returns
+    counts of agents synced, skipped (still fresh), failed and removed.
+    """
+    global _sync_lock
+    if _sync_lock is None:
+        _sync_lock = asyncio.Lock()
+
+    async with _sync_lock:
+        started = time.perf_counter()
+        agents = [
+            a async for a in aiter_agents(
+                AGENTS_PAGE_SIZE, select='id,name,status,os.platform',
+            )
+            if a.get('id')
+        ]
+        synced = await asyncio.to_thread(inventory.synced)
+        live = {a['id'] for a in agents}
+        gone = [aid for aid in synced if aid not in live]
+        if gone:
+            await asyncio.to_thread(inventory.forget, gone)
+
+        now = time.time()
+        due = [
+            a for a in agents
+            if full or a['id'] not in synced or (
+                a.get('status') == 'active'
+                and now - synced[a['id']] >= INVENTORY_REFRESH
+            )
+        ]
+        batches = [
+            due[i:i + INVENTORY_BATCH_SIZE]
+            for i in range(0, len(due), INVENTORY_BATCH_SIZE)
+        ]
+        semaphore = asyncio.Semaphore(max(1, INVENTORY_CONCURRENCY))
+        bulk_available = True
+
+        async def fetch(batch: list[dict]) -> tuple[list[dict], dict]:
+            nonlocal bulk_available
+            ids = [a['id'] for a in batch]
+            async with semaphore:
+                if bulk_available:
+                    try:
+                        rows = {}
+                        for table in TABLES:
+                            rows[table] = await asyscollector_bulk(
+                                table, ids, INVENTORY_PAGE_SIZE,
+                                _select(table),
+                            )
+                        return batch, rows
+                    except httpx.HTTPStatusError as e:
+                        if e.response.status_code not in (400, 403, 404):
+                            raise
+                        bulk_available = False
+
+                done, rows = [], {table: {} for table in TABLES}
+                for agent in batch:
+                    try:
+                        found = await _fetch_agent(agent['id'])
+                    except httpx.HTTPError:
+                        continue
+                    done.append(agent)
+                    for table, items in found.items():
+                        rows[table][agent['id']] = items
+                return done, rows
+
+        async def guarded(batch):
+            try:
+                return await fetch(batch)
+            except httpx.HTTPError:
+                return [], {}
+
+        stored = 0
+        for finished in asyncio.as_completed([guarded(b) for b in batches]):
+            done, rows = await finished
+            if done:
+                await asyncio.to_thread(inventory.replace, done, rows)
+            stored += len(done)
+            if on_progress is not None:
+                outcome = on_progress(stored, len(due))
+                if asyncio.iscoroutine(outcome):
+                    await outcome
+
+        return {
+            'agents_synced': stored,
+            'agents_failed': len(due) - stored,
+            'agents_fresh': len(agents) - len(due),
+            'agents_removed': len(gone),
+            'seconds': round(time.perf_counter() - started, 2),
+        }
+
+
+async def sync_loop(interval: float = INVENTORY_SYNC_INTERVAL):
+    """Periodic background sync (MCP server)."""
+    while True:
+        try:
+            result = await sync_inventory()
+            if result['agents_synced'] or result['agents_removed']:
+                print(f"Inventory sync: {result}")
+        except Exception as e:
+            print(f"Inventory sync failed: {e}")
+        await asyncio.sleep(interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().splitlines()[0],
+    )
+    parser.add_argument('command', choices=['sync', 'status'])
+    parser.add_argument(
+        '--full', action='store_true', help='re-pull every agent',
+    )
+    args = parser.parse_args()
+
+    if args.command == 'sync':
+        from mcp_client_call import aclose_async_clients
+        from mcp_client_call import require_credentials
+
+        require_credentials()
+
+        async def run():
+            try:
+                return await sync_inventory(full=args.full)
+            finally:
+                await aclose_async_clients()
+
+        print(asyncio.run(run()))
+    print(inventory.status())
+
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,25 @@
 from __future__ import annotations
 
+import asyncio
+import base64
+import json
 import os
+import threading
+import time
+from collections.abc import AsyncIterator
+from collections.abc import Callable
+from collections.abc import Iterator
+from urllib.parse import urlsplit
 
+import httpx
 import requests  # type: ignore
 from dotenv import load_dotenv
-from langchain_mcp_adapters.client import MultiServerMCPClient
-from langchain_mcp_adapters.client import StreamableHttpConnection
+from requests.adapters import HTTPAdapter  # type: ignore
 from requests.auth import HTTPBasicAuth  # type: ignore
+from urllib3.util.retry import Retry
+
+from telemetry import record_upstream
+from telemetry import span
 
 load_dotenv()
 
@@ -23,59 +36,632 @@ WAZUH_INDEXER_USER = os.getenv('WAZUH_INDEXER_USER', '')
 WAZUH_INDEXER_PASS = os.getenv('WAZUH_INDEXER_PASSWORD', '')
 
 
-if not WAZUH_USER or not WAZUH_PASS:
-    raise RuntimeError('Missing Wazuh credentials!')
+def require_credentials():
+    """
+    Fail if the Wazuh credentials are missing. Called on first use (and by
+    the MCP server at startup) so importing this module stays cheap.
+    """
+    if not WAZUH_USER or not WAZUH_PASS:
+        raise RuntimeError('Missing Wazuh credentials!')
 
+    if not WAZUH_INDEXER_USER or not WAZUH_INDEXER_PASS:
+        raise RuntimeError('Missing Wazuh index credentials!')
 
-if not (WAZUH_USER and WAZUH_PASS):
-    raise RuntimeError('Missing Wazuh credentials')
 
+# Connection pooling / resilience for the Wazuh API and indexer
+HTTP_POOL_CONNECTIONS = int(os.getenv('WAZUH_HTTP_POOL_CONNECTIONS', '4'))
+HTTP_POOL_MAXSIZE = int(os.getenv('WAZUH_HTTP_POOL_MAXSIZE', '16'))
+HTTP_RETRIES = int(os.getenv('WAZUH_HTTP_RETRIES', '3'))
+HTTP_BACKOFF = float(os.getenv('WAZUH_HTTP_BACKOFF', '0.5'))
 
-if not WAZUH_INDEXER_USER or not WAZUH_INDEXER_PASS:
-    raise RuntimeError('Missing Wazuh index credentials!')
+# (connect, read) timeouts in seconds, per endpoint
+HTTP_CONNECT_TIMEOUT = float(os.getenv('WAZUH_HTTP_CONNECT_TIMEOUT', '5'))
+WAZUH_AUTH_TIMEOUT = float(os.getenv('WAZUH_AUTH_TIMEOUT', '10'))
+WAZUH_API_TIMEOUT = float(os.getenv('WAZUH_API_TIMEOUT', '30'))
+WAZUH_INDEXER_TIMEOUT = float(os.getenv('WAZUH_INDEXER_TIMEOUT', '60'))
 
+# Fleet-wide collection
+AGENTS_PAGE_SIZE = int(os.getenv('WAZUH_AGENTS_PAGE_SIZE', '500'))
+HOTFIX_BATCH_SIZE = int(os.getenv('WAZUH_HOTFIX_BATCH_SIZE', '100'))
+HOTFIX_CONCURRENCY = int(os.getenv('WAZUH_HOTFIX_CONCURRENCY', '8'))
 
-if not (WAZUH_INDEXER_USER and WAZUH_INDEXER_PASS):
-    raise RuntimeError('Missing Wazuh credentials')
+# Deep pagination (point-in-time + search_after)
+INDEXER_PAGE_SIZE = int(os.getenv('WAZUH_INDEXER_PAGE_SIZE', '500'))
+INDEXER_PIT_KEEP_ALIVE = os.getenv('WAZUH_INDEXER_PIT_KEEP_ALIVE', '2m')
 
 
-def get_token():
-    """Authenticate with Wazuh API and return JWT."""
-    resp = requests.post(
+def endpoint_label(kind: str, url: str) -> str:
+    """
+    Low-cardinality endpoint name for metrics: agent ids and index
+    patterns are dropped (/syscollector/001/ports → syscollector/ports,
+    /wazuh-alerts-*/_search → _search).
+    """
+    parts = [p for p in urlsplit(url).path.split('/') if p]
+    if kind == 'indexer':
+        for i, part in enumerate(parts):
+            if part.startswith('_'):
+                return '/'.join(parts[i:])
+        return 'other'
+    return '/'.join([p for p in parts if not p.isdigit()][:2]) or '/'
+
+
+def _observe(kind: str):
+    """requests response hook recording upstream latency and size."""
+    def hook(resp, *args, **kwargs):
+        record_upstream(
+            kind, resp.request.method, endpoint_label(kind, resp.url),
+            resp.status_code, resp.elapsed.total_seconds(),
+            len(resp.content or b''),
+        )
+    return hook
+
+
+def _build_session(auth=None, kind: str = 'api') -> requests.Session:
+    """Keep-alive session with a bounded pool and retry/backoff on 429/503."""
+    retry = Retry(
+        total=HTTP_RETRIES,
+        backoff_factor=HTTP_BACKOFF,
+        status_forcelist=(429, 503),
+        # _search is a read even though it is a POST
+        allowed_methods=frozenset({'GET', 'POST'}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=HTTP_POOL_CONNECTIONS,
+        pool_maxsize=HTTP_POOL_MAXSIZE,
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.verify = False
+    session.auth = auth
+    session.hooks['response'].append(_observe(kind))
+    return session
+
+
+api_session = _build_session()
+indexer_session = _build_session(
+    auth=HTTPBasicAuth(WAZUH_INDEXER_USER, WAZUH_INDEXER_PASS),
+    kind='indexer',
+)
+
+
+# ==========================
+#   ASYNC CLIENTS
+# ==========================
+# Created lazily: an httpx.AsyncClient must be built inside a running loop.
+_async_clients: dict[str, httpx.AsyncClient] = {}
+
+
+def _async_client(kind: str) -> httpx.AsyncClient:
+    client = _async_clients.get(kind)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            verify=False,
+            auth=(
+                (WAZUH_INDEXER_USER, WAZUH_INDEXER_PASS)
+                if kind == 'indexer' else None
+            ),
+            limits=httpx.Limits(
+                max_connections=HTTP_POOL_MAXSIZE,
+                max_keepalive_connections=HTTP_POOL_MAXSIZE,
+            ),
+            transport=httpx.AsyncHTTPTransport(
+                verify=False, retries=HTTP_RETRIES,
+            ),
+        )
+        _async_clients[kind] = client
+    return client
+
+
+async def _async_request(kind: str, method: str, url: str, **kwargs):
+    """Async request with the same 429/503 retry/backoff as the sessions."""
+    client = _async_client(kind)
+    endpoint = endpoint_label(kind, url)
+    for attempt in range(HTTP_RETRIES + 1):
+        started = time.perf_counter()
+        with span(f"{kind} {method} {endpoint}", upstream=kind):
+            resp = await client.request(method, url, **kwargs)
+        record_upstream(
+            kind, method, endpoint, resp.status_code,
+            time.perf_counter() - started, len(resp.content),
+        )
+        if resp.status_code not in (429, 503) or attempt == HTTP_RETRIES:
+            return resp
+        delay = HTTP_BACKOFF * (2 ** attempt)
+        retry_after = resp.headers.get('Retry-After', '')
+        if retry_after.isdigit():
+            delay = max(delay, float(retry_after))
+        await asyncio.sleep(delay)
+    return resp
+
+
+async def aclose_async_clients():
+    for client in _async_clients.values():
+        await client.aclose()
+    _async_clients.clear()
+
+
+TOKEN_REFRESH_MARGIN = int(os.getenv('WAZUH_TOKEN_REFRESH_MARGIN', '60'))
+# Wazuh issues 900s tokens by default; used when the JWT has no `exp` claim.
+TOKEN_DEFAULT_TTL = int(os.getenv('WAZUH_TOKEN_TTL', '900'))
+
+
+def _jwt_expiry(token: str) -> float:
+    """Return the `exp` claim of a JWT, or a default TTL if unreadable."""
+    try:
+        payload = token.split('.')[1]
+        payload += '=' * (-len(payload) % 4)
+        claims = json.loads(base64.urlsafe_b64decode(payload))
+        return float(claims['exp'])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return time.time() + TOKEN_DEFAULT_TTL
+
+
+class TokenManager:
+    """
+    Process-wide cache for the Wazuh API JWT.
+    - refreshes the token `refresh_margin` seconds before it expires
+    - single-flight: one refresh at a time across threads and coroutines
+    - hits/misses count how many authentication round trips were saved
+    """
+
+    def __init__(self, refresh_margin: int = TOKEN_REFRESH_MARGIN):
+        self.refresh_margin = refresh_margin
+        self.hits = 0
+        self.misses = 0
+        self._token: str | None = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+        self._alock: asyncio.Lock | None = None
+
+    def _valid(self) -> bool:
+        return (
+            self._token is not None
+            and time.time() < self._expires_at - self.refresh_margin
+        )
+
+    def get(self) -> str:
+        if self._valid():
+            self.hits += 1
+            return self._token  # type: ignore[return-value]
+
+        with self._lock:
+            # Another thread may have refreshed while we waited
+            if self._valid():
+                self.hits += 1
+                return self._token  # type: ignore[return-value]
+
+            self.misses += 1
+            token = _authenticate()
+            self._token = token
+            self._expires_at = _jwt_expiry(token)
+            return token
+
+    async def aget(self) -> str:
+        """
+        Async variant of `get`. The refresh runs `get` in a worker thread,
+        under the same lock sync callers use, so it never blocks the event
+        loop and never races a sync refresh.
+        """
+        if self._valid():
+            self.hits += 1
+            return self._token  # type: ignore[return-value]
+
+        if self._alock is None:
+            self._alock = asyncio.Lock()
+
+        # Coroutines wait here rather than each holding a worker thread
+        async with self._alock:
+            return await asyncio.to_thread(self.get)
+
+    def invalidate(self, token: str | None = None):
+        """Drop the cached token (only if it is still `token`, when given)."""
+        with self._lock:
+            if token is None or token == self._token:
+                self._token = None
+                self._expires_at = 0.0
+
+    def stats(self) -> dict:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'expires_in': max(0.0, self._expires_at - time.time()),
+        }
+
+
+def _authenticate() -> str:
+    require_credentials()
+    resp = api_session.post(
         f"{WAZUH_API}/security/user/authenticate?raw=true",
         auth=(WAZUH_USER, WAZUH_PASS),
-        verify=False,
+        timeout=(HTTP_CONNECT_TIMEOUT, WAZUH_AUTH_TIMEOUT),
     )
     resp.raise_for_status()
     return resp.text.strip()
 
 
+token_manager = TokenManager()
+
+
+def get_token():
+    """Return a cached Wazuh API JWT, authenticating only when needed."""
+    return token_manager.get()
+
+
 def wazuh_get(endpoint: str):
     """GET helper for Wazuh API."""
     token = get_token()
-    resp = requests.get(
+    resp = api_session.get(
         f"{WAZUH_API}{endpoint}",
         headers={'Authorization': f"Bearer {token}"},
-        verify=False,
+        timeout=(HTTP_CONNECT_TIMEOUT, WAZUH_API_TIMEOUT),
     )
+
+    # Token revoked or expired early (e.g. manager restart) → retry once
+    if resp.status_code == 401:
+        token_manager.invalidate(token)
+        token = get_token()
+        resp = api_session.get(
+            f"{WAZUH_API}{endpoint}",
+            headers={'Authorization': f"Bearer {token}"},
+            timeout=(HTTP_CONNECT_TIMEOUT, WAZUH_API_TIMEOUT),
+        )
+
     resp.raise_for_status()
     return resp.json()
 
 
 def wazuh_indexer_post(endpoint: str, body: dict = {}):
-    resp = requests.post(
+    require_credentials()
+    resp = indexer_session.post(
         f"{WAZUH_INDEXER_API}{endpoint}",
-        auth=HTTPBasicAuth(WAZUH_INDEXER_USER, WAZUH_INDEXER_PASS),
         json=body,
-        verify=False,
+        timeout=(HTTP_CONNECT_TIMEOUT, WAZUH_INDEXER_TIMEOUT),
     )
     resp.raise_for_status()
     return resp.json()
 
 
+async def awazuh_get(endpoint: str):
+    """Async GET helper for Wazuh API."""
+    timeout = httpx.Timeout(WAZUH_API_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT)
+    token = await token_manager.aget()
+    resp = await _async_request(
+        'api', 'GET', f"{WAZUH_API}{endpoint}",
+        headers={'Authorization': f"Bearer {token}"},
+        timeout=timeout,
+    )
+
+    if resp.status_code == 401:
+        token_manager.invalidate(token)
+        token = await token_manager.aget()
+        resp = await _async_request(
+            'api', 'GET', f"{WAZUH_API}{endpoint}",
+            headers={'Authorization': f"Bearer {token}"},
+            timeout=timeout,
+        )
+
+    resp.raise_for_status()
+    return resp.json()
+
+
+async def awazuh_indexer_post(endpoint: str, body: dict | None = None):
+    """Async POST helper for the Wazuh indexer."""
+    require_credentials()
+    resp = await _async_request(
+        'indexer', 'POST', f"{WAZUH_INDEXER_API}{endpoint}",
+        json=body or {},
+        timeout=httpx.Timeout(
+            WAZUH_INDEXER_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT,
+        ),
+    )
+    resp.raise_for_status()
+    return resp.json()
+
+
+# ==========================
+#   DEEP PAGINATION
+# ==========================
+def _page_body(query, sort, source, size, pit_id, search_after) -> dict:
+    body = {
+        'size': size,
+        'query': query,
+        # _id breaks ties so search_after never skips or repeats a hit
+        'sort': list(sort) + [{'_id': 'asc'}],
+        '_source': source if source is not None else True,
+        'track_total_hits': False,
+    }
+    if pit_id:
+        body['pit'] = {'id': pit_id, 'keep_alive': INDEXER_PIT_KEEP_ALIVE}
+    if search_after:
+        body['search_after'] = search_after
+    return body
+
+
+def iter_indexer_hits(
+    index: str,
+    query: dict,
+    sort: list[dict],
+    source: list[str] | None = None,
+    page_size: int = INDEXER_PAGE_SIZE,
+    max_hits: int | None = None,
+) -> Iterator[dict]:
+    """
+    Yield every hit of `query` one page at a time (constant memory).
+    Uses a point-in-time for a consistent view and falls back to plain
+    search_after on indexers without PIT support.
+    """
+    pit_id = None
+    try:
+        pit_id = wazuh_indexer_post(
+            f"{index}/_search/point_in_time"
+            f"?keep_alive={INDEXER_PIT_KEEP_ALIVE}",
+        ).get('pit_id')
+    except requests.HTTPError:
+        pass
+
+    endpoint = '/_search' if pit_id else f"{index}/_search"
+    search_after = None
+    yielded = 0
+    try:
+        while max_hits is None or yielded < max_hits:
+            size = page_size
+            if max_hits is not None:
+                size = min(page_size, max_hits - yielded)
+            result = wazuh_indexer_post(
+                endpoint,
+                _page_body(query, sort, source, size, pit_id, search_after),
+            )
+            pit_id = result.get('pit_id', pit_id)
+            hits = result.get('hits', {}).get('hits', [])
+            for hit in hits:
+                yield hit
+            yielded += len(hits)
+
+            if len(hits) < size:
+                return
+            search_after = hits[-1]['sort']
+    finally:
+        if pit_id:
+            try:
+                indexer_session.delete(
+                    f"{WAZUH_INDEXER_API}/_search/point_in_time",
+                    json={'pit_id': [pit_id]},
+                    timeout=(HTTP_CONNECT_TIMEOUT, WAZUH_INDEXER_TIMEOUT),
+                )
+            except requests.RequestException:
+                pass  # expires on its own after keep_alive
+
+
+async def aiter_indexer_hits(
+    index: str,
+    query: dict,
+    sort: list[dict],
+    source: list[str] | None = None,
+    page_size: int = INDEXER_PAGE_SIZE,
+    max_hits: int | None = None,
+    cursor: dict | None = None,
+) -> AsyncIterator[dict]:
+    """
+    Async variant of `iter_indexer_hits`.
+    cursor: resume state, updated in place. A scan that stops at
+    max_hits leaves {"pit_id", "search_after"} in it and keeps the PIT
+    open for the next call; a scan that reaches the end empties it.
+    """
+    resume = dict(cursor or {})
+    pit_id = resume.get('pit_id')
+    search_after = resume.get('search_after')
+    if not resume:
+        try:
+            pit_id = (await awazuh_indexer_post(
+                f"{index}/_search/point_in_time"
+                f"?keep_alive={INDEXER_PIT_KEEP_ALIVE}",
+            )).get('pit_id')
+        except httpx.HTTPStatusError:
+            pass
+
+    endpoint = '/_search' if pit_id else f"{index}/_search"
+    yielded = 0
+    more = False
+    try:
+        while max_hits is None or yielded < max_hits:
+            size = page_size
+            if max_hits is not None:
+                size = min(page_size, max_hits - yielded)
+            result = await awazuh_indexer_post(
+                endpoint,
+                _page_body(query, sort, source, size, pit_id, search_after),
+            )
+            pit_id = result.get('pit_id', pit_id)
+            hits = result.get('hits', {}).get('hits', [])
+            for hit in hits:
+                yield hit
+            yielded += len(hits)
+
+            if len(hits) < size:
+                return
+            search_after = hits[-1]['sort']
+        more = True
+    finally:
+        if cursor is not None:
+            cursor.clear()
+            if more:
+                cursor.update(pit_id=pit_id, search_after=search_after)
+        if pit_id and not (more and cursor is not None):
+            try:
+                await _async_request(
+                    'indexer', 'DELETE',
+                    f"{WAZUH_INDEXER_API}/_search/point_in_time",
+                    json={'pit_id': [pit_id]},
+                )
+            except httpx.HTTPError:
+                pass  # expires on its own after keep_alive
+
+
+# ==========================
+#   FLEET COLLECTION
+# ==========================
+async def aiter_agents(
+    page_size: int = AGENTS_PAGE_SIZE, select: str = 'id,name,status',
+) -> AsyncIterator[dict]:
+    """Page through /agents instead of one giant limit=5001 request."""
+    offset = 0
+    while True:
+        data = await awazuh_get(
+            f"/agents?limit={page_size}&offset={offset}&select={select}",
+        )
+        page = data.get('data', {})
+        items = page.get('affected_items', [])
+        for item in items:
+            yield item
+
+        offset += len(items)
+        if not items or offset >= page.get('total_affected_items', 0):
+            return
+
+
+async def aget_group_agent_ids(group: str) -> list[str]:
+    """All agent IDs in a Wazuh group, paged."""
+    ids: list[str] = []
+    offset = 0
+    while True:
+        data = await awazuh_get(
+            f"/groups/{group}/agents?select=id"
+            f"&limit={AGENTS_PAGE_SIZE}&offset={offset}",
+        )
+        page = data.get('data', {})
+        items = page.get('affected_items', [])
+        ids.extend(item['id'] for item in items if item.get('id'))
+
+        offset += len(items)
+        if not items or offset >= page.get('total_affected_items', 0):
+            return ids
+
+
+async def asyscollector_bulk(
+    table: str,
+    agent_ids: list[str],
+    page_size: int = AGENTS_PAGE_SIZE,
+    select: str = '',
+) -> dict[str, list]:
+    """
+    One paged request for a whole batch of agents (agents_list filter)
+    on /experimental/syscollector/{table}, grouped by agent id.
+    """
+    found: dict[str, list] = {aid: [] for aid in agent_ids}
+    fields = f"&select={select}" if select else ''
+    offset = 0
+    while True:
+        data = await awazuh_get(
+            f"/experimental/syscollector/{table}"
+            f"?agents_list={','.join(agent_ids)}"
+            f"&limit={page_size}&offset={offset}{fields}",
+        )
+        page = data.get('data', {})
+        items = page.get('affected_items', [])
+        for item in items:
+            found.setdefault(item.get('agent_id'), []).append(item)
+
+        offset += len(items)
+        if not items or offset >= page.get('total_affected_items', 0):
+            return found
+
+
+async def asyscollector_agent(
+    table: str, agent_id: str, page_size: int = AGENTS_PAGE_SIZE,
+    select: str = '',
+) -> list:
+    """Every row of /syscollector/{agent}/{table}, paged."""
+    rows: list = []
+    fields = f"&select={select}" if select else ''
+    while True:
+        data = await awazuh_get(
+            f"/syscollector/{agent_id}/{table}"
+            f"?limit={page_size}&offset={len(rows)}{fields}",
+        )
+        page = data.get('data', {})
+        items = page.get('affected_items', [])
+        rows.extend(items)
+        if not items or len(rows) >= page.get('total_affected_items', 0):
+            return rows
+
+
+async def _hotfixes_bulk(agent_ids: list[str]) -> dict[str, list]:
+    return await asyscollector_bulk('hotfixes', agent_ids)
+
+
+async def _hotfixes_single(aid: str) -> list:
+    # Stable per-agent endpoint, for when the experimental bulk one fails
+    return await asyscollector_agent('hotfixes', aid)
+
+
+async def acollect_hotfixes(
+    batch_size: int = HOTFIX_BATCH_SIZE,
+    concurrency: int = HOTFIX_CONCURRENCY,
+    on_progress: Callable[[int, int], object] | None = None,
+) -> AsyncIterator[tuple[str, list | None]]:
+    """
+    Stream (agent_id, hotfixes) for every agent as batches complete.
+    - agents are paged, hotfixes fetched by a bounded pool of batches
+    - uses the bulk agents_list endpoint, falling back to per-agent calls
+      when the experimental endpoints are disabled
+    - hotfixes is None for agents whose request failed
+    """
+    agent_ids = [
+        a['id'] async for a in aiter_agents(select='id') if a.get('id')
+    ]
+    batches = [
+        agent_ids[i:i + batch_size]
+        for i in range(0, len(agent_ids), batch_size)
+    ]
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    bulk_available = True
+
+    async def fetch(batch: list[str]) -> dict[str, list | None]:
+        nonlocal bulk_available
+        async with semaphore:
+            if bulk_available:
+                try:
+                    return dict(await _hotfixes_bulk(batch))
+                except httpx.HTTPStatusError as e:
+                    if e.response.status_code not in (400, 403, 404):
+                        raise
+                    bulk_available = False
+
+            results: dict[str, list | None] = {}
+            for aid in batch:
+                try:
+                    results[aid] = await _hotfixes_single(aid)
+                except httpx.HTTPError:
+                    results[aid] = None
+            return results
+
+    async def guarded(batch: list[str]) -> dict[str, list | None]:
+        try:
+            return await fetch(batch)
+        except httpx.HTTPError:
+            return {aid: None for aid in batch}
+
+    done = 0
+    for finished in asyncio.as_completed([guarded(b) for b in batches]):
+        batch_result = await finished
+        for aid, hotfixes in batch_result.items():
+            yield aid, hotfixes
+
+        done += len(batch_result)
+        if on_progress is not None:
+            outcome = on_progress(done, len(agent_ids))
+            if asyncio.iscoroutine(outcome):
+                await outcome
+
+
 def compress_results(data_list, max_items=10, max_fields=6):
     """
     Reduce list of dicts to a tiny summary to fit in GPT TPM limits.
+    Kept for callers outside the server; MCP tools use summarizer.summarize.
     - max_items: max number of entries to keep
     - max_fields: max fields to include per entry
     """
@@ -99,11 +685,38 @@ def compress_results(data_list, max_items=10, max_fields=6):
     return compressed
 
 
-client = MultiServerMCPClient(
-    connections={
-        'wazuh': StreamableHttpConnection(
-            url='http://127.0.0.1:8080/',
-            transport='streamable_http',
-        ),
-    },
-)
+_client = None
+
+
+async def _on_progress(progress, total, message, context):
+    """Print MCP progress notifications while a long tool is running."""
+    of = f"/{total:g}" if total else ''
+    note = f" {message}" if message else ''
+    print(f"   · {context.tool_name}: {progress:g}{of}{note}", flush=True)
+
+
+async def _on_log(params, context):
+    """Print partial results a tool sends with ctx.info() as they arrive."""
+    print(f"   · {context.server_name}: {params.data}", flush=True)
+
+
+def get_client():
+    """Shared MCP client for WMCP_SERVER_URL, created on first use."""
+    global _client
+    if _client is None:
+        from langchain_mcp_adapters.callbacks import Callbacks
+        from langchain_mcp_adapters.client import MultiServerMCPClient
+        from langchain_mcp_adapters.client import StreamableHttpConnection
+
+        _client = MultiServerMCPClient(
+            connections={
+                'wazuh': StreamableHttpConnection(
+                    url=f"{MCP_SERVER_URL.rstrip('/')}/",
+                    transport='streamable_http',
+                ),
+            },
+            callbacks=Callbacks(
+                on_progress=_on_progress, on_logging_message=_on_log,
+            ),
+        )
+    return _client
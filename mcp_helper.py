@@ -1,3 +1,4 @@
+import inspect
 import re
 from functools import wraps
 
@@ -8,33 +9,45 @@ def auto_params(*expected_keys, defaults=None):
     """
     defaults = defaults or {}
 
+    def normalize(params):
+        # If params already dict → merge defaults
+        if isinstance(params, dict):
+            return {**defaults, **params}
+
+        # Otherwise parse raw text
+        text = str(params).strip()
+        parsed = dict(defaults)
+
+        # Single parameter case
+        if len(expected_keys) == 1:
+            key = expected_keys[0]
+            match = re.search(r"([A-Za-z0-9_-]+)$", text)
+            parsed[key] = match.group(1) if match else defaults.get(key)
+            return parsed
+
+        # Multi-param case: take words in sequence
+        words = text.split()
+        for i, key in enumerate(expected_keys):
+            if i < len(words):
+                parsed[key] = words[i]
+            else:
+                parsed[key] = defaults.get(key)
+
+        return parsed
+
     def decorator(fn):
+        # Async tools keep their coroutine signature so FastMCP awaits them.
+        # Extra arguments (e.g. the injected MCP Context) pass through.
+        if inspect.iscoroutinefunction(fn):
+            @wraps(fn)
+            async def async_wrapper(params, *args, **kwargs):
+                return await fn(normalize(params), *args, **kwargs)
+
+            return async_wrapper
+
         @wraps(fn)
-        def wrapper(params):
-            # If params already dict → merge defaults
-            if isinstance(params, dict):
-                return fn({**defaults, **params})
-
-            # Otherwise parse raw text
-            text = str(params).strip()
-            parsed = dict(defaults)
-
-            # Single parameter case
-            if len(expected_keys) == 1:
-                key = expected_keys[0]
-                match = re.search(r"([A-Za-z0-9_-]+)$", text)
-                parsed[key] = match.group(1) if match else defaults.get(key)
-                return fn(parsed)
-
-            # Multi-param case: take words in sequence
-            words = text.split()
-            for i, key in enumerate(expected_keys):
-                if i < len(words):
-                    parsed[key] = words[i]
-                else:
-                    parsed[key] = defaults.get(key)
-
-            return fn(parsed)
+        def wrapper(params, *args, **kwargs):
+            return fn(normalize(params), *args, **kwargs)
 
         return wrapper
     return decorator
@@ -1,8 +1,57 @@
 # file: wazuh_mcp_server.py
-from mcp.server.fastmcp import FastMCP
+import asyncio
+import heapq
+import inspect
+from collections import Counter
 
-from mcp_client_call import wazuh_get, wazuh_indexer_post, compress_results
+from mcp.server.fastmcp import Context
+from mcp.server.fastmcp import FastMCP
+from starlette.requests import Request
+from starlette.responses import Response
+
+from indexer_queries import agent_filter
+from indexer_queries import alert_histogram_body
+from indexer_queries import ALERTS_INDEX
+from indexer_queries import dotted_get
+from indexer_queries import FIM_INDEX
+from indexer_queries import fit_fleet_budget
+from indexer_queries import fleet_agent_count
+from indexer_queries import fleet_top_hits_body
+from indexer_queries import group_top_hits
+from indexer_queries import INDEX_SORT
+from indexer_queries import parse_agent_selector
+from indexer_queries import rank_top_issues
+from indexer_queries import STREAM_FIELDS
+from indexer_queries import summarize_alert_histogram
+from indexer_queries import summarize_top_alert_rules
+from indexer_queries import summarize_top_vulnerabilities
+from indexer_queries import time_filter
+from indexer_queries import top_alert_rules_body
+from indexer_queries import top_vulnerabilities_body
+from indexer_queries import VULNERABILITIES_INDEX
+from inventory_store import inventory
+from inventory_store import INVENTORY_SYNC_INTERVAL
+from inventory_store import sync_inventory
+from inventory_store import sync_loop
+from jsonutil import dumps
+from jsonutil import loads
+from mcp_client_call import acollect_hotfixes
+from mcp_client_call import aget_group_agent_ids
+from mcp_client_call import aiter_indexer_hits
+from mcp_client_call import awazuh_get
+from mcp_client_call import awazuh_indexer_post
+from mcp_client_call import require_credentials
 from mcp_helper import auto_params
+from prefetch import Prefetcher
+from result_cache import result_cache
+from summarizer import summarize
+from summarizer import SUMMARY_TOKEN_BUDGET
+from telemetry import instrument_tool
+from telemetry import metrics_payload
+from watermarks import collect_indexer_delta
+from watermarks import collect_manager_logs_delta
+from watermarks import WATERMARK_WINDOW_SIZE
+from watermarks import watermarks
 
 
 # ==========================
@@ -15,22 +64,87 @@ mcp = FastMCP(
     streamable_http_path="/"
 )
 
+# Raw tool functions, for in-process calls that skip MCP serialization
+TOOL_FUNCTIONS = {}
+
+
+def wazuh_tool(name):
+    """Register an MCP tool and keep a handle on the native function."""
+    def decorator(fn):
+        fn = instrument_tool(name, fn)
+        TOOL_FUNCTIONS[name] = fn
+        return mcp.tool(name=name)(fn)
+    return decorator
+
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def metrics(request: Request) -> Response:
+    """Prometheus scrape endpoint next to the MCP app."""
+    body, content_type, status = metrics_payload()
+    return Response(body, status_code=status, media_type=content_type)
+
+
+async def call_tool_native(name, arguments):
+    """
+    Run a tool in-process and return its native (dict/list) result.
+    Tools that need an MCP Context go through FastMCP instead.
+    """
+    fn = TOOL_FUNCTIONS.get(name)
+    if fn is not None and "ctx" not in inspect.signature(fn).parameters:
+        result = fn(**arguments)
+        return await result if inspect.isawaitable(result) else result
+
+    content = await mcp.call_tool(name, arguments)
+    # Newer FastMCP returns (content blocks, structured content)
+    if isinstance(content, tuple):
+        content, structured = content
+        if structured is not None:
+            return structured
+    text = "".join(getattr(c, "text", "") or "" for c in content)
+    try:
+        return loads(text)
+    except ValueError:
+        return text
+
+
+# ============================================================
+# INCREMENTAL COLLECTION — only documents newer than the watermark
+# ============================================================
+def _flag(value) -> bool:
+    return str(value).strip().lower() not in ("false", "0", "no", "off")
+
+
+async def _incremental_query(tool, index, agent_id, limit=50):
+    """
+    Fetch only documents newer than this agent/tool's watermark, merge
+    them into its rolling window and summarize the newest `limit`.
+    """
+    key = f"{tool}:{agent_id}"
+    new = await collect_indexer_delta(
+        key, index, [{"term": {"agent.id": agent_id}}], seed_size=limit
+    )
+    docs = await asyncio.to_thread(watermarks.window, key, limit)
+    return {**summarize(tool, docs), "new": new}
+
+
 # ============================================================
 # 1) RULES SUMMARY — /rules
 # ============================================================
-@mcp.tool(name="get_wazuh_rules_summary")
-def get_rules_summary(params):
-    data = wazuh_get("/rules?limit=5000")
+@wazuh_tool("get_wazuh_rules_summary")
+async def get_rules_summary(params) -> dict:
+    data = await awazuh_get("/rules?limit=5000")
     count = data["data"]["total_affected_items"]
-    return f"Total rules installed: {count}"
+    return {"total_rules": count}
 
 
 # ============================================================
 # 2) MANAGER LOGS — /manager/logs
 # ============================================================
-@mcp.tool(name="get_wazuh_manager_logs")
-@auto_params("limit", defaults={"limit": "50"})
-def get_manager_logs(params):
+@wazuh_tool("get_wazuh_manager_logs")
+@auto_params(
+    "limit", "incremental", defaults={"limit": "50", "incremental": "true"},
+)
+async def get_manager_logs(params) -> dict:
     raw = params["limit"]
 
     # Convert to int safely
@@ -45,42 +159,51 @@ def get_manager_logs(params):
     if limit > 5000:
         limit = 5000
 
-    data = wazuh_get(f"/manager/logs?limit={limit}&sort=-timestamp")
-    return str(compress_results(data,max_items=10, max_fields=6))
+    if _flag(params["incremental"]):
+        # The window only grows to WATERMARK_WINDOW_SIZE
+        limit = min(limit, WATERMARK_WINDOW_SIZE)
+        new = await collect_manager_logs_delta("manager_logs", seed_size=limit)
+        logs = await asyncio.to_thread(
+            watermarks.window, "manager_logs", limit,
+        )
+        return {**summarize("get_wazuh_manager_logs", logs), "new": new}
+
+    data = await awazuh_get(f"/manager/logs?limit={limit}&sort=-timestamp")
+    return summarize("get_wazuh_manager_logs", data)
 
 # ============================================================
 # 3) WEEKLY STATS — /manager/stats/weekly
 # ============================================================
-@mcp.tool(name="get_wazuh_weekly_stats")
-def get_weekly_stats(params):
-    data = wazuh_get("/manager/stats/weekly")
-    return str(compress_results(data,max_items=10, max_fields=6))
+@wazuh_tool("get_wazuh_weekly_stats")
+async def get_weekly_stats(params) -> dict:
+    data = await awazuh_get("/manager/stats/weekly")
+    return summarize("get_wazuh_weekly_stats", data)
 
 
 # ============================================================
 # 4) CLUSTER NODES — /cluster/nodes
 # ============================================================
-@mcp.tool(name="get_wazuh_cluster_nodes")
-def get_cluster_nodes(params):
-    data = wazuh_get("/cluster/nodes")
-    return str(compress_results(data,max_items=10, max_fields=6))
+@wazuh_tool("get_wazuh_cluster_nodes")
+async def get_cluster_nodes(params) -> dict:
+    data = await awazuh_get("/cluster/nodes")
+    return summarize("get_wazuh_cluster_nodes", data)
 
 
 # ============================================================
 # 5) CLUSTER HEALTH — /cluster/healthcheck
 # ============================================================
-@mcp.tool(name="get_wazuh_cluster_health")
-def get_cluster_health(params):
-    data = wazuh_get("/cluster/healthcheck")
-    return str(compress_results(data,max_items=10, max_fields=6))
+@wazuh_tool("get_wazuh_cluster_health")
+async def get_cluster_health(params) -> dict:
+    data = await awazuh_get("/cluster/healthcheck")
+    return summarize("get_wazuh_cluster_health", data)
 
 
 # ============================================================
 # 6) VULNERABILITIES — /vulnerability/os/{agent_id}
 # ============================================================
-@mcp.tool(name="get_wazuh_vulnerabilities")
+@wazuh_tool("get_wazuh_vulnerabilities")
 @auto_params("agent_id", defaults={"agent_id": "001"})
-def get_wazuh_vulnerabilities(params):
+async def get_wazuh_vulnerabilities(params) -> dict:
     agent_id = params["agent_id"]
 
     body = {
@@ -94,7 +217,7 @@ def get_wazuh_vulnerabilities(params):
         }
     }
 
-    result = wazuh_indexer_post(
+    result = await awazuh_indexer_post(
         "/wazuh-states-vulnerabilities-*/_search",body
     )
 
@@ -106,38 +229,38 @@ def get_wazuh_vulnerabilities(params):
         vulns.append(src)
 
 
-    return str(compress_results(vulns,max_items=10, max_fields=6))
+    return summarize("get_wazuh_vulnerabilities", vulns)
 
 
 
 # ============================================================
 # 7) PROCESSES — /syscollector/{agent}/processes
 # ============================================================
-@mcp.tool(name="get_wazuh_processes")
+@wazuh_tool("get_wazuh_processes")
 @auto_params("agent_id", defaults={"agent_id": "001"})
-def get_processes(params):
+async def get_processes(params) -> dict:
     agent_id = params["agent_id"]
-    data = wazuh_get(f"/syscollector/{agent_id}/processes?limit=50")
-    return str(compress_results(data,max_items=10, max_fields=6))
+    data = await awazuh_get(f"/syscollector/{agent_id}/processes?limit=50")
+    return summarize("get_wazuh_processes", data)
 
 
 # ============================================================
 # 8) AGENT PORTS — /syscollector/{agent}/ports
 # ============================================================
-@mcp.tool(name="get_wazuh_agent_ports")
+@wazuh_tool("get_wazuh_agent_ports")
 @auto_params("agent_id", defaults={"agent_id": "001"})
-def get_agent_ports(params):
+async def get_agent_ports(params) -> dict:
     agent_id = params["agent_id"]
-    data = wazuh_get(f"/syscollector/{agent_id}/ports?limit=50")
-    return str(compress_results(data,max_items=10, max_fields=6))
+    data = await awazuh_get(f"/syscollector/{agent_id}/ports?limit=50")
+    return summarize("get_wazuh_agent_ports", data)
 
 
 # ============================================================
 # 9) SEARCH MANAGER LOGS — /manager/logs?q=
 # ============================================================
-@mcp.tool(name="search_wazuh_manager_logs")
+@wazuh_tool("search_wazuh_manager_logs")
 @auto_params("query", "limit", defaults={"query": "", "limit": "20"})
-def search_manager_logs(params):
+async def search_manager_logs(params) -> dict:
     query = params["query"]
     raw_limit = params["limit"]
 
@@ -154,24 +277,27 @@ def search_manager_logs(params):
         limit = 50
 
     # call API with limit
-    data = wazuh_get(f"/manager/logs?q={query}&limit={limit}")
-
-    items = data.get("data", {}).get("affected_items", [])
+    data = await awazuh_get(f"/manager/logs?q={query}&limit={limit}")
 
-    # compress ONLY the list of log items (very important!)
-    compressed = compress_results(items, max_items=limit, max_fields=6)
-
-    return str(compressed)
+    return summarize("search_wazuh_manager_logs", data)
 
 
 # ============================================================
 # 10) CUSTOM ALERT FILTERS — /alerts
 # ============================================================
-@mcp.tool(name="custom_alert_filters")
-@auto_params("agent_id", defaults={"agent_id": "001"})
-def custom_alert_filters(params):
+@wazuh_tool("custom_alert_filters")
+@auto_params(
+    "agent_id", "incremental",
+    defaults={"agent_id": "001", "incremental": "true"},
+)
+async def custom_alert_filters(params) -> dict:
     agent_id = params["agent_id"]
 
+    if _flag(params["incremental"]):
+        return await _incremental_query(
+            "custom_alert_filters", ALERTS_INDEX, agent_id
+        )
+
     body = {
         "size": 50,
         "query": {
@@ -186,7 +312,7 @@ def custom_alert_filters(params):
         ]
     }
 
-    result = wazuh_indexer_post(
+    result = await awazuh_indexer_post(
         "/wazuh-alerts-*/_search", body
     )
 
@@ -197,17 +323,25 @@ def custom_alert_filters(params):
         src = hit.get("_source", {})
         alerts.append(src)
 
-    return str(compress_results(alerts,max_items=10, max_fields=6))
+    return summarize("custom_alert_filters", alerts)
 
 
 # ============================================================
 # 11) FIM CHANGES — /syscheck/{agent_id}
 # ============================================================
-@mcp.tool(name="custom_fim_queries")
-@auto_params("agent_id", defaults={"agent_id": "001"})
-def custom_fim_queries(params):
+@wazuh_tool("custom_fim_queries")
+@auto_params(
+    "agent_id", "incremental",
+    defaults={"agent_id": "001", "incremental": "true"},
+)
+async def custom_fim_queries(params) -> dict:
     agent_id = params["agent_id"]
 
+    if _flag(params["incremental"]):
+        return await _incremental_query(
+            "custom_fim_queries", FIM_INDEX, agent_id,
+        )
+
     body = {
         "size": 50,
         "query": {
@@ -222,7 +356,7 @@ def custom_fim_queries(params):
         ]
     }
 
-    result = wazuh_indexer_post(
+    result = await awazuh_indexer_post(
         "/wazuh-syscheck-*/_search",
         body
     )
@@ -234,50 +368,433 @@ def custom_fim_queries(params):
         src = hit.get("_source", {})
         events.append(src)
 
-    return str(compress_results(events,max_items=10, max_fields=6))
+    return summarize("custom_fim_queries", events)
 
 
 # ============================================================
 # 12) OSQUERY RESULTS — /osquery/{agent}/queries
 # ============================================================
-@mcp.tool(name="get_osquery_results")
+@wazuh_tool("get_osquery_results")
 @auto_params("agent_id", defaults={"agent_id": "001"})
-def get_osquery_results(params):
+async def get_osquery_results(params) -> dict:
     agent_id = params["agent_id"]
-    data = wazuh_get(f"/osquery/{agent_id}/queries")
-    return str(compress_results(data,max_items=10, max_fields=6))
+    data = await awazuh_get(f"/osquery/{agent_id}/queries")
+    return summarize("get_osquery_results", data)
+
+
+# ============================================================
+# 13) AGENTS HOTFFIX — /experimental/syscollector/hotfixes
+# ============================================================
+# One fleet scan serves every page; concurrent pages wait for it
+_hotfix_scan_lock = asyncio.Lock()
+
+
+async def _scan_hotfixes(ctx: Context) -> dict:
+    """{hotfixes: {agent: [KB...]}, failed: [agent...]} for the fleet."""
+    async with _hotfix_scan_lock:
+        cached = await asyncio.to_thread(
+            result_cache.get, "get_all_agents_hotfixes", "fleet",
+        )
+        if cached is not None and cached.fresh:
+            return cached.value
+
+        hotfixes = {}
+        failed = []
+
+        async def progress(done, total):
+            # One notification per finished batch, not per agent
+            await ctx.report_progress(done, total)
+
+        async for aid, hot in acollect_hotfixes(on_progress=progress):
+            if hot is None:
+                failed.append(aid)
+            else:
+                hotfixes[aid] = [h.get("hotfix") for h in hot]
+
+        scan = {"hotfixes": hotfixes, "failed": failed}
+        await asyncio.to_thread(
+            result_cache.set, "get_all_agents_hotfixes", "fleet", scan,
+        )
+        return scan
+
+
+@wazuh_tool("get_all_agents_hotfixes")
+@auto_params("offset", "limit", defaults={"offset": "0", "limit": "10"})
+async def get_all_agents_hotfixes(params, ctx: Context) -> dict:
+    """
+    offset / limit: page through the agents that have hotfixes (sorted
+    by id); next_offset is set while more agents remain. Pages share
+    one cached fleet scan.
+    """
+    offset = _int_param(params["offset"], 0, 0, 10**6)
+    limit = _int_param(params["limit"], 10, 1, 100)
+
+    scan = await _scan_hotfixes(ctx)
+    all_hotfixes = scan["hotfixes"]
+    failed = scan["failed"]
+
+    agent_ids = sorted(aid for aid, hot in all_hotfixes.items() if hot)
+    page = agent_ids[offset:offset + limit]
+    more = offset + len(page) < len(agent_ids)
+    return {
+        "agents_scanned": len(all_hotfixes) + len(failed),
+        "agents_failed": failed[:50],
+        "agents_with_hotfixes": len(agent_ids),
+        "hotfixes": {aid: all_hotfixes[aid] for aid in page},
+        "truncated": more or offset > 0,
+        "next_offset": offset + len(page) if more else None,
+    }
 
 
 # ============================================================
-# 13) AGENTS HOTFFIX — /experimental/hotfixes/{aid}
+# 14) FLEET QUERIES — many agents, one indexer query
 # ============================================================
-@mcp.tool(name="get_all_agents_hotfixes")
-def get_all_agents_hotfixes():
-    agents = wazuh_get("/agents?limit=5001")
-    items = agents.get("data", {}).get("affected_items", [])
-    all_hotfixes = {}
-    for agent in items:
-        aid = agent.get("id")
-        if not aid:
-            continue
-        try:
-            data = wazuh_get(f"/experimental/hotfixes/{aid}")
-            hot = data.get("data", {}).get("affected_items", [])
-        except:
-            hot = []
-        all_hotfixes[aid] = hot
+async def _resolve_agents(selector):
+    """Agent selector → (bool filters, agent bucket kwargs), None if empty."""
+    kind, value = parse_agent_selector(selector)
+    if kind == "group":
+        kind, value = "ids", await aget_group_agent_ids(value)
+        if not value:
+            return None
+    buckets = {"agent_buckets": len(value)} if kind == "ids" else {}
+    return agent_filter(kind, value), buckets
+
+
+def _int_param(raw, default, low, high):
+    try:
+        return max(low, min(int(raw), high))
+    except (TypeError, ValueError):
+        return default
+
+
+async def _fleet_query(index, tool, params):
+    """
+    agents: "001,002", "00*", "group:linux" or "*" (all agents)
+    per_agent: documents kept per agent
+    """
+    per_agent = _int_param(params["per_agent"], 5, 1, 20)
+
+    resolved = await _resolve_agents(params["agents"])
+    if resolved is None:
+        return {}
+    filters, buckets = resolved
+
+    body = fleet_top_hits_body(index, filters, per_agent, **buckets)
+    result = await awazuh_indexer_post(f"{index}/_search", body)
+
+    grouped = group_top_hits(result)
+    # Agents past the FLEET_MAX_AGENTS buckets still count as omitted
+    agents_total, cut = fleet_agent_count(result)
+    # One response budget, shared by as many agents as it has room for
+    kept, share, _ = fit_fleet_budget(grouped, SUMMARY_TOKEN_BUDGET)
+    for agent in kept.values():
+        agent["items"] = summarize(
+            tool, agent["items"], token_budget=share
+        )["items"]
+    omitted = agents_total - len(kept)
+    return {
+        "agents": kept,
+        "agents_total": agents_total,
+        "truncated": cut or omitted > 0,
+        "agents_omitted": omitted,
+    }
 
-    
-    return str(compress_results(all_hotfixes,max_items=10, max_fields=6))
+
+@wazuh_tool("fleet_vulnerabilities")
+@auto_params("agents", "per_agent", defaults={"agents": "*", "per_agent": "5"})
+async def fleet_vulnerabilities(params) -> dict:
+    return await _fleet_query(
+        VULNERABILITIES_INDEX, "get_wazuh_vulnerabilities", params
+    )
 
 
+@wazuh_tool("fleet_alert_filters")
+@auto_params("agents", "per_agent", defaults={"agents": "*", "per_agent": "5"})
+async def fleet_alert_filters(params) -> dict:
+    return await _fleet_query(ALERTS_INDEX, "custom_alert_filters", params)
+
+
+@wazuh_tool("fleet_fim_queries")
+@auto_params("agents", "per_agent", defaults={"agents": "*", "per_agent": "5"})
+async def fleet_fim_queries(params) -> dict:
+    return await _fleet_query(FIM_INDEX, "custom_fim_queries", params)
+
+
+# ============================================================
+# 15) SERVER-SIDE RANKING — aggregations instead of raw hits
+# ============================================================
+async def _top_alert_rules(agents, size, since):
+    resolved = await _resolve_agents(agents)
+    if resolved is None:
+        return {"by_level": {}, "rules": []}
+    filters = resolved[0] + time_filter(since)
+    result = await awazuh_indexer_post(
+        f"{ALERTS_INDEX}/_search", top_alert_rules_body(filters, size)
+    )
+    return summarize_top_alert_rules(result)
+
+
+async def _top_vulnerabilities(agents, size):
+    resolved = await _resolve_agents(agents)
+    if resolved is None:
+        return {"by_severity": {}, "cves": []}
+    result = await awazuh_indexer_post(
+        f"{VULNERABILITIES_INDEX}/_search",
+        top_vulnerabilities_body(resolved[0], size),
+    )
+    return summarize_top_vulnerabilities(result)
+
+
+@wazuh_tool("top_alert_rules")
+@auto_params("agents", "size", "since",
+             defaults={"agents": "*", "size": "10", "since": "24h"})
+async def top_alert_rules(params) -> dict:
+    size = _int_param(params["size"], 10, 1, 50)
+    return await _top_alert_rules(params["agents"], size, params["since"])
+
+
+@wazuh_tool("top_vulnerabilities")
+@auto_params("agents", "size", defaults={"agents": "*", "size": "10"})
+async def top_vulnerabilities(params) -> dict:
+    size = _int_param(params["size"], 10, 1, 50)
+    return await _top_vulnerabilities(params["agents"], size)
+
+
+@wazuh_tool("alert_timeline")
+@auto_params("agents", "interval", "since",
+             defaults={"agents": "*", "interval": "1h", "since": "24h"})
+async def alert_timeline(params) -> dict:
+    resolved = await _resolve_agents(params["agents"])
+    if resolved is None:
+        return {"timeline": []}
+    filters = resolved[0] + time_filter(params["since"])
+    result = await awazuh_indexer_post(
+        f"{ALERTS_INDEX}/_search",
+        alert_histogram_body(filters, params["interval"]),
+    )
+    return {"timeline": summarize_alert_histogram(result)}
+
+
+@wazuh_tool("top_issues_summary")
+@auto_params("agents", "since", defaults={"agents": "*", "since": "24h"})
+async def top_issues_summary(params) -> dict:
+    """Top 5 issues ranked inside the indexer (alerts + CVEs)."""
+    alerts, vulns = await asyncio.gather(
+        _top_alert_rules(params["agents"], 10, params["since"]),
+        _top_vulnerabilities(params["agents"], 10),
+    )
+    return {
+        "top_issues": rank_top_issues(alerts, vulns, limit=5),
+        "alerts_by_level": alerts["by_level"],
+        "vulnerabilities_by_severity": vulns["by_severity"],
+    }
+
+
+# ============================================================
+# 16) DEEP PAGINATION — PIT + search_after with a result budget
+# ============================================================
+async def _stream_summary(index, params, ctx, top_n=10):
+    """
+    Scan up to `budget` documents in pages and keep only counters and
+    the `top_n` highest-ranked documents, so memory stays constant.
+    When the budget runs out, "cursor" resumes the scan on the next call
+    (pass it back as the cursor param); it is None once all are seen.
+    """
+    budget = _int_param(params["budget"], 1000, 1, 100000)
+    fields = STREAM_FIELDS[index]
+    try:
+        cursor = loads(params["cursor"]) if params["cursor"] else {}
+    except ValueError:
+        cursor = None
+    if not isinstance(cursor, dict):
+        return {"error": "invalid cursor; start again without one"}
+
+    resolved = await _resolve_agents(params["agents"])
+    if resolved is None:
+        return {"scanned": 0}
+    query = {"bool": {"filter": resolved[0]}}
+
+    counts = Counter()
+    agents = Counter()
+    top = []  # min-heap of (rank, seq, doc)
+    scanned = 0
+
+    async for hit in aiter_indexer_hits(
+        index, query, INDEX_SORT[index], source=fields["source"],
+        max_hits=budget, cursor=cursor,
+    ):
+        doc = hit.get("_source", {})
+        scanned += 1
+        counts[str(dotted_get(doc, fields["group"]))] += 1
+        agents[str(dotted_get(doc, "agent.id"))] += 1
+
+        rank = dotted_get(doc, fields["rank"]) or 0
+        item = (rank, scanned, doc)
+        if len(top) < top_n:
+            heapq.heappush(top, item)
+        elif rank > top[0][0]:
+            heapq.heapreplace(top, item)
+
+        if scanned % 500 == 0:
+            await ctx.report_progress(scanned, budget)
+
+    await ctx.report_progress(scanned, budget)
+    return {
+        "scanned": scanned,
+        "budget_exhausted": scanned >= budget,
+        "by_" + fields["group"]: dict(counts.most_common(20)),
+        "top_agents": dict(agents.most_common(10)),
+        "top": [doc for _, _, doc in sorted(top, reverse=True)],
+        "cursor": dumps(cursor) if cursor else None,
+    }
+
+
+PAGINATE_DEFAULTS = {"agents": "001", "budget": "1000", "cursor": ""}
+
+
+@wazuh_tool("paginate_vulnerabilities")
+@auto_params("agents", "budget", "cursor", defaults=PAGINATE_DEFAULTS)
+async def paginate_vulnerabilities(params, ctx: Context) -> dict:
+    return await _stream_summary(VULNERABILITIES_INDEX, params, ctx)
+
+
+@wazuh_tool("paginate_alerts")
+@auto_params("agents", "budget", "cursor", defaults=PAGINATE_DEFAULTS)
+async def paginate_alerts(params, ctx: Context) -> dict:
+    return await _stream_summary(ALERTS_INDEX, params, ctx)
+
+
+@wazuh_tool("paginate_fim_events")
+@auto_params("agents", "budget", "cursor", defaults=PAGINATE_DEFAULTS)
+async def paginate_fim_events(params, ctx: Context) -> dict:
+    return await _stream_summary(FIM_INDEX, params, ctx)
+
+
+# ============================================================
+# 17) FLEET INVENTORY — local syscollector store (inventory_store.py)
+# ============================================================
+async def _inventory_agents(selector):
+    """Agent selector for inventory queries, None for an empty group."""
+    kind, value = parse_agent_selector(selector)
+    if kind == "group":
+        kind, value = "ids", await aget_group_agent_ids(value)
+        if not value:
+            return None
+    return kind, value
+
+
+async def _inventory_search(table, filters, params):
+    agents = await _inventory_agents(params["agents"])
+    if agents is None:
+        return {"total": 0, "agents": 0, "items": []}
+    limit = _int_param(params["limit"], 100, 1, 1000)
+    return await asyncio.to_thread(
+        inventory.search, table, filters, agents, limit
+    )
+
+
+@wazuh_tool("inventory_ports")
+@auto_params("port", "process", "protocol", "state", "agents", "limit",
+             defaults={"port": "", "process": "", "protocol": "", "state": "",
+                       "agents": "*", "limit": "100"})
+async def inventory_ports(params) -> dict:
+    """Open ports across the fleet, e.g. port=3389 state=listening."""
+    port = str(params["port"]).strip()
+    return await _inventory_search("ports", {
+        "local_port": int(port) if port.isdigit() else None,
+        "process": params["process"],
+        "protocol": params["protocol"],
+        "state": params["state"],
+    }, params)
+
+
+@wazuh_tool("inventory_processes")
+@auto_params("name", "user", "agents", "limit",
+             defaults={"name": "", "user": "", "agents": "*", "limit": "100"})
+async def inventory_processes(params) -> dict:
+    """Where a process runs; name accepts * and ? wildcards."""
+    return await _inventory_search("processes", {
+        "name": params["name"], "euser": params["user"],
+    }, params)
+
+
+@wazuh_tool("inventory_packages")
+@auto_params("name", "version", "agents", "limit",
+             defaults={"name": "", "version": "", "agents": "*",
+                       "limit": "100"})
+async def inventory_packages(params) -> dict:
+    """Installed packages across the fleet; * and ? wildcards."""
+    return await _inventory_search("packages", {
+        "name": params["name"], "version": params["version"],
+    }, params)
+
+
+@wazuh_tool("inventory_hotfixes")
+@auto_params("hotfix", "missing", "agents", "limit",
+             defaults={"hotfix": "", "missing": "false", "agents": "*",
+                       "limit": "100"})
+async def inventory_hotfixes(params) -> dict:
+    """Agents with a hotfix, or (missing=true) Windows agents without it."""
+    if not _flag(params["missing"]) or not params["hotfix"]:
+        return await _inventory_search(
+            "hotfixes", {"hotfix": params["hotfix"]}, params
+        )
+    agents = await _inventory_agents(params["agents"])
+    if agents is None:
+        return {"total": 0, "items": []}
+    return await asyncio.to_thread(
+        inventory.missing_hotfix, params["hotfix"], agents,
+        _int_param(params["limit"], 100, 1, 1000),
+    )
+
+
+@wazuh_tool("inventory_status")
+async def inventory_status() -> dict:
+    return await asyncio.to_thread(inventory.status)
+
+
+@wazuh_tool("sync_inventory")
+@auto_params("full", defaults={"full": "false"})
+async def sync_inventory_tool(params, ctx: Context) -> dict:
+    """Pull changed syscollector inventory into the local store."""
+    async def progress(done, total):
+        await ctx.report_progress(done, total)
+
+    result = await sync_inventory(_flag(params["full"]), on_progress=progress)
+    return {**result, "store": await asyncio.to_thread(inventory.status)}
+
 
 # ============================================================
 #   RUN SERVER
 # ============================================================
+async def serve(background):
+    """Streamable HTTP server with background jobs on the same event loop."""
+    tasks = [asyncio.create_task(job) for job in background]
+    try:
+        await mcp.run_streamable_http_async()
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
 if __name__ == "__main__":
+    require_credentials()
     print("🚀 Wazuh MCP Server running at http://127.0.0.1:8080/")
-    mcp.run(transport="streamable-http")
+    background = []
+    prefetcher = Prefetcher(call_tool_native)
+    if prefetcher.enabled:
+        print(f"🔄 Prefetching agents {prefetcher.agents} "
+              f"+ top {prefetcher.top_agents} by alerts")
+        background.append(prefetcher.run())
+    if INVENTORY_SYNC_INTERVAL > 0:
+        print(f"🗃️ Syncing inventory every {INVENTORY_SYNC_INTERVAL:g}s")
+        background.append(sync_loop(INVENTORY_SYNC_INTERVAL))
+
+    if background:
+        asyncio.run(serve(background))
+    else:
+        mcp.run(transport="streamable-http")
 
 
 
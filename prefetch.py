@@ -0,0 +1,164 @@
+"""
+Background prefetch of the top 5 workflow data, run by the MCP server.
+
+For the agents in PREFETCH_AGENTS plus the PREFETCH_TOP_AGENTS agents
+with the most alerts, the six calls behind run_top5_workflow are
+refreshed into the shared result cache shortly before their TTL runs
+out. The interactive path then only reads the cache.
+
+Calls run one at a time, at most PREFETCH_RATE per second, and back off
+while the Wazuh API / indexer keeps failing.
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+
+from indexer_queries import ALERTS_INDEX
+from indexer_queries import active_agents_body
+from indexer_queries import time_filter
+from mcp_client_call import awazuh_indexer_post
+from result_cache import result_cache
+
+# "001,002"; empty means only the most active agents
+PREFETCH_AGENTS = os.getenv('PREFETCH_AGENTS', '')
+# Also prefetch the N agents with the most alerts (0 = off)
+PREFETCH_TOP_AGENTS = int(os.getenv('PREFETCH_TOP_AGENTS', '0'))
+PREFETCH_ACTIVE_SINCE = os.getenv('PREFETCH_ACTIVE_SINCE', '24h')
+# Seconds between passes over the agent list
+PREFETCH_INTERVAL = float(os.getenv('PREFETCH_INTERVAL', '30'))
+# Upstream tool calls per second
+PREFETCH_RATE = float(os.getenv('PREFETCH_RATE', '2'))
+# Refresh a result once it has used this share of its TTL
+PREFETCH_REFRESH_AT = float(os.getenv('PREFETCH_REFRESH_AT', '0.8'))
+PREFETCH_TOOL_TIMEOUT = float(os.getenv('PREFETCH_TOOL_TIMEOUT', '60'))
+
+
+def build_tool_calls(agent_id: str = '001'):
+    """The six MCP calls behind the top 5 workflow, for one agent."""
+    return {
+        'get_wazuh_vulnerabilities': {'params': {'agent_id': agent_id}},
+        'custom_alert_filters': {'params': {'agent_id': agent_id}},
+        'get_wazuh_processes': {'params': {'agent_id': agent_id}},
+        'get_wazuh_agent_ports': {'params': {'agent_id': agent_id}},
+        'custom_fim_queries': {'params': {'agent_id': agent_id}},
+        'get_wazuh_manager_logs': {'params': {'limit': '50'}},
+    }
+
+
+def cache_tag(call: dict) -> str:
+    """Result cache tag of one tool call (shared with chroma_run)."""
+    return ''.join(f"{k}={v}" for k, v in call['params'].items())
+
+
+async def most_active_agents(size: int, since: str = PREFETCH_ACTIVE_SINCE):
+    result = await awazuh_indexer_post(
+        f"{ALERTS_INDEX}/_search",
+        active_agents_body(time_filter(since), size),
+    )
+    agents = result.get('aggregations', {}).get('agents', {})
+    buckets = agents.get('buckets', [])
+    return [bucket['key'] for bucket in buckets]
+
+
+class Prefetcher:
+    """
+    `call(tool, arguments)` runs a tool in-process (call_tool_native);
+    results go to the result cache under the same tags run_top5_workflow
+    looks up.
+    """
+
+    def __init__(
+        self,
+        call,
+        agents: str = PREFETCH_AGENTS,
+        top_agents: int = PREFETCH_TOP_AGENTS,
+        interval: float = PREFETCH_INTERVAL,
+        rate: float = PREFETCH_RATE,
+        refresh_at: float = PREFETCH_REFRESH_AT,
+    ):
+        self.call = call
+        self.agents = [a.strip() for a in agents.split(',') if a.strip()]
+        self.top_agents = top_agents
+        self.interval = interval
+        self.spacing = 1 / rate if rate > 0 else 0.0
+        self.refresh_at = refresh_at
+
+        self.refreshed = 0
+        self.errors = 0
+        self._failures = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.agents or self.top_agents)
+
+    async def targets(self) -> list[str]:
+        agents = list(self.agents)
+        if self.top_agents:
+            try:
+                active = await most_active_agents(self.top_agents)
+            except Exception as e:
+                print(f"Prefetch: could not rank agents: {e}")
+                active = []
+            agents += [a for a in active if a not in agents]
+        return agents
+
+    def _due(self, tool: str, tag: str) -> bool:
+        age = result_cache.age(tool, tag)
+        if age is None:
+            return True
+        return age >= result_cache.ttl_for(tool) * self.refresh_at
+
+    async def _pause(self):
+        # Back off (up to one interval) while upstream keeps failing
+        delay = self.spacing * 2 ** min(self._failures, 10)
+        await asyncio.sleep(min(delay, self.interval))
+
+    async def run_once(self) -> int:
+        """One pass: refresh every due result. Returns how many were."""
+        calls = {}
+        for agent in await self.targets():
+            for tool, call in build_tool_calls(agent).items():
+                # Agent-independent calls (manager logs) are fetched once
+                calls[(tool, cache_tag(call))] = call
+
+        refreshed = 0
+        for (tool, tag), call in calls.items():
+            if not await asyncio.to_thread(self._due, tool, tag):
+                continue
+            await self._pause()
+            try:
+                result = await asyncio.wait_for(
+                    self.call(tool, call), PREFETCH_TOOL_TIMEOUT,
+                )
+                if result is None or result == '':
+                    raise RuntimeError('empty result')
+            except Exception as e:
+                self.errors += 1
+                self._failures += 1
+                print(f"Prefetch of {tool} ({tag}) failed: {e}")
+                continue
+
+            self._failures = 0
+            await asyncio.to_thread(result_cache.set, tool, tag, result)
+            refreshed += 1
+
+        self.refreshed += refreshed
+        return refreshed
+
+    async def run(self):
+        while True:
+            started = time.monotonic()
+            try:
+                refreshed = await self.run_once()
+                if refreshed:
+                    print(
+                        f"Prefetch: refreshed {refreshed} results in "
+                        f"{time.monotonic() - started:.1f}s",
+                    )
+            except Exception as e:
+                print(f"Prefetch pass failed: {e}")
+            await asyncio.sleep(
+                max(0.0, self.interval - (time.monotonic() - started)),
+            )
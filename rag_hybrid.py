@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+import hashlib
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter
+from collections import defaultdict
+from functools import lru_cache
+
+from langchain_core.documents import Document
+
+RAG_FETCH_K = int(os.getenv('RAG_FETCH_K', '20'))
+# none | mmr | cross-encoder
+RAG_RERANK = os.getenv('RAG_RERANK', 'none')
+RAG_CROSS_ENCODER = os.getenv(
+    'RAG_CROSS_ENCODER', 'cross-encoder/ms-marco-MiniLM-L-6-v2',
+)
+# Seconds between checks that the BM25 index matches the collection
+BM25_SYNC_INTERVAL = float(os.getenv('BM25_SYNC_INTERVAL', '30'))
+RRF_K = 60
+
+# Keeps rule ids, CVE ids, decoder names and paths as single tokens
+# ("cve-2024-3094", "sshd.auth", "/var/ossec") and also adds their parts.
+_TOKEN = re.compile(r"[a-z0-9]+(?:[-_.:/][a-z0-9]+)*")
+_PART = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> list[str]:
+    tokens = []
+    for match in _TOKEN.findall(text.lower()):
+        tokens.append(match)
+        parts = _PART.findall(match)
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+
+def _matches(metadata: dict, where: dict | None) -> bool:
+    if not where:
+        return True
+    return all(metadata.get(k) == v for k, v in where.items())
+
+
+class BM25Index:
+    """
+    In-memory Okapi BM25 over a Chroma collection.
+    Rebuilt when the collection's set of ids changes (checked at most
+    every BM25_SYNC_INTERVAL seconds) or after `invalidate()`. Ingested
+    chunk ids are content hashes, so an edited document changes the set
+    even when its chunk count stays the same.
+    """
+
+    def __init__(self, db, k1: float = 1.5, b: float = 0.75):
+        self.db = db
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._synced_signature = ''
+        self._checked_at = 0.0
+        self._docs: list[Document] = []
+        self._lengths: list[int] = []
+        self._postings: dict[str, list[tuple[int, int]]] = {}
+        self._avg_len = 0.0
+
+    def invalidate(self):
+        with self._lock:
+            self._synced_signature = ''
+            self._checked_at = 0.0
+
+    def _sync(self):
+        now = time.monotonic()
+        if now - self._checked_at < BM25_SYNC_INTERVAL:
+            return
+        self._checked_at = now
+
+        ids = self.db.get(include=[])['ids']
+        signature = hashlib.sha1('\n'.join(sorted(ids)).encode()).hexdigest()
+        if signature == self._synced_signature:
+            return
+
+        data = self.db.get(include=['documents', 'metadatas'])
+        docs, lengths = [], []
+        postings: dict[str, list[tuple[int, int]]] = defaultdict(list)
+        for i, (doc_id, text, meta) in enumerate(
+            zip(data['ids'], data['documents'], data['metadatas']),
+        ):
+            terms = Counter(tokenize(text or ''))
+            for term, tf in terms.items():
+                postings[term].append((i, tf))
+            docs.append(Document(
+                id=doc_id, page_content=text or '', metadata=meta or {},
+            ))
+            lengths.append(sum(terms.values()))
+
+        self._docs = docs
+        self._lengths = lengths
+        self._postings = dict(postings)
+        self._avg_len = sum(lengths) / len(lengths) if lengths else 0.0
+        self._synced_signature = signature
+
+    def search(
+        self, query: str, k: int, where: dict | None = None,
+    ) -> list[Document]:
+        with self._lock:
+            self._sync()
+            n = len(self._docs)
+            if not n:
+                return []
+
+            scores: dict[int, float] = defaultdict(float)
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                df = len(postings)
+                idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+                for i, tf in postings:
+                    length = self._lengths[i] / self._avg_len
+                    norm = 1 - self.b + self.b * length
+                    scores[i] += (
+                        idf * tf * (self.k1 + 1) / (tf + self.k1 * norm)
+                    )
+
+            ranked = sorted(scores, key=scores.__getitem__, reverse=True)
+            return [
+                self._docs[i] for i in ranked
+                if _matches(self._docs[i].metadata, where)
+            ][:k]
+
+
+def _doc_key(doc: Document) -> str:
+    return doc.id or doc.page_content
+
+
+def reciprocal_rank_fusion(*rankings: list[Document]) -> list[Document]:
+    scores: dict[str, float] = defaultdict(float)
+    docs: dict[str, Document] = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking):
+            key = _doc_key(doc)
+            scores[key] += 1 / (RRF_K + rank + 1)
+            docs.setdefault(key, doc)
+    ranked = sorted(scores, key=scores.__getitem__, reverse=True)
+    return [docs[key] for key in ranked]
+
+
+@lru_cache(maxsize=1)
+def _cross_encoder():
+    from sentence_transformers import CrossEncoder
+
+    return CrossEncoder(RAG_CROSS_ENCODER, device='cpu')
+
+
+def cross_encoder_rerank(query: str, docs: list[Document]) -> list[Document]:
+    if not docs:
+        return docs
+    scores = _cross_encoder().predict([(query, d.page_content) for d in docs])
+    order = sorted(range(len(docs)), key=lambda i: scores[i], reverse=True)
+    return [docs[i] for i in order]
+
+
+_indexes: dict[int, BM25Index] = {}
+_indexes_lock = threading.Lock()
+
+
+def bm25_index(db) -> BM25Index:
+    """One BM25 index per vector store instance."""
+    with _indexes_lock:
+        index = _indexes.get(id(db))
+        if index is None:
+            index = _indexes[id(db)] = BM25Index(db)
+        return index
+
+
+def hybrid_search(
+    db,
+    query: str,
+    k: int = 4,
+    fetch_k: int = RAG_FETCH_K,
+    where: dict | None = None,
+    rerank: str = RAG_RERANK,
+    mode: str = 'hybrid',
+) -> list[Document]:
+    """
+    mode: vector | bm25 | hybrid (reciprocal-rank fusion of both)
+    rerank: none | mmr (diverse vector candidates) | cross-encoder
+    where: metadata equality filter applied to both retrievers
+    """
+    vector: list[Document] = []
+    keyword: list[Document] = []
+
+    if mode in ('vector', 'hybrid'):
+        if rerank == 'mmr':
+            vector = db.max_marginal_relevance_search(
+                query, k=fetch_k, fetch_k=fetch_k * 2, filter=where,
+            )
+        else:
+            vector = db.similarity_search(query, k=fetch_k, filter=where)
+    if mode in ('bm25', 'hybrid'):
+        keyword = bm25_index(db).search(query, fetch_k, where)
+
+    fused = reciprocal_rank_fusion(vector, keyword)
+    if rerank == 'cross-encoder':
+        fused = cross_encoder_rerank(query, fused)
+    return fused[:k]
@@ -0,0 +1,369 @@
+"""
+Bulk ingestion of Wazuh documentation into the RAG store.
+
+    python rag_ingest.py ./wazuh-docs --chunk-size 1000 --chunk-overlap 150
+
+Walks a directory of Markdown / HTML / PDF / text files, chunks them,
+dedupes chunks by content hash, embeds new chunks in parallel batches and
+upserts them. A manifest remembers each file's hash so a re-run only
+re-embeds files that changed (and drops chunks of deleted files).
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import os
+import sqlite3
+import sys
+import time
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from dataclasses import field
+from html.parser import HTMLParser
+
+from dotenv import load_dotenv
+
+INGEST_MANIFEST_PATH = os.getenv(
+    'INGEST_MANIFEST_PATH', './rag_chroma/ingest_manifest.sqlite3',
+)
+
+TEXT_EXTENSIONS = {'.md', '.markdown', '.rst', '.txt'}
+HTML_EXTENSIONS = {'.html', '.htm'}
+PDF_EXTENSIONS = {'.pdf'}
+
+
+# ============================================================
+#  Readers
+# ============================================================
+class _TextExtractor(HTMLParser):
+    SKIP = {'script', 'style', 'nav', 'header', 'footer'}
+
+    def __init__(self):
+        super().__init__()
+        self.parts: list[str] = []
+        self._skipping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP:
+            self._skipping += 1
+        elif tag in ('p', 'br', 'li', 'h1', 'h2', 'h3', 'h4', 'pre', 'tr'):
+            self.parts.append('\n')
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP and self._skipping:
+            self._skipping -= 1
+
+    def handle_data(self, data):
+        if not self._skipping:
+            self.parts.append(data)
+
+
+def read_document(path: str) -> str:
+    ext = os.path.splitext(path)[1].lower()
+    if ext in PDF_EXTENSIONS:
+        from pypdf import PdfReader
+
+        reader = PdfReader(path)
+        return '\n'.join(page.extract_text() or '' for page in reader.pages)
+
+    with open(path, encoding='utf-8', errors='replace') as f:
+        text = f.read()
+    if ext in HTML_EXTENSIONS:
+        parser = _TextExtractor()
+        parser.feed(text)
+        return ''.join(parser.parts)
+    return text
+
+
+def iter_documents(root: str) -> Iterator[str]:
+    supported = TEXT_EXTENSIONS | HTML_EXTENSIONS | PDF_EXTENSIONS
+    for directory, _, files in os.walk(root):
+        for name in sorted(files):
+            if os.path.splitext(name)[1].lower() in supported:
+                yield os.path.join(directory, name)
+
+
+def sha256(data: bytes | str) -> str:
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    return hashlib.sha256(data).hexdigest()
+
+
+# ============================================================
+#  Manifest: which file produced which chunks
+# ============================================================
+class Manifest:
+
+    def __init__(self, path: str = INGEST_MANIFEST_PATH):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.executescript(
+            'CREATE TABLE IF NOT EXISTS files ('
+            ' path TEXT PRIMARY KEY, sha256 TEXT, mtime REAL, size INTEGER);'
+            'CREATE TABLE IF NOT EXISTS chunks ('
+            ' path TEXT, chunk_id TEXT, PRIMARY KEY (path, chunk_id));'
+            'CREATE INDEX IF NOT EXISTS chunks_by_id ON chunks (chunk_id);',
+        )
+
+    def file(self, path: str):
+        return self.db.execute(
+            'SELECT sha256, mtime, size FROM files WHERE path = ?', (path,),
+        ).fetchone()
+
+    def paths(self) -> list[str]:
+        return [r[0] for r in self.db.execute('SELECT path FROM files')]
+
+    def chunk_ids(self, path: str) -> set[str]:
+        rows = self.db.execute(
+            'SELECT chunk_id FROM chunks WHERE path = ?', (path,),
+        )
+        return {r[0] for r in rows}
+
+    def replace(self, path, digest, mtime, size, chunk_ids) -> set[str]:
+        """Record a file's chunks; return ids no file references anymore."""
+        old = self.chunk_ids(path)
+        self.db.execute(
+            'INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)',
+            (path, digest, mtime, size),
+        )
+        self.db.execute('DELETE FROM chunks WHERE path = ?', (path,))
+        self.db.executemany(
+            'INSERT OR IGNORE INTO chunks VALUES (?, ?)',
+            [(path, cid) for cid in chunk_ids],
+        )
+        self.db.commit()
+        return {cid for cid in old - set(chunk_ids) if not self.used(cid)}
+
+    def forget(self, path: str) -> set[str]:
+        old = self.chunk_ids(path)
+        self.db.execute('DELETE FROM files WHERE path = ?', (path,))
+        self.db.execute('DELETE FROM chunks WHERE path = ?', (path,))
+        self.db.commit()
+        return {cid for cid in old if not self.used(cid)}
+
+    def used(self, chunk_id: str) -> bool:
+        return self.db.execute(
+            'SELECT 1 FROM chunks WHERE chunk_id = ? LIMIT 1', (chunk_id,),
+        ).fetchone() is not None
+
+
+# ============================================================
+#  Pipeline
+# ============================================================
+@dataclass
+class IngestStats:
+    files_seen: int = 0
+    files_changed: int = 0
+    files_removed: int = 0
+    chunks_total: int = 0
+    chunks_embedded: int = 0
+    chunks_deleted: int = 0
+    legacy_purged: int = 0
+    errors: list[str] = field(default_factory=list)
+
+
+def _embed_batches(embeddings, batches, workers):
+    """Embed batches of (id, text, metadata) in parallel, in order."""
+    def embed(batch):
+        texts = [text for _, text, _ in batch]
+        return batch, embeddings.embed_documents(texts)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        yield from pool.map(embed, batches)
+
+
+def ingest(
+    root: str,
+    chunk_size: int = 1000,
+    chunk_overlap: int = 150,
+    batch_size: int = 64,
+    workers: int = 4,
+    collection_name: str | None = None,
+    prune: bool = True,
+) -> IngestStats:
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    from rag_store import get_embeddings
+    from rag_store import get_vectorstore
+    from rag_store import purge_legacy_mcp_results
+    from rag_store import RAG_COLLECTION
+
+    db = get_vectorstore(collection_name or RAG_COLLECTION)
+    embeddings = get_embeddings()
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size, chunk_overlap=chunk_overlap,
+    )
+    manifest = Manifest()
+    stats = IngestStats()
+
+    pending: list[tuple[str, str, dict]] = []
+    queued: set[str] = set()
+    upserted: set[str] = set()
+    seen_paths: set[str] = set()
+    to_delete: set[str] = set()
+    # Files whose chunks are not all stored yet: (manifest row, chunk
+    # ids still waiting). The manifest only records a file once they
+    # are, so a failed embedding retries the file on the next run.
+    staged: list[tuple[tuple, set[str]]] = []
+
+    def record_stored():
+        nonlocal to_delete
+        waiting = []
+        for row, needed in staged:
+            if needed <= upserted:
+                to_delete |= manifest.replace(*row)
+            else:
+                waiting.append((row, needed))
+        staged[:] = waiting
+
+    def flush(force=False):
+        if not pending or (len(pending) < batch_size * workers and not force):
+            return
+        batches = [
+            pending[i:i + batch_size]
+            for i in range(0, len(pending), batch_size)
+        ]
+        pending.clear()
+        try:
+            for batch, vectors in _embed_batches(embeddings, batches, workers):
+                ids = [cid for cid, _, _ in batch]
+                db._collection.upsert(
+                    ids=ids,
+                    embeddings=vectors,
+                    documents=[text for _, text, _ in batch],
+                    metadatas=[meta for _, _, meta in batch],
+                )
+                upserted.update(ids)
+                stats.chunks_embedded += len(batch)
+        finally:
+            record_stored()
+
+    for path in iter_documents(root):
+        rel = os.path.relpath(path, root)
+        seen_paths.add(rel)
+        stats.files_seen += 1
+
+        st = os.stat(path)
+        known = manifest.file(rel)
+        if known and known[1] == st.st_mtime and known[2] == st.st_size:
+            continue
+
+        with open(path, 'rb') as f:
+            digest = sha256(f.read())
+        if known and known[0] == digest:
+            manifest.replace(
+                rel, digest, st.st_mtime, st.st_size, manifest.chunk_ids(rel),
+            )
+            continue
+
+        try:
+            text = read_document(path)
+        except Exception as e:
+            stats.errors.append(f"{rel}: {e}")
+            continue
+
+        stats.files_changed += 1
+        chunks = {sha256(chunk): chunk for chunk in splitter.split_text(text)}
+        stats.chunks_total += len(chunks)
+
+        # Content-hash ids: identical chunks from any file are stored once
+        ids = [cid for cid in chunks if cid not in queued]
+        existing = set(db.get(ids=ids, include=[])['ids']) if ids else set()
+        for cid in ids:
+            if cid in existing:
+                continue
+            queued.add(cid)
+            pending.append((
+                cid, chunks[cid], {'type': 'doc', 'source': rel},
+            ))
+
+        # Chunks queued by this file or an earlier one in this run
+        staged.append((
+            (rel, digest, st.st_mtime, st.st_size, list(chunks)),
+            {cid for cid in chunks if cid in queued},
+        ))
+        record_stored()
+        flush()
+
+    flush(force=True)
+
+    if prune:
+        for rel in set(manifest.paths()) - seen_paths:
+            to_delete |= manifest.forget(rel)
+            stats.files_removed += 1
+
+    # A later file in this run may still share a chunk we meant to drop
+    to_delete = {cid for cid in to_delete if not manifest.used(cid)}
+    if to_delete:
+        db.delete(ids=sorted(to_delete))
+        stats.chunks_deleted = len(to_delete)
+
+    if prune:
+        # Raw MCP output older versions cached next to the docs
+        stats.legacy_purged = purge_legacy_mcp_results(
+            collection_name or RAG_COLLECTION,
+        )
+
+    if stats.chunks_embedded or stats.chunks_deleted or stats.legacy_purged:
+        from rag_hybrid import bm25_index
+
+        bm25_index(db).invalidate()
+
+    return stats
+
+
+def main(argv=None):
+    load_dotenv()
+    parser = argparse.ArgumentParser(
+        description='Ingest Wazuh documentation into the RAG store.',
+    )
+    parser.add_argument('root', help='directory of .md/.html/.pdf/.txt docs')
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    parser.add_argument('--chunk-overlap', type=int, default=150)
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--collection', default=None)
+    parser.add_argument(
+        '--no-prune', action='store_true',
+        help='keep chunks of files that disappeared from root and '
+        'legacy MCP results',
+    )
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    stats = ingest(
+        args.root,
+        chunk_size=args.chunk_size,
+        chunk_overlap=args.chunk_overlap,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        collection_name=args.collection,
+        prune=not args.no_prune,
+    )
+    elapsed = max(time.perf_counter() - started, 1e-9)
+
+    print(
+        f"files: {stats.files_seen} seen, {stats.files_changed} changed, "
+        f"{stats.files_removed} removed",
+    )
+    print(
+        f"chunks: {stats.chunks_total} in changed files, "
+        f"{stats.chunks_embedded} embedded, {stats.chunks_deleted} deleted",
+    )
+    if stats.legacy_purged:
+        print(f"legacy MCP results purged: {stats.legacy_purged}")
+    print(
+        f"throughput: {stats.files_changed / elapsed:.1f} docs/s, "
+        f"{stats.chunks_embedded / elapsed:.1f} chunks/s "
+        f"({elapsed:.1f}s)",
+    )
+    for error in stats.errors:
+        print(f"error: {error}", file=sys.stderr)
+    return 1 if stats.errors else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -1,14 +1,58 @@
-from langchain_openai import OpenAIEmbeddings
-from langchain_chroma import Chroma
 import os
+import threading
+
+# Switching EMBEDDING_BACKEND changes vector size: use a separate collection
+RAG_COLLECTION = os.getenv("RAG_COLLECTION", "wazuh_rag")
+RAG_PERSIST_DIRECTORY = os.getenv("CHROMA_PERSIST_DIRECTORY", "./rag_chroma")
+
+# One Chroma client per collection and one embedding client per process,
+# built on first use (not at import time).
+_stores = {}
+_embeddings = None
+_lock = threading.Lock()
+
+
+def get_embeddings():
+    global _embeddings
+    with _lock:
+        if _embeddings is None:
+            from embedding_cache import load_cached_embeddings
+
+            # Cached + batched; the backend (OpenAI or local) comes from env
+            _embeddings = load_cached_embeddings()
+        return _embeddings
+
+
+def get_vectorstore(collection_name=RAG_COLLECTION):
+    """Process-wide, lazily created Chroma store for `collection_name`."""
+    embeddings = get_embeddings()
+    with _lock:
+        db = _stores.get(collection_name)
+        if db is None:
+            from langchain_chroma import Chroma
+
+            db = Chroma(
+                collection_name=collection_name,
+                persist_directory=RAG_PERSIST_DIRECTORY,
+                embedding_function=embeddings
+            )
+            _stores[collection_name] = db
+        return db
+
 
 def load_rag_vectorstore():
-    embeddings = OpenAIEmbeddings(openai_api_key=os.getenv("api_key"))
+    """Documentation store (kept for existing callers)."""
+    return get_vectorstore(RAG_COLLECTION)
 
-    db = Chroma(
-        collection_name="wazuh_rag",
-        persist_directory="./rag_chroma",
-        embedding_function=embeddings
-    )
 
-    return db
+def purge_legacy_mcp_results(collection_name=RAG_COLLECTION):
+    """
+    Older versions cached raw MCP tool output in the docs collection,
+    where it polluted documentation search. Tool results now live in
+    result_cache; this removes the leftovers.
+    """
+    db = get_vectorstore(collection_name)
+    stale = db.get(where={"type": "mcp"}, include=[])
+    if stale["ids"]:
+        db.delete(ids=stale["ids"])
+    return len(stale["ids"])
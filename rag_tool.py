@@ -1,14 +1,19 @@
 # rag_tool.py
 from langchain.tools import tool
+from rag_hybrid import hybrid_search
 from rag_store import load_rag_vectorstore
 
-db = load_rag_vectorstore()
-
 
 @tool
-def wazuh_rag_search(query: str) -> str:
-    """Searches your Wazuh documentation using vector embeddings."""
-    results = db.similarity_search(query, k=4)
+def wazuh_rag_search(query: str, source: str = "") -> str:
+    """
+    Searches your Wazuh documentation (keyword + vector hybrid search).
+    Optionally restrict results to one ingested document via `source`.
+    """
+    # Shared store, created on the first search rather than at import
+    db = load_rag_vectorstore()
+    where = {"source": source} if source else None
+    results = hybrid_search(db, query, k=4, where=where)
 
     if not results:
         return "No relevant information found in the Wazuh RAG store."
@@ -0,0 +1,276 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any
+
+from jsonutil import dumps
+from jsonutil import loads
+
+RESULT_CACHE_PATH = os.getenv(
+    'RESULT_CACHE_PATH', './rag_chroma/mcp_result_cache.sqlite3',
+)
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv('RESULT_CACHE_MAX_ENTRIES', '512'))
+RESULT_CACHE_DEFAULT_TTL = float(os.getenv('RESULT_CACHE_DEFAULT_TTL', '300'))
+# How long past its TTL an entry may still be served while it is refreshed
+RESULT_CACHE_STALE_TTL = float(os.getenv('RESULT_CACHE_STALE_TTL', '900'))
+
+# Namespace for tool outputs a conversation refers back to
+# (conversation.py). They are copies of results, not source data.
+REF_TOOL = 'conversation_result'
+
+# Seconds a tool result stays fresh. Fast-moving data gets short TTLs.
+DEFAULT_TOOL_TTLS = {
+    'custom_alert_filters': 60,
+    'get_wazuh_manager_logs': 60,
+    'custom_fim_queries': 120,
+    'get_wazuh_agent_ports': 300,
+    'get_wazuh_processes': 300,
+    'get_wazuh_vulnerabilities': 3600,
+    'get_all_agents_hotfixes': 3600,
+    REF_TOOL: 3600,
+}
+
+
+def _parse_ttls(raw: str) -> dict[str, float]:
+    """Parse `tool=seconds,tool=seconds` (RESULT_CACHE_TTLS)."""
+    ttls = {}
+    for part in raw.split(','):
+        name, _, value = part.partition('=')
+        if name.strip() and value.strip():
+            ttls[name.strip()] = float(value)
+    return ttls
+
+
+@dataclass
+class CacheEntry:
+    value: Any
+    stored_at: float
+    ttl: float
+    stale_ttl: float
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.stored_at
+
+    @property
+    def fresh(self) -> bool:
+        return self.age < self.ttl
+
+    @property
+    def servable(self) -> bool:
+        """Fresh, or stale but still inside the revalidation window."""
+        return self.age < self.ttl + self.stale_ttl
+
+
+class ResultCache:
+    """
+    Two-level cache for MCP tool results.
+    - in-memory LRU in front of a SQLite file shared between processes
+    - per-tool TTLs with a stale-while-revalidate window
+    - values are stored as JSON, nothing is embedded
+    """
+
+    def __init__(
+        self,
+        path: str = RESULT_CACHE_PATH,
+        max_entries: int = RESULT_CACHE_MAX_ENTRIES,
+        default_ttl: float = RESULT_CACHE_DEFAULT_TTL,
+        stale_ttl: float = RESULT_CACHE_STALE_TTL,
+        ttls: dict[str, float] | None = None,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.stale_ttl = stale_ttl
+        self.ttls = {
+            **DEFAULT_TOOL_TTLS,
+            **_parse_ttls(os.getenv('RESULT_CACHE_TTLS', '')),
+            **(ttls or {}),
+        }
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._memory: OrderedDict[str, CacheEntry] = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: sqlite3.Connection | None = None
+
+    # ------------------------------------------------------------
+    #  storage
+    # ------------------------------------------------------------
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS results ('
+                ' key TEXT PRIMARY KEY,'
+                ' tool TEXT NOT NULL,'
+                ' tag TEXT NOT NULL,'
+                ' value TEXT NOT NULL,'
+                ' stored_at REAL NOT NULL)',
+            )
+            self._db.commit()
+        return self._db
+
+    @staticmethod
+    def key(tool: str, tag: str) -> str:
+        return f"{tool}-{tag}"
+
+    def ttl_for(self, tool: str) -> float:
+        return float(self.ttls.get(tool, self.default_ttl))
+
+    def _remember(self, key: str, entry: CacheEntry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def _load_disk(self, tool: str, key: str) -> CacheEntry | None:
+        row = self._conn().execute(
+            'SELECT value, stored_at FROM results WHERE key = ?', (key,),
+        ).fetchone()
+        if row is None:
+            return None
+        return CacheEntry(
+            value=loads(row[0]),
+            stored_at=row[1],
+            ttl=self.ttl_for(tool),
+            stale_ttl=self.stale_ttl,
+        )
+
+    # ------------------------------------------------------------
+    #  public API
+    # ------------------------------------------------------------
+    def get(self, tool: str, tag: str) -> CacheEntry | None:
+        """Return a servable entry (check `.fresh`) or None on a miss."""
+        key = self.key(tool, tag)
+        with self._lock:
+            entry = self._memory.get(key)
+
+            # Another process (e.g. the server prefetcher) may have
+            # written a newer copy to disk.
+            if entry is None or not entry.fresh:
+                disk = self._load_disk(tool, key)
+                newer = entry is None or (
+                    disk is not None and disk.stored_at > entry.stored_at
+                )
+                if disk and newer:
+                    entry = disk
+
+            if entry is None or not entry.servable:
+                self.misses += 1
+                return None
+
+            self._remember(key, entry)
+            if entry.fresh:
+                self.hits += 1
+            else:
+                self.stale_hits += 1
+            return entry
+
+    def age(self, tool: str, tag: str) -> float | None:
+        """Seconds since the shared (disk) copy was written, None if absent."""
+        with self._lock:
+            row = self._conn().execute(
+                'SELECT stored_at FROM results WHERE key = ?',
+                (self.key(tool, tag),),
+            ).fetchone()
+        return time.time() - row[0] if row else None
+
+    def set(self, tool: str, tag: str, value: Any):
+        key = self.key(tool, tag)
+        now = time.time()
+        with self._lock:
+            self._conn().execute(
+                'INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)',
+                (key, tool, tag, dumps(value), now),
+            )
+            self._conn().commit()
+            self._remember(
+                key,
+                CacheEntry(value, now, self.ttl_for(tool), self.stale_ttl),
+            )
+
+    def invalidate(self, tool: str | None = None, tag: str | None = None):
+        """Drop entries matching tool and/or tag (everything if neither)."""
+        clauses, args = [], []
+        if tool is not None:
+            clauses.append('tool = ?')
+            args.append(tool)
+        if tag is not None:
+            clauses.append('tag = ?')
+            args.append(tag)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ''
+
+        with self._lock:
+            keys = [
+                row[0] for row in self._conn().execute(
+                    f"SELECT key FROM results{where}", args,
+                )
+            ]
+            self._conn().execute(f"DELETE FROM results{where}", args)
+            self._conn().commit()
+            for key in keys:
+                self._memory.pop(key, None)
+        return len(keys)
+
+    def fingerprint(self, keys: list[tuple[str, str]] | None = None) -> str:
+        """
+        Changes when the data of the given (tool, tag) rows changes, or,
+        without keys, whenever any result is written or dropped.
+        Conversation refs are left out: writing one changes no data.
+        """
+        if keys is None:
+            query = (
+                'SELECT key, stored_at FROM results WHERE tool != ?'
+                ' ORDER BY key'
+            )
+            args: list = [REF_TOOL]
+        else:
+            # Content, not stored_at: a refresh returning the same data
+            # is not a change.
+            names = sorted({self.key(tool, tag) for tool, tag in keys})
+            query = (
+                'SELECT key, value FROM results'
+                f" WHERE key IN ({','.join('?' * len(names))}) ORDER BY key"
+            )
+            args = names
+        with self._lock:
+            rows = self._conn().execute(query, args).fetchall()
+        return hashlib.sha1(repr(rows).encode()).hexdigest()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.stale_hits + self.misses
+        with self._lock:
+            ages = {
+                key: round(entry.age, 1)
+                for key, entry in self._memory.items()
+            }
+        return {
+            'hits': self.hits,
+            'stale_hits': self.stale_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_ratio': (
+                round((self.hits + self.stale_hits) / lookups, 3)
+                if lookups else 0.0
+            ),
+            'entries': len(ages),
+            'ages': ages,
+        }
+
+
+result_cache = ResultCache()
@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import json
+import os
+from functools import lru_cache
+from typing import Any
+
+# Approximate LLM tokens each tool response may spend
+SUMMARY_TOKEN_BUDGET = int(os.getenv('SUMMARY_TOKEN_BUDGET', '1200'))
+SUMMARY_MAX_STRING = int(os.getenv('SUMMARY_MAX_STRING', '200'))
+SUMMARY_TOKENIZER = os.getenv('SUMMARY_TOKENIZER', 'o200k_base')
+
+# Dotted paths worth showing the model, per tool. Tools not listed keep
+# every (flattened) field and rely on the token budget alone.
+TOOL_FIELDS = {
+    'get_wazuh_vulnerabilities': [
+        'agent.id', 'vulnerability.id', 'vulnerability.severity',
+        'vulnerability.score.base', 'package.name', 'package.version',
+        'vulnerability.description',
+    ],
+    'custom_alert_filters': [
+        '@timestamp', 'agent.id', 'rule.id', 'rule.level',
+        'rule.description', 'rule.groups', 'data.srcip', 'data.dstuser',
+    ],
+    'custom_fim_queries': [
+        '@timestamp', 'agent.id', 'syscheck.path', 'syscheck.event',
+        'syscheck.uname_after', 'rule.level', 'rule.description',
+    ],
+    'get_wazuh_processes': [
+        'name', 'pid', 'ppid', 'euser', 'state', 'cmd',
+    ],
+    'get_wazuh_agent_ports': [
+        'local.ip', 'local.port', 'remote.ip', 'remote.port', 'protocol',
+        'state', 'process', 'pid',
+    ],
+    'get_wazuh_manager_logs': ['timestamp', 'level', 'tag', 'description'],
+    'search_wazuh_manager_logs': ['timestamp', 'level', 'tag', 'description'],
+    'get_wazuh_cluster_nodes': ['name', 'type', 'version', 'ip'],
+    'get_all_agents_hotfixes': ['hotfix', 'agent_id'],
+}
+
+_SEVERITY_WORDS = {
+    'critical': 15, 'high': 12, 'error': 10, 'medium': 7, 'warning': 6,
+    'deleted': 8, 'modified': 6, 'low': 3, 'added': 3, 'info': 1,
+    'debug': 0,
+}
+
+
+def flatten(doc: Any, prefix: str = '') -> dict[str, Any]:
+    """{"rule": {"level": 5}} → {"rule.level": 5}. Lists stay as values."""
+    if not isinstance(doc, dict):
+        return {prefix or 'value': doc}
+    flat: dict[str, Any] = {}
+    for key, value in doc.items():
+        path = f"{prefix}.{key}" if prefix else str(key)
+        if isinstance(value, dict):
+            flat.update(flatten(value, path))
+        else:
+            flat[path] = value
+    return flat
+
+
+def severity(flat: dict[str, Any]) -> float:
+    """Rank a flattened document on a rough 0-15 scale."""
+    level = flat.get('rule.level')
+    if isinstance(level, (int, float)):
+        return float(level)
+
+    score = flat.get('vulnerability.score.base')
+    if isinstance(score, (int, float)):
+        return float(score) * 1.5
+
+    for field in ('vulnerability.severity', 'level', 'syscheck.event'):
+        word = str(flat.get(field, '')).lower()
+        if word in _SEVERITY_WORDS:
+            return float(_SEVERITY_WORDS[word])
+    return 0.0
+
+
+@lru_cache(maxsize=1)
+def _encoder():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(SUMMARY_TOKENIZER)
+    except Exception:
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Tokens per the model tokenizer, or ~4 chars/token without tiktoken."""
+    encoder = _encoder()
+    if encoder is None:
+        return len(text) // 4 + 1
+    return len(encoder.encode(text))
+
+
+def _shorten(value: Any) -> Any:
+    if isinstance(value, str) and len(value) > SUMMARY_MAX_STRING:
+        return value[:SUMMARY_MAX_STRING] + '…'
+    if isinstance(value, list):
+        return [_shorten(v) for v in value[:10]]
+    return value
+
+
+def _project(flat: dict[str, Any], fields: list[str] | None) -> dict:
+    if fields is None:
+        return {k: _shorten(v) for k, v in flat.items()}
+    return {f: _shorten(flat[f]) for f in fields if flat.get(f) is not None}
+
+
+def unwrap(data: Any) -> tuple[list, dict]:
+    """Pull the item list out of Wazuh API envelopes ({"data": {...}})."""
+    meta: dict[str, Any] = {}
+    if isinstance(data, dict) and isinstance(data.get('data'), dict):
+        inner = data['data']
+        if 'affected_items' in inner:
+            meta['total'] = inner.get(
+                'total_affected_items', len(inner['affected_items']),
+            )
+            if inner.get('failed_items'):
+                meta['failed'] = len(inner['failed_items'])
+            return inner['affected_items'], meta
+        return [inner], meta
+    if isinstance(data, list):
+        return data, meta
+    return [data], meta
+
+
+def summarize(
+    tool: str,
+    data: Any,
+    token_budget: int = SUMMARY_TOKEN_BUDGET,
+    fields: list[str] | None = None,
+) -> dict:
+    """
+    Most signal per token for one tool response:
+    - unwrap API envelopes, flatten nested docs, keep the tool's fields
+    - order items by severity (stable, so recency order breaks ties)
+    - add items until the token budget is spent
+    """
+    items, meta = unwrap(data)
+    fields = fields if fields is not None else TOOL_FIELDS.get(tool)
+
+    flat_items = [flatten(item) for item in items]
+    ranked = sorted(
+        range(len(flat_items)),
+        key=lambda i: severity(flat_items[i]),
+        reverse=True,
+    )
+
+    kept = []
+    spent = 0
+    for i in ranked:
+        small = _project(flat_items[i], fields)
+        cost = count_tokens(json.dumps(small, default=str))
+        if kept and spent + cost > token_budget:
+            break
+        kept.append(small)
+        spent += cost
+
+    return {
+        'total': meta.get('total', len(items)),
+        'shown': len(kept),
+        **({'failed': meta['failed']} if 'failed' in meta else {}),
+        'items': kept,
+    }
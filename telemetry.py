@@ -0,0 +1,222 @@
+"""
+Metrics and traces for the copilot and the MCP server.
+
+Prometheus metrics need `prometheus_client`; they are served on /metrics
+by the MCP server and by copilot_web.py, or on COPILOT_METRICS_PORT for
+the terminal client. Traces are exported over OTLP when
+OTEL_EXPORTER_OTLP_ENDPOINT is set and the OpenTelemetry SDK is
+installed. Without either package every call here is a no-op.
+"""
+from __future__ import annotations
+
+import functools
+import inspect
+import os
+import time
+from contextlib import contextmanager
+from contextlib import nullcontext
+
+try:
+    import prometheus_client as prom
+except ImportError:  # optional: pip install prometheus-client
+    prom = None  # type: ignore[assignment]
+
+OTEL_ENDPOINT = os.getenv('OTEL_EXPORTER_OTLP_ENDPOINT', '')
+OTEL_SERVICE_NAME = os.getenv('OTEL_SERVICE_NAME', 'wazuh-copilot')
+COPILOT_METRICS_PORT = int(os.getenv('COPILOT_METRICS_PORT', '0'))
+
+# Seconds; upstream and tool calls range from cache hits to full scans
+_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class _Metrics:
+
+    def __init__(self):
+        self.tool_seconds = prom.Histogram(
+            'wazuh_mcp_tool_seconds', 'MCP tool latency',
+            ['tool'], buckets=_BUCKETS,
+        )
+        self.tool_errors = prom.Counter(
+            'wazuh_mcp_tool_errors_total', 'MCP tool failures',
+            ['tool', 'error'],
+        )
+        self.upstream_seconds = prom.Histogram(
+            'wazuh_upstream_request_seconds',
+            'Wazuh API / indexer request latency',
+            ['upstream', 'method', 'endpoint', 'status'], buckets=_BUCKETS,
+        )
+        self.upstream_bytes = prom.Counter(
+            'wazuh_upstream_response_bytes_total',
+            'Bytes received from the Wazuh API / indexer',
+            ['upstream', 'endpoint'],
+        )
+        self.cache_lookups = prom.Counter(
+            'copilot_cache_lookups_total',
+            'Cache lookups by cache and outcome (hit / stale / miss)',
+            ['cache', 'outcome'],
+        )
+        self.embedding_seconds = prom.Histogram(
+            'copilot_embedding_seconds', 'Embedding backend call latency',
+            ['model'], buckets=_BUCKETS,
+        )
+        self.embedding_texts = prom.Counter(
+            'copilot_embedded_texts_total',
+            'Texts sent to the embedding backend',
+            ['model'],
+        )
+        self.llm_seconds = prom.Histogram(
+            'copilot_llm_seconds', 'LLM call latency', ['model'],
+            buckets=_BUCKETS,
+        )
+        self.llm_tokens = prom.Counter(
+            'copilot_llm_tokens_total', 'LLM tokens by direction',
+            ['model', 'direction'],
+        )
+
+
+_metrics = _Metrics() if prom is not None else None
+_tracer = None
+
+
+def _setup_tracing():
+    global _tracer
+    if not OTEL_ENDPOINT:
+        return
+    try:
+        from opentelemetry import trace
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import (
+            OTLPSpanExporter,
+        )
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    except ImportError:
+        print('OTEL_EXPORTER_OTLP_ENDPOINT is set but opentelemetry-sdk '
+              'is not installed; tracing disabled.')
+        return
+
+    provider = TracerProvider(
+        resource=Resource.create({'service.name': OTEL_SERVICE_NAME}),
+    )
+    # The exporter reads OTEL_EXPORTER_OTLP_ENDPOINT itself
+    provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+    trace.set_tracer_provider(provider)
+    _tracer = trace.get_tracer('wazuh-copilot')
+
+
+_setup_tracing()
+
+
+def span(name: str, **attributes):
+    """A trace span when OTLP export is on, otherwise a no-op context."""
+    if _tracer is None:
+        return nullcontext()
+    return _tracer.start_as_current_span(name, attributes=attributes)
+
+
+# ============================================================
+#  Recorders
+# ============================================================
+def instrument_tool(name: str, fn):
+    """Wrap a (sync or async) MCP tool with latency / error metrics."""
+    def done(started, error=None):
+        if _metrics is None:
+            return
+        _metrics.tool_seconds.labels(name).observe(
+            time.perf_counter() - started,
+        )
+        if error is not None:
+            _metrics.tool_errors.labels(name, type(error).__name__).inc()
+
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            with span(f"tool {name}", tool=name):
+                try:
+                    result = await fn(*args, **kwargs)
+                except Exception as e:
+                    done(started, e)
+                    raise
+            done(started)
+            return result
+
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        with span(f"tool {name}", tool=name):
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                done(started, e)
+                raise
+        done(started)
+        return result
+
+    return wrapper
+
+
+def record_upstream(
+    upstream: str, method: str, endpoint: str, status, seconds: float,
+    size: int = 0,
+):
+    if _metrics is None:
+        return
+    _metrics.upstream_seconds.labels(
+        upstream, method, endpoint, str(status),
+    ).observe(seconds)
+    if size:
+        _metrics.upstream_bytes.labels(upstream, endpoint).inc(size)
+
+
+def record_cache(cache: str, outcome: str, count: int = 1):
+    if _metrics is not None and count:
+        _metrics.cache_lookups.labels(cache, outcome).inc(count)
+
+
+def record_embedding(model: str, seconds: float, texts: int):
+    if _metrics is None:
+        return
+    _metrics.embedding_seconds.labels(model).observe(seconds)
+    _metrics.embedding_texts.labels(model).inc(texts)
+
+
+def record_llm(
+    model: str, seconds: float, input_tokens: int = 0, output_tokens: int = 0,
+):
+    if _metrics is None:
+        return
+    _metrics.llm_seconds.labels(model).observe(seconds)
+    if input_tokens:
+        _metrics.llm_tokens.labels(model, 'input').inc(input_tokens)
+    if output_tokens:
+        _metrics.llm_tokens.labels(model, 'output').inc(output_tokens)
+
+
+@contextmanager
+def timed_embedding(model: str, texts: int):
+    started = time.perf_counter()
+    with span('embedding', model=model, texts=texts):
+        yield
+    record_embedding(model, time.perf_counter() - started, texts)
+
+
+# ============================================================
+#  Exposition
+# ============================================================
+def metrics_payload() -> tuple[bytes, str, int]:
+    """(body, content type, status) for a /metrics endpoint."""
+    if prom is None:
+        return (
+            b'prometheus_client is not installed\n',
+            'text/plain; charset=utf-8', 503,
+        )
+    return prom.generate_latest(), prom.CONTENT_TYPE_LATEST, 200
+
+
+def start_metrics_server(port: int = COPILOT_METRICS_PORT):
+    """Serve /metrics on its own port (processes without a web app)."""
+    if prom is not None and port:
+        prom.start_http_server(port)
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import time
+
+import pytest
+
+import result_cache
+from result_cache import ResultCache
+
+pytest.importorskip('numpy')
+from answer_cache import SemanticAnswerCache  # noqa: E402
+
+ALERTS_001 = ('custom_alert_filters', 'agent_id=001')
+ALERTS_002 = ('custom_alert_filters', 'agent_id=002')
+
+
+class FakeEmbeddings:
+
+    def __init__(self):
+        self.fail = False
+
+    def embed_query(self, text):
+        if self.fail:
+            raise RuntimeError('embedding API down')
+        return [1.0, float(len(text))]
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    results = ResultCache(path=str(tmp_path / 'results.sqlite3'))
+    monkeypatch.setattr(result_cache, 'result_cache', results)
+    results.set(*ALERTS_001, {'alerts': 1})
+    results.set(*ALERTS_002, {'alerts': 1})
+    return results, SemanticAnswerCache(embeddings=FakeEmbeddings())
+
+
+def test_only_the_rows_an_answer_used_invalidate_it(cache):
+    results, answers = cache
+    answers.store(
+        'show alerts for agent 001', 'two alerts',
+        {'custom_alert_filters'}, (ALERTS_001,),
+    )
+
+    # Other agents' data and identical refreshes keep the answer
+    results.set(*ALERTS_002, {'alerts': 5})
+    results.set(*ALERTS_001, {'alerts': 1})
+    assert answers.lookup('show alerts for agent 001') == 'two alerts'
+
+    results.set(*ALERTS_001, {'alerts': 2})
+    assert answers.lookup('show alerts for agent 001') is None
+
+
+def test_embedding_errors_fail_open(cache):
+    _, answers = cache
+    answers._embeddings.fail = True
+    answers.store('show alerts', 'answer', {'custom_alert_filters'})
+    assert answers.lookup('show alerts') is None
+    assert answers.stats()['entries'] == 0
+
+
+def test_answers_expire_with_the_data_ttl_of_their_tools(cache):
+    _, answers = cache
+    # Direct tool calls write no result cache row to fingerprint
+    answers.store('show alerts', 'answer', {'custom_alert_filters'})
+    assert answers.lookup('show alerts') == 'answer'
+
+    entry = answers._entries['show alerts']
+    assert entry.ttl == 60
+    entry.created_at = time.time() - 61
+    assert answers.lookup('show alerts') is None
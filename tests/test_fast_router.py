@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import pytest
+
+from fast_router import route
+
+
+@pytest.mark.parametrize(
+    ('query', 'tool', 'params'), [
+        (
+            'which agents listen on port 3389?', 'inventory_ports',
+            {'port': '3389', 'state': 'listening', 'agents': '*'},
+        ),
+        (
+            'which agents listen on 3389', 'inventory_ports',
+            {'port': '3389', 'state': 'listening', 'agents': '*'},
+        ),
+        (
+            'which agents listen on 3389 on agent 004', 'inventory_ports',
+            {'port': '3389', 'state': 'listening', 'agents': '004'},
+        ),
+        (
+            'where is process sshd running across the fleet',
+            'inventory_processes', {'name': 'sshd', 'agents': '*'},
+        ),
+        (
+            'where is nginx running', 'inventory_processes',
+            {'name': 'nginx', 'agents': '*'},
+        ),
+        (
+            'which hosts have openssl installed', 'inventory_packages',
+            {'name': 'openssl', 'agents': '*'},
+        ),
+        (
+            'which windows agents are missing KB5005565', 'inventory_hotfixes',
+            {'hotfix': 'KB5005565', 'missing': 'true', 'agents': '*'},
+        ),
+        (
+            'does agent 005 have KB5005565', 'inventory_hotfixes',
+            {'hotfix': 'KB5005565', 'agents': '005'},
+        ),
+        (
+            'top issues across the fleet', 'top_issues_summary',
+            {'agents': '*'},
+        ),
+    ],
+)
+def test_fleet_questions_use_fleet_tools(query, tool, params):
+    matched = route(query)
+    assert matched is not None
+    assert matched.tool == tool
+    assert matched.arguments == {'params': params}
+
+
+@pytest.mark.parametrize(
+    'query', [
+        'any vulnerabilities on all agents',
+        'which agents have open ports',
+        'show alerts for every host',
+    ],
+)
+def test_fleet_questions_never_use_single_agent_tools(query):
+    assert route(query) is None
+
+
+@pytest.mark.parametrize(
+    ('query', 'tool', 'agent_id'), [
+        ('show ports on agent 002', 'get_wazuh_agent_ports', '002'),
+        ('show processes', 'get_wazuh_processes', '001'),
+        (
+            'list vulnerabilities for agent 3', 'get_wazuh_vulnerabilities',
+            '003',
+        ),
+    ],
+)
+def test_single_agent_questions(query, tool, agent_id):
+    matched = route(query)
+    assert matched.tool == tool
+    assert matched.arguments == {'params': {'agent_id': agent_id}}
+
+
+def test_top5_workflow():
+    matched = route('top 5 issues on agent 7')
+    assert matched.tool == 'run_top5_workflow'
+    assert matched.arguments['agent_id'] == '007'
+
+
+def test_explanations_go_to_the_llm():
+    assert route('why is port 22 open') is None
@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+pytest.importorskip('httpx')
+pytest.importorskip('requests')
+import mcp_client_call  # noqa: E402
+
+DOCS = [{'_id': str(i), 'sort': [i, str(i)]} for i in range(5)]
+
+
+@pytest.fixture
+def indexer(monkeypatch):
+    deleted = []
+
+    async def fake_post(endpoint, body=None):
+        if 'point_in_time' in endpoint:
+            return {'pit_id': 'pit-1'}
+        after = body.get('search_after')
+        start = after[0] + 1 if after else 0
+        return {'hits': {'hits': DOCS[start:start + body['size']]}}
+
+    async def fake_request(kind, method, url, **kwargs):
+        deleted.extend(kwargs['json']['pit_id'])
+
+    monkeypatch.setattr(mcp_client_call, 'awazuh_indexer_post', fake_post)
+    monkeypatch.setattr(mcp_client_call, '_async_request', fake_request)
+    return deleted
+
+
+def _scan(cursor, max_hits):
+    async def main():
+        return [
+            hit['_id'] async for hit in mcp_client_call.aiter_indexer_hits(
+                'idx', {}, [], page_size=2, max_hits=max_hits, cursor=cursor,
+            )
+        ]
+    return asyncio.run(main())
+
+
+def test_cursor_resumes_where_the_budget_ran_out(indexer):
+    cursor = {}
+    assert _scan(cursor, 3) == ['0', '1', '2']
+    assert cursor == {'pit_id': 'pit-1', 'search_after': [2, '2']}
+    assert indexer == []
+
+    assert _scan(cursor, 3) == ['3', '4']
+    assert cursor == {}
+    assert indexer == ['pit-1']
@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+from indexer_queries import fit_fleet_budget
+from indexer_queries import fleet_agent_count
+
+
+def _fleet(size):
+    return {
+        f"{i:03d}": {'total': i, 'items': [{'n': i}]}
+        for i in range(1, size + 1)
+    }
+
+
+def test_fleet_budget_is_shared_not_multiplied():
+    kept, share, omitted = fit_fleet_budget(_fleet(3), 1200, agent_tokens=150)
+    assert len(kept) == 3 and omitted == 0
+    assert share * len(kept) <= 1200
+
+
+def test_large_fleets_keep_the_busiest_agents_within_budget():
+    kept, share, omitted = fit_fleet_budget(
+        _fleet(500), 1200, agent_tokens=150,
+    )
+    assert list(kept) == [f"{i:03d}" for i in range(500, 492, -1)]
+    assert omitted == 492
+    assert share == 150
+
+
+def test_agent_count_reports_agents_past_the_bucket_limit():
+    result = {
+        'aggregations': {
+            'agent_count': {'value': 750},
+            'per_agent': {
+                'sum_other_doc_count': 1200,
+                'buckets': [{'key': '001', 'doc_count': 9}],
+            },
+        },
+    }
+    assert fleet_agent_count(result) == (750, True)
+
+
+def test_agent_count_without_cut_buckets():
+    result = {
+        'aggregations': {
+            'per_agent': {
+                'sum_other_doc_count': 0,
+                'buckets': [{'key': '001'}, {'key': '002'}],
+            },
+        },
+    }
+    assert fleet_agent_count(result) == (2, False)
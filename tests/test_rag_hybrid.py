@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+import pytest
+
+pytest.importorskip('langchain_core')
+import rag_hybrid  # noqa: E402
+
+
+class FakeStore:
+
+    def __init__(self, docs):
+        self.docs = docs
+
+    def get(self, include=()):
+        ids = sorted(self.docs)
+        data = {'ids': ids}
+        if 'documents' in include:
+            data['documents'] = [self.docs[i] for i in ids]
+            data['metadatas'] = [{} for _ in ids]
+        return data
+
+
+def test_edited_doc_with_same_chunk_count_is_reindexed(monkeypatch):
+    monkeypatch.setattr(rag_hybrid, 'BM25_SYNC_INTERVAL', 0)
+    store = FakeStore({'a1': 'sshd brute force rule 5712'})
+    index = rag_hybrid.BM25Index(store)
+    assert [d.id for d in index.search('sshd', 5)] == ['a1']
+
+    # Re-ingested edit: same number of chunks, new content-hash id
+    store.docs = {'b2': 'auditd execve monitoring'}
+    assert index.search('sshd', 5) == []
+    assert [d.id for d in index.search('auditd', 5)] == ['b2']
@@ -0,0 +1,16 @@
+from __future__ import annotations
+
+from result_cache import REF_TOOL
+from result_cache import ResultCache
+
+
+def test_conversation_refs_do_not_change_the_fingerprint(tmp_path):
+    cache = ResultCache(path=str(tmp_path / 'results.sqlite3'))
+    cache.set('custom_alert_filters', 'agent_id=001', {'alerts': 1})
+    before = cache.fingerprint()
+
+    cache.set(REF_TOOL, '3f2a9c1b7e4d', 'tool output')
+    assert cache.fingerprint() == before
+
+    cache.set('custom_alert_filters', 'agent_id=001', {'alerts': 2})
+    assert cache.fingerprint() != before
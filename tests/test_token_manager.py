@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+import asyncio
+import base64
+import json
+import threading
+import time
+
+import pytest
+
+pytest.importorskip('httpx')
+pytest.importorskip('requests')
+import mcp_client_call  # noqa: E402
+
+
+def _jwt(expires_in):
+    claims = json.dumps({'exp': time.time() + expires_in}).encode()
+    payload = base64.urlsafe_b64encode(claims).decode().rstrip('=')
+    return f"header.{payload}.signature"
+
+
+def test_sync_and_async_callers_share_one_refresh(monkeypatch):
+    calls = []
+
+    def slow_authenticate():
+        calls.append(threading.get_ident())
+        time.sleep(0.1)
+        return _jwt(3600)
+
+    monkeypatch.setattr(mcp_client_call, '_authenticate', slow_authenticate)
+    manager = mcp_client_call.TokenManager(refresh_margin=60)
+
+    threads = [threading.Thread(target=manager.get) for _ in range(4)]
+
+    async def main():
+        for thread in threads:
+            thread.start()
+        return await asyncio.gather(*(manager.aget() for _ in range(8)))
+
+    tokens = asyncio.run(main())
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert set(tokens) == {manager.get()}
+    assert manager.misses == 1
@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+pytest.importorskip('httpx')
+import watermarks  # noqa: E402
+
+
+def _line(second):
+    return {
+        'timestamp': f"2026-01-01T00:00:{second:02d}Z",
+        'tag': 'wazuh-db', 'level': 'info', 'description': f"line {second}",
+    }
+
+
+def test_full_final_page_moves_the_watermark(tmp_path, monkeypatch):
+    store = watermarks.WatermarkStore(path=str(tmp_path / 'wm.sqlite3'))
+    monkeypatch.setattr(watermarks, 'watermarks', store)
+    monkeypatch.setattr(watermarks, 'WATERMARK_PAGE_SIZE', 2)
+
+    logs = [_line(1)]
+    requests = []
+
+    async def fake_get(endpoint):
+        requests.append(endpoint)
+        offset = 0
+        if 'q=' in endpoint:
+            offset = int(endpoint.rsplit('offset=', 1)[1])
+            since = store.watermark('manager_logs')[0]
+            items = [log for log in logs if log['timestamp'] >= since]
+        else:
+            items = list(reversed(logs))
+        return {'data': {'affected_items': items[offset:offset + 2]}}
+
+    monkeypatch.setattr(watermarks, 'awazuh_get', fake_get)
+
+    asyncio.run(watermarks.collect_manager_logs_delta())
+    # Watermark line + 3 new lines = two full pages, then an empty one
+    logs += [_line(2), _line(3), _line(4)]
+    assert asyncio.run(watermarks.collect_manager_logs_delta()) == 3
+    assert store.watermark('manager_logs') == [_line(4)['timestamp']]
+
+    requests.clear()
+    assert asyncio.run(watermarks.collect_manager_logs_delta()) == 0
+    assert len(requests) == 1
@@ -0,0 +1,244 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from urllib.parse import quote
+
+from indexer_queries import delta_body
+from indexer_queries import latest_body
+from jsonutil import dumps
+from jsonutil import loads
+from mcp_client_call import awazuh_get
+from mcp_client_call import awazuh_indexer_post
+
+WATERMARK_DB_PATH = os.getenv(
+    'WATERMARK_DB_PATH', './rag_chroma/watermarks.sqlite3',
+)
+# Newest documents kept locally per agent/tool pair
+WATERMARK_WINDOW_SIZE = int(os.getenv('WATERMARK_WINDOW_SIZE', '500'))
+WATERMARK_PAGE_SIZE = int(os.getenv('WATERMARK_PAGE_SIZE', '500'))
+# A backlog larger than this is not replayed: the window is reseeded
+# from the newest documents instead.
+WATERMARK_MAX_DELTA = int(os.getenv('WATERMARK_MAX_DELTA', '5000'))
+
+
+class WatermarkStore:
+    """
+    Per key (e.g. "custom_alert_filters:001"):
+    - a high-water mark: the sort values of the newest document seen
+    - a rolling window of the newest WATERMARK_WINDOW_SIZE documents
+    Both live in one SQLite file so they survive restarts.
+    """
+
+    def __init__(
+        self,
+        path: str = WATERMARK_DB_PATH,
+        window_size: int = WATERMARK_WINDOW_SIZE,
+    ):
+        self.path = path
+        self.window_size = window_size
+        self._lock = threading.Lock()
+        self._db: sqlite3.Connection | None = None
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.executescript(
+                'CREATE TABLE IF NOT EXISTS watermarks ('
+                ' key TEXT PRIMARY KEY, after TEXT NOT NULL);'
+                'CREATE TABLE IF NOT EXISTS window ('
+                ' key TEXT, doc_id TEXT, ts REAL, doc TEXT,'
+                ' PRIMARY KEY (key, doc_id));'
+                'CREATE INDEX IF NOT EXISTS window_by_ts ON window (key, ts);',
+            )
+            self._db.commit()
+        return self._db
+
+    def watermark(self, key: str) -> list | None:
+        with self._lock:
+            row = self._conn().execute(
+                'SELECT after FROM watermarks WHERE key = ?', (key,),
+            ).fetchone()
+        return loads(row[0]) if row else None
+
+    def merge(
+        self,
+        key: str,
+        docs: list[tuple[str, float, dict]],
+        after: list | None,
+        reset: bool = False,
+    ) -> int:
+        """
+        Add (doc_id, ts, doc) rows, move the watermark to `after` and trim
+        the window. Returns how many documents were new.
+        """
+        with self._lock:
+            db = self._conn()
+            if reset:
+                db.execute('DELETE FROM window WHERE key = ?', (key,))
+            before = db.total_changes
+            db.executemany(
+                'INSERT OR IGNORE INTO window VALUES (?, ?, ?, ?)',
+                [(key, doc_id, ts, dumps(doc)) for doc_id, ts, doc in docs],
+            )
+            added = db.total_changes - before
+            if after is not None:
+                db.execute(
+                    'INSERT OR REPLACE INTO watermarks VALUES (?, ?)',
+                    (key, dumps(after)),
+                )
+            db.execute(
+                'DELETE FROM window WHERE key = ? AND doc_id NOT IN ('
+                ' SELECT doc_id FROM window WHERE key = ?'
+                ' ORDER BY ts DESC LIMIT ?)',
+                (key, key, self.window_size),
+            )
+            db.commit()
+        return added
+
+    def window(self, key: str, limit: int) -> list[dict]:
+        """Newest `limit` documents of the window, newest first."""
+        with self._lock:
+            rows = self._conn().execute(
+                'SELECT doc FROM window WHERE key = ?'
+                ' ORDER BY ts DESC LIMIT ?',
+                (key, limit),
+            ).fetchall()
+        return [loads(row[0]) for row in rows]
+
+    def reset(self, key: str | None = None):
+        where, args = ('WHERE key = ?', (key,)) if key else ('', ())
+        with self._lock:
+            self._conn().execute(f"DELETE FROM window {where}", args)
+            self._conn().execute(f"DELETE FROM watermarks {where}", args)
+            self._conn().commit()
+
+
+watermarks = WatermarkStore()
+
+# One collection per key at a time; concurrent callers share its result
+_key_locks: dict[str, asyncio.Lock] = {}
+
+
+def _key_lock(key: str) -> asyncio.Lock:
+    lock = _key_locks.get(key)
+    if lock is None:
+        lock = _key_locks[key] = asyncio.Lock()
+    return lock
+
+
+# ============================================================
+#  Indexer: alerts, FIM
+# ============================================================
+def _hit_row(hit: dict) -> tuple[str, float, dict]:
+    return hit['_id'], hit['sort'][0] / 1000, hit.get('_source', {})
+
+
+async def collect_indexer_delta(
+    key: str, index: str, filters: list[dict], seed_size: int = 50,
+) -> int:
+    """
+    Bring the window for `key` up to date with one delta query (plus
+    pages when the backlog is large). Returns the number of new docs.
+    """
+    async with _key_lock(key):
+        after = await asyncio.to_thread(watermarks.watermark, key)
+
+        if after is not None:
+            rows = []
+            cursor = after
+            while len(rows) < WATERMARK_MAX_DELTA:
+                result = await awazuh_indexer_post(
+                    f"{index}/_search",
+                    delta_body(filters, cursor, WATERMARK_PAGE_SIZE),
+                )
+                hits = result.get('hits', {}).get('hits', [])
+                rows += [_hit_row(hit) for hit in hits]
+                if hits:
+                    cursor = hits[-1]['sort']
+                if len(hits) < WATERMARK_PAGE_SIZE:
+                    return await asyncio.to_thread(
+                        watermarks.merge, key, rows, cursor,
+                    )
+
+        # First call, or too far behind to replay: start from the newest
+        result = await awazuh_indexer_post(
+            f"{index}/_search", latest_body(filters, seed_size),
+        )
+        hits = result.get('hits', {}).get('hits', [])
+        return await asyncio.to_thread(
+            watermarks.merge,
+            key,
+            [_hit_row(hit) for hit in hits],
+            hits[0]['sort'] if hits else after,
+            True,
+        )
+
+
+# ============================================================
+#  Wazuh API: manager logs
+# ============================================================
+def _log_ts(item: dict) -> float:
+    try:
+        stamp = str(item.get('timestamp', '')).replace('Z', '+00:00')
+        return datetime.fromisoformat(stamp).timestamp()
+    except ValueError:
+        return 0.0
+
+
+def _log_row(item: dict) -> tuple[str, float, dict]:
+    # Log lines have no id: hash the whole entry, so lines sharing the
+    # watermark's timestamp are deduplicated rather than skipped.
+    doc_id = hashlib.sha1(dumps(item).encode('utf-8')).hexdigest()
+    return doc_id, _log_ts(item), item
+
+
+def _items(data: dict) -> list[dict]:
+    return data.get('data', {}).get('affected_items', [])
+
+
+async def collect_manager_logs_delta(
+    key: str = 'manager_logs', seed_size: int = 50,
+) -> int:
+    async with _key_lock(key):
+        after = await asyncio.to_thread(watermarks.watermark, key)
+
+        if after is not None:
+            since = after[0]
+            # WQL has no ">=": (newer OR same second)
+            q = quote(f"(timestamp>{since},timestamp={since})", safe='')
+            rows = []
+            offset = 0
+            while offset < WATERMARK_MAX_DELTA:
+                items = _items(await awazuh_get(
+                    f"/manager/logs?q={q}&sort=%2Btimestamp"
+                    f"&limit={WATERMARK_PAGE_SIZE}&offset={offset}",
+                ))
+                rows += [_log_row(item) for item in items]
+                offset += len(items)
+                if len(items) < WATERMARK_PAGE_SIZE:
+                    # Last row of all pages: a full final page is
+                    # followed by an empty one
+                    newest = rows[-1][2]['timestamp'] if rows else since
+                    return await asyncio.to_thread(
+                        watermarks.merge, key, rows, [newest],
+                    )
+
+        items = _items(await awazuh_get(
+            f"/manager/logs?limit={seed_size}&sort=-timestamp",
+        ))
+        return await asyncio.to_thread(
+            watermarks.merge,
+            key,
+            [_log_row(item) for item in items],
+            [items[0]['timestamp']] if items else after,
+            True,
+        )
@@ -3,23 +3,40 @@ from __future__ import annotations
 import asyncio
 import os
 import ssl
+import threading
+import time
 
 from dotenv import load_dotenv
 from langchain.agents import create_agent
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import AIMessageChunk
 from langchain_openai import ChatOpenAI
 
 from agent_prompt import get_agent_prompt
+from agent_prompt import get_summary_prompt
+from answer_cache import answer_cache
+from answer_cache import result_keys
 from chroma_run import run_top5_workflow
-from mcp_client_call import client
+from conversation import ConversationMemory
+from conversation import recall_result
+from conversation import remember_outputs
+from fast_router import route
+from jsonutil import dumps
+from mcp_client_call import get_client
 from rag_internet_router import route_query
 from rag_tool import wazuh_rag_search
+from telemetry import record_cache
+from telemetry import record_llm
+from telemetry import start_metrics_server
 
 load_dotenv()
 
 API_KEY = os.getenv('api_key', '')
 
-if not API_KEY:
-    raise RuntimeError('No api key for the llm!')
+# Pre-LLM dispatcher for known intents; 0 sends everything to the agent
+FAST_PATH = os.getenv('COPILOT_FAST_PATH', '1') == '1'
+# 0 prints the raw tool output instead of one summarizing LLM call
+FAST_PATH_SUMMARIZE = os.getenv('COPILOT_FAST_PATH_SUMMARIZE', '1') == '1'
 
 # Disable SSL checks for internal Wazuh API traffic
 ssl._create_default_https_context = ssl._create_unverified_context  # type: ignore # noqa: E501
@@ -46,24 +63,327 @@ def extract_answer(result):
     return str(result)
 
 
+# ============================================================
+#  Output events
+#
+#  Answers are produced as a stream of (kind, payload) events so the
+#  terminal and the web front end (copilot_web.py) share one code path:
+#    route · tool_call · tool_result · progress · token · answer
+# ============================================================
+def print_event(kind, payload):
+    if kind == 'start':
+        print('\nAssistant: ', end='', flush=True)
+    elif kind == 'token':
+        print(payload, end='', flush=True)
+    elif kind == 'route':
+        print(f"⚡ {payload['intent']} → {payload['tool']}", flush=True)
+    elif kind == 'tool_call':
+        print(f"\n🔧 {payload} ...", flush=True)
+    elif kind == 'tool_result':
+        print(f"✅ {payload} returned", flush=True)
+    elif kind == 'progress':
+        print(
+            f"   · {payload.get('tool')} ({payload.get('source')}, "
+            f"{payload.get('ms')} ms)",
+            flush=True,
+        )
+    elif kind == 'cached':
+        print('\nAssistant (cached):', payload, '\n')
+    elif kind == 'end':
+        print('\n')
+
+
+async def _emit(emit, kind, payload=None):
+    result = emit(kind, payload)
+    if asyncio.iscoroutine(result):
+        await result
+
+
+# ============================================================
+#  Streaming agent run
+# ============================================================
+async def stream_agent(agent, messages, emit):
+    """
+    Run the agent over `messages`, emitting model tokens as they arrive
+    and an event per tool call and return.
+    Returns (answer, tools used, [(tool, args, output), ...]).
+    """
+    parts = []
+    used = set()
+    calls = {}
+    outputs = []
+    await _emit(emit, 'start')
+
+    async for mode, chunk in agent.astream(
+        {'messages': messages},
+        stream_mode=['messages', 'updates', 'custom'],
+    ):
+        if mode == 'messages':
+            token, _ = chunk
+            # Tool-call chunks carry no text; ToolMessages are not chunks
+            if isinstance(token, AIMessageChunk) and token.content:
+                text = token.text()
+                parts.append(text)
+                await _emit(emit, 'token', text)
+
+        elif mode == 'updates':
+            for update in chunk.values():
+                for message in (update or {}).get('messages', []):
+                    for call in getattr(message, 'tool_calls', None) or []:
+                        used.add(call['name'])
+                        calls[call['id']] = call['args']
+                        await _emit(emit, 'tool_call', call['name'])
+                    if getattr(message, 'type', '') == 'tool':
+                        outputs.append((
+                            message.name,
+                            calls.get(message.tool_call_id, {}),
+                            message.content,
+                        ))
+                        await _emit(emit, 'tool_result', message.name)
+                        # The final answer starts after the last tool
+                        parts.clear()
+
+        elif mode == 'custom' and isinstance(chunk, dict):
+            await _emit(emit, 'progress', chunk)
+
+    await _emit(emit, 'end')
+    return ''.join(parts), used, outputs
+
+
+# ============================================================
+#  Fast path: known intents skip the agent's planning loop
+# ============================================================
+async def fast_path(user_input, tools, model, emit):
+    """
+    Call the matching tool directly and use the model once, only to
+    summarize. Returns (answer, tools used, [(tool, args, output)]) or
+    None for the agent.
+    """
+    if not FAST_PATH:
+        return None
+
+    matched = route(user_input)
+    if matched is None or matched.tool not in tools:
+        return None
+
+    await _emit(
+        emit, 'route', {'intent': matched.intent, 'tool': matched.tool},
+    )
+    data = await tools[matched.tool].ainvoke(matched.arguments)
+    if not isinstance(data, str):
+        data = dumps(data)
+
+    outputs = [(matched.tool, matched.arguments, data)]
+
+    await _emit(emit, 'start')
+    if not FAST_PATH_SUMMARIZE:
+        await _emit(emit, 'token', data)
+        await _emit(emit, 'end')
+        return data, {matched.tool}, outputs
+
+    parts = []
+    async for token in model.astream([
+        ('system', get_summary_prompt()),
+        ('human', f"Question: {user_input}\n\nTool output:\n{data}"),
+    ]):
+        text = token.text()
+        parts.append(text)
+        await _emit(emit, 'token', text)
+    await _emit(emit, 'end')
+    return ''.join(parts), {matched.tool}, outputs
+
+
+# ============================================================
+#  LLM metrics
+# ============================================================
+class LLMMetrics(BaseCallbackHandler):
+    """Records latency and token usage of every model call."""
+
+    run_inline = True
+
+    def __init__(self):
+        self._started = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._started[run_id] = time.perf_counter()
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._started.pop(run_id, None)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        started = self._started.pop(run_id, None)
+        if started is None:
+            return
+
+        usage = (response.llm_output or {}).get('token_usage') or {}
+        input_tokens = usage.get('prompt_tokens', 0)
+        output_tokens = usage.get('completion_tokens', 0)
+        model = (response.llm_output or {}).get('model_name', '')
+        if not usage:
+            # Streaming: usage arrives on the final message chunk
+            for generations in response.generations:
+                for generation in generations:
+                    message = getattr(generation, 'message', None)
+                    meta = getattr(message, 'usage_metadata', None) or {}
+                    input_tokens += meta.get('input_tokens', 0)
+                    output_tokens += meta.get('output_tokens', 0)
+                    info = getattr(message, 'response_metadata', None) or {}
+                    model = model or info.get('model_name', '')
+
+        record_llm(
+            model or 'unknown', time.perf_counter() - started,
+            input_tokens, output_tokens,
+        )
+
+
+# ============================================================
+#  Copilot (shared) and sessions (per conversation)
+# ============================================================
+class Copilot:
+    """
+    One agent, model, MCP client and vector store, shared by every
+    session in the process.
+    """
+
+    def __init__(self, agent, tools, model):
+        self.agent = agent
+        self.tools = tools
+        self.model = model
+
+    @classmethod
+    async def create(cls, verbose=False):
+        if not API_KEY:
+            raise RuntimeError('No api key for the llm!')
+
+        # Load MCP tools
+        mcp_tools = await get_client().get_tools()
+
+        if verbose:
+            print('Loaded MCP Tools:')
+            for t in mcp_tools:
+                print(' -', t.name)
+
+        all_tools = mcp_tools + [
+            route_query, wazuh_rag_search, run_top5_workflow, recall_result,
+        ]
+        model = ChatOpenAI(
+            model='gpt-4o',
+            api_key=os.getenv('api_key'),
+            # Token counts for streamed responses (LLM metrics)
+            stream_usage=True,
+            callbacks=[LLMMetrics()],
+        )
+
+        prompt = get_agent_prompt()
+        if verbose:
+            print(prompt)
+        agent = create_agent(
+            model=model,
+            tools=all_tools,
+            system_prompt=prompt,
+        )
+        return cls(agent, {t.name: t for t in all_tools}, model)
+
+
+class ChatSession:
+    """One conversation: its own memory over the shared Copilot."""
+
+    def __init__(self, copilot):
+        self.copilot = copilot
+        self.memory = ConversationMemory()
+        self.last_active = time.monotonic()
+        # One question at a time per conversation
+        self.lock = asyncio.Lock()
+
+    async def ask(self, user_input, emit=print_event):
+        async with self.lock:
+            self.last_active = time.monotonic()
+            answer, outputs = await self._answer(user_input, emit)
+
+            # Tool outputs go to the result cache; history keeps refs
+            refs = await asyncio.to_thread(remember_outputs, outputs)
+            self.memory.add(user_input, answer, refs)
+            await self.memory.compact(self.copilot.model)
+
+            self.last_active = time.monotonic()
+            return answer
+
+    async def _answer(self, user_input, emit):
+        # Cached answers carry no conversation context, so only use them
+        # for questions that stand on their own.
+        standalone = not self.memory or route(user_input) is not None
+
+        if standalone:
+            # Near-duplicate of a recent question with unchanged data?
+            cached = await asyncio.to_thread(answer_cache.lookup, user_input)
+            record_cache('answer', 'miss' if cached is None else 'hit')
+            if cached is not None:
+                await _emit(emit, 'cached', cached)
+                return cached, []
+
+        copilot = self.copilot
+        routed = await fast_path(
+            user_input, copilot.tools, copilot.model, emit,
+        )
+        if routed is not None:
+            answer, used, outputs = routed
+        else:
+            answer, used, outputs = await stream_agent(
+                copilot.agent, self.memory.messages(user_input), emit,
+            )
+
+        if standalone:
+            await asyncio.to_thread(
+                answer_cache.store, user_input, answer, used,
+                result_keys(outputs),
+            )
+        return answer, outputs
+
+
 # ============================================================
 #  Chat loop
 # ============================================================
-async def chat_loop(agent):
+def _resolve(future, result=None, error=None):
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+async def ainput(prompt=''):
+    """
+    input() on a daemon thread, so the event loop (MCP keep-alives,
+    background cache refreshes) keeps running while the user types,
+    and Ctrl+C does not wait for a pending read.
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def read():
+        try:
+            line = input(prompt)
+        except Exception as e:
+            loop.call_soon_threadsafe(_resolve, future, None, e)
+        else:
+            loop.call_soon_threadsafe(_resolve, future, line)
+
+    threading.Thread(target=read, daemon=True).start()
+    return await future
+
+
+async def chat_loop(session):
     print('🔥 Wazuh Copilot (MCP + RAG) is live!  Ctrl+C to exit.\n')
 
     try:
         while True:
-            user_input = input('You: ').strip()
+            user_input = (await ainput('You: ')).strip()
             if not user_input:
                 continue
+            await session.ask(user_input)
 
-            result = await agent.ainvoke({'input': user_input})
-            answer = extract_answer(result)
-
-            print('\nAssistant:', answer, '\n')
-
-    except KeyboardInterrupt:
+    except (KeyboardInterrupt, EOFError):
         print('\n👋 Exiting Wazuh Copilot...')
 
 
@@ -71,31 +391,13 @@ async def chat_loop(agent):
 #  Main
 # ============================================================
 async def main():
+    start_metrics_server()
+    copilot = await Copilot.create(verbose=True)
+    await chat_loop(ChatSession(copilot))
 
-    # MCP connection
-
-    # Load MCP tools
-    mcp_tools = await client.get_tools()
-
-    print('Loaded MCP Tools:')
-    for t in mcp_tools:
-        print(' -', t.name)
 
-    all_tools = mcp_tools + [route_query, wazuh_rag_search, run_top5_workflow]
-    model = ChatOpenAI(
-        model='gpt-4o',
-        api_key=os.getenv('api_key'),
-    )
-
-    prompt = get_agent_prompt()
-    print(prompt)
-    agent = create_agent(
-        model=model,
-        tools=all_tools,
-        system_prompt=prompt,
-    )
-
-    await chat_loop(agent)
-
-
-asyncio.run(main())
+if __name__ == '__main__':
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print('\n👋 Exiting Wazuh Copilot...')